@@ -1,23 +1,33 @@
+from . import logs
 from .config import DarkFreamConfig
 from peewee import *
 from functools import wraps
 from .orm import User
 from .auth import AdminAuth
 from .global_config import get_user_model
+from .forms import FormCodec
+from .request import get_cookie
+from .rest import ModelAPI
+from .search import search_fields
+
+SEARCH_LIMIT = 100
 
 
 class DarkAdmin:
     def __init__(self, app):
         self.app = app
         self.models = {}
+        self.codecs = {}
         self.base_url = '/admin/'
         self.auth = AdminAuth(app)
         self.user_model = get_user_model() or User
-        print("Admin user model:", self.user_model)
+        logs.info(f"Admin user model: {self.user_model}")
         self.register_routes()
+        self.api = ModelAPI(self)
 
     def register_model(self, model):
         self.models[model.__name__] = model
+        self.codecs[model.__name__] = FormCodec(model, self.user_model)
         return model
 
     def get_related_objects(self, field):
@@ -25,6 +35,9 @@ class DarkAdmin:
             return field.rel_model.select()
         return None
 
+    def related_objects(self, codec):
+        return {spec.name: spec.rel_model.select() for spec in codec.foreign_keys}
+
 
     def register_routes(self):
 
@@ -36,12 +49,7 @@ class DarkAdmin:
         @self.app.route(f'{self.base_url}')
         @self.auth.login_required
         def admin_index(data):
-            cookie = data['headers'].get('Cookie', '')
-            cookie_parts = cookie.split('=')
-            if len(cookie_parts) > 1:
-                current_user = self.auth.get_current_user(cookie_parts[1])
-            else:
-                current_user = None
+            current_user = self.auth.get_current_user(get_cookie(data, 'session'))
 
             if current_user.user.is_admin == False:
                 return self.app.redirect(f'{self.base_url}logout')
@@ -53,15 +61,69 @@ class DarkAdmin:
                 'current_user': current_user.user
             }, 'text/html'
 
+        @self.app.route(f'{self.base_url}traces')
+        @self.auth.login_required
+        def admin_traces(data):
+            current_user = self.auth.get_current_user(get_cookie(data, 'session'))
+            if current_user is None or current_user.user.is_admin == False:
+                return self.app.redirect(f'{self.base_url}logout')
+
+            tracer = self.app.tracer
+            traces = tracer.recent() if tracer is not None else []
+            if 'json' in (data.get('query') or {}).get('format', []):
+                return self.app.json_response(200, [trace.to_dict() for trace in traces])
+            return 200, self.app.render_with_cache('admin/traces.html', {
+                'enabled': tracer is not None,
+                'traces': traces,
+                'models': self.models,
+                'base_url': self.base_url,
+                'current_user': current_user.user
+            }), 'text/html'
+
+        @self.app.route(f'{self.base_url}profiler', methods=['GET', 'POST'])
+        @self.auth.login_required
+        def admin_profiler(data):
+            current_user = self.auth.get_current_user(get_cookie(data, 'session'))
+            if current_user is None or current_user.user.is_admin == False:
+                return self.app.redirect(f'{self.base_url}logout')
+
+            profiler = self.app.profiler
+            if profiler is None:
+                return self.app.json_response(404, {'error': 'Profiler is not enabled; call app.enable_profiler()'})
+
+            if data['method'] == 'POST':
+                form = data.get('data') or {}
+                action = form.get('action')
+                action = action[0] if isinstance(action, list) else action
+                rate = form.get('rate')
+                rate = rate[0] if isinstance(rate, list) else rate
+                if action == 'start':
+                    try:
+                        rate = float(rate) if rate else None
+                    except ValueError:
+                        return self.app.json_response(400, {'error': 'rate must be a number'})
+                    try:
+                        profiler.start(rate)
+                    except ValueError as e:
+                        return self.app.json_response(400, {'error': str(e)})
+                elif action == 'stop':
+                    profiler.stop()
+                elif action == 'reset':
+                    profiler.reset()
+                else:
+                    return self.app.json_response(400, {'error': 'action must be start, stop or reset'})
+
+            if 'collapsed' in (data.get('query') or {}).get('format', []):
+                return 200, profiler.collapsed(), {
+                    'Content-Type': 'text/plain; charset=utf-8',
+                    'Content-Disposition': 'attachment; filename="darkfream.collapsed"',
+                }
+            return self.app.json_response(200, profiler.status())
+
         @self.app.route(f'{self.base_url}<model_name>')
         @self.auth.login_required
         def admin_model_list(data=None, model_name=None):
-            cookie = data['headers'].get('Cookie', '')
-            cookie_parts = cookie.split('=')
-            if len(cookie_parts) > 1:
-                current_user = self.auth.get_current_user(cookie_parts[1])
-            else:
-                current_user = None
+            current_user = self.auth.get_current_user(get_cookie(data, 'session'))
 
             if current_user.user.is_admin == False:
                 return self.app.redirect(f'{self.base_url}logout')
@@ -69,16 +131,22 @@ class DarkAdmin:
             if not model:
                 return 404, self.app.render_with_cache('admin/error.html', {
                     'error_code': 404,
-                    'current_user': self.auth.get_current_user(cookie_parts[1]).user, 'message': "Model not found",
+                    'current_user': current_user.user, 'message': "Model not found",
                                                                  'models': self.models,
                                                                  'base_url': self.base_url
                                                                 }), 'text/html'
 
-            items = model.select()
+            searchable = bool(search_fields(model))
+            q = (data.get('query') or {}).get('q', [''])[0].strip() if searchable else ''
+            items = model.search(q).limit(SEARCH_LIMIT) if q else model.select()
             return 200, self.app.render_with_cache('admin/list.html', {
                 'model': model,
+                'codec': self.codecs[model_name],
                 'models': self.models,
                 'items': items,
+                'searchable': searchable,
+                'q': q,
+                'search_limit': SEARCH_LIMIT,
                 'base_url': self.base_url,
                 'current_user': current_user.user
             }), 'text/html'
@@ -87,12 +155,7 @@ class DarkAdmin:
         @self.app.route(f'{self.base_url}<model_name>/create', methods=['GET', 'POST'])
         @self.auth.login_required
         def admin_model_create(data=None, model_name=None):
-            cookie = data['headers'].get('Cookie', '')
-            cookie_parts = cookie.split('=')
-            if len(cookie_parts) > 1:
-                current_user = self.auth.get_current_user(cookie_parts[1])
-            else:
-                current_user = None
+            current_user = self.auth.get_current_user(get_cookie(data, 'session'))
 
             if current_user.user.is_admin == False:
                 return self.app.redirect(f'{self.base_url}logout')
@@ -100,63 +163,41 @@ class DarkAdmin:
             if not model:
                 return 404, self.app.render_with_cache('admin/error.html', {
                     'error_code': 404,
-                    'current_user': self.auth.get_current_user(cookie_parts[1]).user, 'message': f"Model {model_name} not found",
+                    'current_user': current_user.user, 'message': f"Model {model_name} not found",
                                                                             'models': self.models,
                                                                  'base_url': self.base_url
                                                                 }), 'text/html'
 
+            codec = self.codecs[model_name]
             if data['method'] == 'POST':
                 try:
-                    new_item = model()
-                    for field_name, field in model._meta.fields.items():
-                        if field_name != 'id':
-                            if isinstance(field, ForeignKeyField) and field_name in data['data']:
-                                related_id = int(data['data'][field_name][0])
-                                related_obj = field.rel_model.get_by_id(related_id)
-                                setattr(new_item, field_name, related_obj)
-                            elif isinstance(field, BooleanField):
-                                value = bool(int(data['data'].get(field_name, ['0'])[0]))
-                                setattr(new_item, field_name, value)
-                            elif field_name in data['data']:
-                                if isinstance(new_item, self.user_model) and field_name == 'password':
-                                    hashed_password = self.user_model.hash_password(data['data'][field_name][0])
-                                    setattr(new_item, field_name, hashed_password)
-                                else:
-                                    setattr(new_item, field_name, data['data'][field_name][0])
+                    new_item = codec.decode(data['data'], model())
                     new_item.save()
                     return self.app.redirect(f'{self.base_url}{model_name}')
                 except Exception as e:
                     return 400, self.app.render_with_cache('admin/error.html', {
                         'error_code': 400,
-                        'current_user': self.auth.get_current_user(cookie_parts[1]).user,
+                        'current_user': current_user.user,
                     'message': f"Error creating object: {str(e)}",
                     'models': self.models,
                     'base_url': self.base_url
                 }), 'text/html'
 
-            related_objects = {}
-            for field_name, field in model._meta.fields.items():
-                if isinstance(field, ForeignKeyField):
-                    related_objects[field_name] = self.get_related_objects(field)
-
             return 200, self.app.render_with_cache('admin/edit.html', {
                 'model': model,
+                'codec': codec,
                 'item': None,
+                'values': codec.values(None),
                 'models': self.models,
                 'base_url': self.base_url,
-                'related_objects': related_objects,
+                'related_objects': self.related_objects(codec),
                 'current_user': current_user.user
             }), 'text/html'
 
         @self.app.route(f'{self.base_url}<model_name>/edit/<item_id>', methods=['GET', 'POST'])
         @self.auth.login_required
         def admin_model_edit(data=None, model_name=None, item_id=None):
-            cookie = data['headers'].get('Cookie', '')
-            cookie_parts = cookie.split('=')
-            if len(cookie_parts) > 1:
-                current_user = self.auth.get_current_user(cookie_parts[1])
-            else:
-                current_user = None
+            current_user = self.auth.get_current_user(get_cookie(data, 'session'))
 
             if current_user.user.is_admin == False:
                 return self.app.redirect(f'{self.base_url}logout')
@@ -164,7 +205,7 @@ class DarkAdmin:
             if not model:
                 return 404, self.app.render_with_cache('admin/error.html', {
                     'error_code': 404,
-                    'current_user': self.auth.get_current_user(cookie_parts[1]).user,
+                    'current_user': current_user.user,
                     'message': f"Model {model_name} not found",
                     'models': self.models,
                     'base_url': self.base_url
@@ -176,65 +217,41 @@ class DarkAdmin:
             except Exception as e:
                 return 404, self.app.render_with_cache('admin/error.html', {
                     'error_code': 404,
-                    'current_user': self.auth.get_current_user(cookie_parts[1]).user, 'message': f"Item not found: {str(e)}",
+                    'current_user': current_user.user, 'message': f"Item not found: {str(e)}",
                                                                  'base_url': self.base_url,
                                                                  'models': self.models
                                                                 }), 'text/html'
 
+            codec = self.codecs[model_name]
             if data['method'] == 'POST':
                 try:
-                    for field_name, field in model.get_fields():
-                        if field_name in data['data']:
-                            if isinstance(field, ForeignKeyField):
-                                related_id = int(data['data'][field_name][0])
-                                related_obj = field.rel_model.get_by_id(related_id)
-                                setattr(item, field_name, related_obj)
-                            elif isinstance(field, BooleanField):
-                                values = data['data'].get(field_name, ['0'])
-                                value = bool(int(values[-1]))
-                                setattr(item, field_name, value)
-                            else:
-                                if isinstance(item, self.user_model) and field_name == 'password':
-                                    if data['data'][field_name][0] != item.password:
-                                        hashed_password = self.user_model.hash_password(data['data'][field_name][0])
-                                        setattr(item, field_name, hashed_password)
-                                else:
-                                    setattr(item, field_name, data['data'][field_name][0])
-
+                    codec.decode(data['data'], item)
                     item.save()
                     return self.app.redirect(f'{self.base_url}{model_name}')
                 except Exception as e:
                     return 400, self.app.render_with_cache('admin/error.html', {
                         'error_code': 400,
-                        'current_user': self.auth.get_current_user(cookie_parts[1]).user,
+                        'current_user': current_user.user,
                     'message': f"Error updating object: {str(e)}",
                     'models': self.models,
                     'base_url': self.base_url
                 }), 'text/html'
 
-            related_objects = {}
-            for field_name, field in model.get_fields():
-                if isinstance(field, ForeignKeyField):
-                    related_objects[field_name] = self.get_related_objects(field)
-
             return 200, self.app.render_with_cache('admin/edit.html', {
                 'model': model,
+                'codec': codec,
                 'item': item,
+                'values': codec.values(item),
                 'models': self.models,
                 'base_url': self.base_url,
-                'related_objects': related_objects,
+                'related_objects': self.related_objects(codec),
                 'current_user': current_user.user
             }), 'text/html'
 
         @self.app.route(f'{self.base_url}<model_name>/delete/<item_id>', methods=['GET', 'POST'])
         @self.auth.login_required
         def admin_model_delete(data=None, model_name=None, item_id=None):
-            cookie = data['headers'].get('Cookie', '')
-            cookie_parts = cookie.split('=')
-            if len(cookie_parts) > 1:
-                current_user = self.auth.get_current_user(cookie_parts[1])
-            else:
-                current_user = None
+            current_user = self.auth.get_current_user(get_cookie(data, 'session'))
 
             if current_user.user.is_admin == False:
                 return self.app.redirect(f'{self.base_url}logout')
@@ -242,7 +259,7 @@ class DarkAdmin:
             if not model:
                 return 404, self.app.render_with_cache('admin/error.html', {
                     'error_code': 404,
-                    'current_user': self.auth.get_current_user(cookie_parts[1]).user,
+                    'current_user': current_user.user,
                     'message': f"Model {model_name} not found",
                     'models': self.models,
                     'base_url': self.base_url
@@ -253,7 +270,7 @@ class DarkAdmin:
             except ValueError:
                 return 400, self.app.render_with_cache('admin/error.html', {
                     'error_code': 400,
-                    'current_user': self.auth.get_current_user(cookie_parts[1]).user,
+                    'current_user': current_user.user,
                     'message': f"Invalid item ID: {item_id}",
                     'base_url': self.base_url,
                     'models': self.models
@@ -261,7 +278,7 @@ class DarkAdmin:
             except model.DoesNotExist:
                 return 404, self.app.render_with_cache('admin/error.html', {
                     'error_code': 404,
-                    'current_user': self.auth.get_current_user(cookie_parts[1]).user,
+                    'current_user': current_user.user,
                     'message': f"Item with id {item_id} not found",
                     'base_url': self.base_url,
                     'models': self.models
@@ -274,7 +291,7 @@ class DarkAdmin:
                 except Exception as e:
                     return 500, self.app.render_with_cache('admin/error.html', {
                         'error_code': 500,
-                        'current_user': self.auth.get_current_user(cookie_parts[1]).user,
+                        'current_user': current_user.user,
                         'message': f"Error deleting object: {str(e)}",
                         'base_url': self.base_url,
                         'models': self.models
@@ -1,14 +1,25 @@
-import json
+from itertools import chain
 import os
-from pprint import pprint
 import re
 from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
 import time
 from jinja2 import Environment, FileSystemLoader, ChoiceLoader
 import urllib.parse
 
+from . import identitymap, logs
 from .core import PluginConfig, PluginManager, Request
+from .ratelimit import RateLimiter, get_client_ip
+from .request import RequestData, parse_cookies, parse_session
+from .serializers import dumps, is_streamable, stream_json
 from .admin import DarkAdmin
+from .batch import BatchEndpoint
+from .metrics import Metrics
+from .profiler import SamplingProfiler, route_tag
+from .querylog import QueryLog
+from .indexadvisor import IndexAdvisor
+from .schema import sync_schema
+from .tracing import Tracer, current_trace, record, span
 from .orm import User, Session, conn
 
 
@@ -19,6 +30,7 @@ class DarkFream:
     def __init__(self):
         """Инициализирует DarkFream с необходимыми компонентами, такими как маршруты и шаблоны."""
         self.routes = {}
+        self.route_paths = {}
         self.static_handlers = {}
         framework_templates_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
         user_templates_dir = os.path.join(os.getcwd(), 'templates')
@@ -27,9 +39,22 @@ class DarkFream:
             FileSystemLoader(framework_templates_dir)
         ]))
         self.env.globals['getattr'] = getattr
+        self.rate_limiter = RateLimiter()
         self.admin = DarkAdmin(self)
+        self.batch = None
         self.plugin_manager = PluginManager()
         self.plugin_config = PluginConfig()
+        self.plugins = {}
+        self.profile_middleware = False
+        self.metrics = None
+        self.tracer = None
+        self.profiler = None
+        self.query_log = None
+        self.index_advisor = None
+        self.identity_map = True
+        self.pipeline = None
+        self._pipeline_handler = None
+        self._pipeline_version = None
 
     def mount(self, prefix, handler, name=None):
         """Подключает статический обработчик к указанному префиксу.
@@ -41,20 +66,74 @@ class DarkFream:
         """
         self.static_handlers[prefix] = handler
 
-    def load_plugins(self):
-        """Загружает все включенные плагины и инициализирует их."""
+    def load_plugins(self, discover=True):
+        """Загружает все включенные плагины и инициализирует их.
+
+        Плагины из entry points импортируются только если включены. Плагины с
+        initialization = 'lazy' инициализируются при первом get_plugin, а с
+        'background' - в фоновом потоке, не задерживая запуск сервера.
+
+        Args:
+            discover (bool, optional): Искать плагины в entry points. По умолчанию True.
+        """
+        if discover:
+            self.plugin_manager.discover_plugins()
         for plugin_name in self.plugin_config.enabled_plugins:
+            if plugin_name in self.plugins:
+                continue
             plugin_class = self.plugin_manager.get_plugin(plugin_name)
-            if plugin_class:
-                plugin = plugin_class(self)
+            if not plugin_class:
+                logs.warning(f"Plugin '{plugin_name}' is enabled but not registered")
+                continue
+            plugin = plugin_class(self)
+            self.plugins[plugin_name] = plugin
+            mode = getattr(plugin, 'initialization', 'eager')
+            if not hasattr(plugin, 'ensure_initialized'):
                 plugin.initialize()
+            elif mode == 'background':
+                threading.Thread(target=plugin.ensure_initialized,
+                                 name=f'darkfream-plugin-{plugin_name}', daemon=True).start()
+            elif mode != 'lazy':
+                plugin.ensure_initialized()
+        logs.info(self.plugin_startup_report())
+
+    def get_plugin(self, plugin_name):
+        """Возвращает загруженный плагин, при необходимости инициализируя его.
+
+        Args:
+            plugin_name (str): Имя плагина.
+
+        Returns:
+            BasePlugin: Экземпляр плагина или None, если плагин не загружен.
+        """
+        plugin = self.plugins.get(plugin_name)
+        if plugin is not None and hasattr(plugin, 'ensure_initialized'):
+            plugin.ensure_initialized()
+        return plugin
+
+    def plugin_startup_report(self):
+        """Формирует отчет о времени импорта и инициализации плагинов.
 
-    def route(self, path, methods=['GET']):
+        Returns:
+            str: Таблица с режимом, временем импорта и инициализации каждого плагина.
+        """
+        lines = [f"{'plugin':<24} {'mode':<11} {'import ms':>10} {'init ms':>10}"]
+        for plugin_name, plugin in self.plugins.items():
+            import_ms = self.plugin_manager.import_times.get(plugin_name)
+            init_ms = getattr(plugin, 'init_ms', None)
+            lines.append(f"{plugin_name:<24} {getattr(plugin, 'initialization', 'eager'):<11} "
+                         f"{'-' if import_ms is None else f'{import_ms:.2f}':>10} "
+                         f"{'pending' if init_ms is None else f'{init_ms:.2f}':>10}")
+        return '\n'.join(lines)
+
+    def route(self, path, methods=['GET'], rate_limit=None):
         """Декоратор для регистрации маршрута.
 
         Args:
             path (str): Путь для маршрута.
             methods (list, optional): Список HTTP-методов, поддерживаемых маршрутом. По умолчанию ['GET'].
+            rate_limit (RateLimit or list, optional): Лимиты запросов для маршрута.
+                Проверяются до вызова обработчика. По умолчанию None.
 
         Returns:
             callable: Обернутый обработчик маршрута.
@@ -65,12 +144,17 @@ class DarkFream:
         def wrapper(func):
             if path_regex not in self.routes:
                 self.routes[path_regex] = {}
+                self.route_paths[path_regex] = path
+
+            handler = func
+            if rate_limit:
+                handler = self.rate_limiter.limit(rate_limit, path_regex)(func)
 
             if '*' in methods:
-                self.routes[path_regex]['*'] = func
+                self.routes[path_regex]['*'] = handler
             else:
                 for method in methods:
-                    self.routes[path_regex][method] = func
+                    self.routes[path_regex][method] = handler
 
             return func
         return wrapper
@@ -87,8 +171,240 @@ class DarkFream:
         self.routes['404'] = func
         return func
 
+    def enable_metrics(self, path='/metrics', multiprocess_dir=None, **options):
+        """Включает сбор метрик и маршрут для Prometheus.
+
+        Args:
+            path (str, optional): Путь маршрута метрик. По умолчанию '/metrics'.
+            multiprocess_dir (str, optional): Каталог для объединения метрик
+                нескольких процессов. По умолчанию None.
+            **options: Дополнительные параметры Metrics (buckets, flush_interval).
+
+        Returns:
+            Metrics: Объект метрик; повторный вызов возвращает уже подключенный.
+        """
+        if self.metrics is not None:
+            return self.metrics
+        self.metrics = Metrics(multiprocess_dir=multiprocess_dir, **options)
+        conn.add_query_listener(self.metrics.on_query)
+
+        @self.route(path)
+        def metrics_endpoint(data):
+            return 200, self.metrics.render(), {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+        return self.metrics
+
+    def enable_batch(self, path='/api/batch', max_workers=8, max_requests=20, rate_limit=None):
+        """Включает маршрут пакетных API-запросов (см. BatchEndpoint).
+
+        Маршрут выполняет до max_requests подзапросов за один вызов, поэтому
+        он не регистрируется по умолчанию.
+
+        Args:
+            path (str, optional): Путь маршрута. По умолчанию '/api/batch'.
+            max_workers (int, optional): Размер пула потоков. По умолчанию 8.
+            max_requests (int, optional): Максимум подзапросов в пакете. По умолчанию 20.
+            rate_limit (RateLimit or list, optional): Лимит, списываемый за каждый
+                подзапрос. По умолчанию 120 в минуту на IP.
+
+        Returns:
+            BatchEndpoint: Маршрут пакетных запросов; повторный вызов возвращает его же.
+        """
+        if self.batch is None:
+            self.batch = BatchEndpoint(self, path=path, max_workers=max_workers,
+                                       max_requests=max_requests, rate_limit=rate_limit)
+        return self.batch
+
+    def enable_tracing(self, sample_rate=0.0, debug=False, buffer_size=200):
+        """Включает трассировку фаз обработки запросов.
+
+        Трассируемые запросы получают заголовок Server-Timing, а их трассы
+        доступны на странице /admin/traces.
+
+        Args:
+            sample_rate (float, optional): Доля трассируемых запросов. По умолчанию 0.
+            debug (bool, optional): Трассировать все запросы. По умолчанию False.
+            buffer_size (int, optional): Число хранимых трасс. По умолчанию 200.
+
+        Returns:
+            Tracer: Трассировщик; повторный вызов возвращает уже подключенный.
+        """
+        if self.tracer is None:
+            self.tracer = Tracer(sample_rate=sample_rate, debug=debug, buffer_size=buffer_size)
+            conn.add_query_listener(self.tracer.on_query)
+        return self.tracer
+
+    def enable_profiler(self, rate=100, include_idle=False, signal_number=None, output=None, start=False):
+        """Подключает сэмплирующий профилировщик.
+
+        Профилировщиком управляют через /admin/profiler или сигнал
+        (по умолчанию SIGUSR2): первый сигнал запускает выборку, второй
+        останавливает ее и сохраняет collapsed stacks в output.
+
+        Args:
+            rate (float, optional): Частота выборки в герцах. По умолчанию 100.
+            include_idle (bool, optional): Учитывать потоки вне запросов. По умолчанию False.
+            signal_number (int, optional): Сигнал для переключения. По умолчанию SIGUSR2.
+            output (str, optional): Файл для результата, сохраняемого по сигналу.
+            start (bool, optional): Сразу запустить выборку. По умолчанию False.
+
+        Returns:
+            SamplingProfiler: Профилировщик; повторный вызов возвращает уже подключенный.
+        """
+        if self.profiler is None:
+            self.profiler = SamplingProfiler(rate=rate, include_idle=include_idle)
+            self.profiler.install_signal(signal_number, output)
+        if start:
+            self.profiler.start()
+        return self.profiler
+
+    def enable_query_log(self, slow_ms=100.0, debug=False):
+        """Включает учет SQL-запросов по HTTP-запросам и журнал медленных запросов.
+
+        Args:
+            slow_ms (float, optional): Порог медленного запроса в миллисекундах. По умолчанию 100.
+            debug (bool, optional): Добавлять в ответы X-Query-Count и X-Query-Time. По умолчанию False.
+
+        Returns:
+            QueryLog: Журнал запросов; повторный вызов возвращает уже подключенный.
+        """
+        if self.query_log is None:
+            self.query_log = QueryLog(self, slow_ms=slow_ms, debug=debug)
+        return self.query_log
+
+    def enable_index_advisor(self, max_shapes=1000):
+        """Начинает собирать формы SQL-запросов для IndexAdvisor.
+
+        Отчет о полных просмотрах таблиц - app.index_advisor.report(),
+        применение индексов - migrate(indexes=app.index_advisor.suggestions()).
+
+        Args:
+            max_shapes (int, optional): Максимум форм запросов. По умолчанию 1000.
+
+        Returns:
+            IndexAdvisor: Советник по индексам; повторный вызов возвращает уже подключенный.
+        """
+        if self.index_advisor is None:
+            self.index_advisor = IndexAdvisor(max_shapes=max_shapes)
+            self.index_advisor.start()
+        return self.index_advisor
+
+    def compile_middleware(self):
+        """Собирает хуки плагинов в цепочку обработки запроса.
+
+        Вызывается при запуске сервера и автоматически пересобирает цепочку,
+        если после этого были зарегистрированы новые хуки.
+
+        Returns:
+            callable: Функция (path, method, data) -> ответ.
+        """
+        self.pipeline = self.plugin_manager.compile_middleware(profile=self.profile_middleware)
+        self._pipeline_handler = self.pipeline.compile(self.dispatch)
+        self._pipeline_version = (self.plugin_manager.hooks_version, self.profile_middleware)
+        return self._pipeline_handler
+
+    def middleware_timings(self):
+        """Возвращает разбивку времени по middleware.
+
+        Заполняется, только если profile_middleware = True.
+
+        Returns:
+            list: Отчет MiddlewarePipeline.timing_report().
+        """
+        if self.pipeline is None:
+            return []
+        return self.pipeline.timing_report()
+
     def handle_request(self, path, method='GET', data=None):
-        """Обрабатывает входящий HTTP-запрос.
+        """Обрабатывает входящий HTTP-запрос через цепочку middleware.
+
+        Пока identity_map включен, запрос получает свою карту объектов
+        (identitymap), которая очищается по его завершении.
+
+        Args:
+            path (str): Путь запроса.
+            method (str, optional): HTTP-метод запроса. По умолчанию 'GET'.
+            data (dict, optional): Данные запроса. По умолчанию None.
+
+        Returns:
+            tuple: Кортеж, содержащий статус-код, тело ответа и тип контента.
+        """
+        handler = self._pipeline_handler
+        if self._pipeline_version != (self.plugin_manager.hooks_version, self.profile_middleware):
+            handler = self.compile_middleware()
+        scope = identitymap.begin() if self.identity_map else None
+        try:
+            if self.tracer is None and self.query_log is None:
+                return handler(path, method, data)
+            return self.handle_instrumented(handler, path, method, data)
+        finally:
+            identitymap.end(scope)
+
+    def handle_instrumented(self, handler, path, method, data):
+        """Выполняет запрос с трассировкой и учетом SQL-запросов.
+
+        Трасса начинается здесь, только если DarkHandler еще не решил, нужно
+        ли трассировать запрос (ключ traced в data): иначе запрос проходил бы
+        выборку дважды.
+
+        Args:
+            handler (callable): Скомпилированная цепочка middleware.
+            path (str): Путь запроса.
+            method (str): HTTP-метод запроса.
+            data (dict): Данные запроса.
+
+        Returns:
+            tuple: Кортеж, содержащий статус-код, тело ответа и заголовки.
+        """
+        tracer = self.tracer
+        query_log = self.query_log
+        headers = data.get('headers') if isinstance(data, dict) else None
+        trace = None
+        if tracer is not None and not (isinstance(data, dict) and 'traced' in data):
+            trace = tracer.begin(method, path, headers, data.get('request_id') if isinstance(data, dict) else None)
+        stats = query_log.begin(data) if query_log is not None else None
+        status_code = None
+        try:
+            if tracer is not None and isinstance(data, dict) and 'request_id' not in data:
+                data['request_id'] = trace.request_id if trace is not None else tracer.request_id(headers)
+            status_code, body, content_type = handler(path, method, data)
+            if stats is not None and isinstance(data, dict):
+                data['query_stats'] = stats
+            content_type = self.debug_headers(content_type, data, stats)
+            return status_code, body, content_type
+        finally:
+            if stats is not None:
+                query_log.end(stats)
+            if tracer is not None:
+                tracer.end(trace, status_code)
+
+    def debug_headers(self, content_type, data, stats=None):
+        """Добавляет к ответу X-Request-ID, Server-Timing и X-Query-* заголовки.
+
+        Args:
+            content_type (str or dict): Тип контента или словарь заголовков ответа.
+            data (dict): Данные запроса.
+            stats (QueryStats, optional): Счетчики SQL-запросов.
+
+        Returns:
+            dict: Заголовки ответа.
+        """
+        headers = dict(content_type) if isinstance(content_type, dict) else {'Content-Type': content_type}
+        if isinstance(data, dict) and data.get('request_id'):
+            headers['X-Request-ID'] = data['request_id']
+        trace = current_trace()
+        if trace is not None:
+            headers['Server-Timing'] = trace.server_timing()
+        if stats is not None:
+            headers.update(self.query_log.headers(stats))
+        return headers
+
+    def dispatch(self, path, method='GET', data=None):
+        """Находит маршрут и вызывает его обработчик.
+
+        Строка запроса не участвует в сопоставлении маршрута; ее параметры
+        передаются обработчику в data['query'], а шаблон найденного маршрута -
+        в data['route'].
 
         Args:
             path (str): Путь запроса.
@@ -100,7 +416,7 @@ class DarkFream:
         """
         headers = {
             'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+            'Access-Control-Allow-Methods': 'GET, POST, PUT, PATCH, DELETE, OPTIONS',
             'Access-Control-Allow-Headers': 'Content-Type',
             'Access-Control-Allow-Credentials': 'true'
         }
@@ -108,40 +424,75 @@ class DarkFream:
         if method == 'OPTIONS':
             return 204, '', headers
 
+        path, _, query_string = path.partition('?')
+        if isinstance(data, dict) and 'query' not in data:
+            data['query'] = urllib.parse.parse_qs(query_string)
+
+        route_start = time.perf_counter()
         for pattern, methods in self.routes.items():
             match = re.match(pattern, path)
             if match and (method in methods or '*' in methods):
                 kwargs = match.groupdict()
-                result = methods.get(method, methods.get('*'))(data, **kwargs)
-
-                if isinstance(result, tuple):
-                    if len(result) == 3:
-                        status_code, response_body, content_type = result
-                        if isinstance(content_type, dict):
-                            content_type.update(headers)
-                    elif len(result) == 2:
-                        status_code, response_body = result
-                        content_type = 'text/html'
+                handler = methods.get(method, methods.get('*'))
+                if isinstance(data, dict):
+                    data['route'] = pattern
+                record('route', route_start, time.perf_counter() - route_start)
+
+                route_path = self.route_paths.get(pattern, pattern)
+                with span('handler'), route_tag(self.profiler, route_path):
+                    if self.metrics is not None:
+                        response = self.metrics.track(
+                            route_path, method,
+                            lambda: self.build_response(handler(data, **kwargs), data, headers))
                     else:
-                        raise ValueError(f"Invalid return value from route handler: {result}")
-                else:
-                    status_code = 200
-                    response_body = result
-                    content_type = 'text/html'
+                        response = self.build_response(handler(data, **kwargs), data, headers)
+                if response is not None:
+                    return response
+                route_start = time.perf_counter()
 
-                if content_type == 'application/json':
-                    return status_code, response_body, content_type
+        if self.metrics is not None:
+            self.metrics.count_unmatched(method)
+        return 404, "404 Not Found", 'text/html'
 
-                if isinstance(response_body, str):
-                    return status_code, response_body, content_type
+    def build_response(self, result, data, headers):
+        """Приводит результат обработчика маршрута к кортежу ответа.
 
-                if isinstance(response_body, dict):
-                    context = response_body
-                    if 'session' not in context:
-                        context['session'] = data.get('session', {})
-                    return status_code, self.render_with_cache(response_body.get('template', 'admin/base.html'), context), content_type
+        Args:
+            result: Значение, возвращенное обработчиком.
+            data (dict): Данные запроса.
+            headers (dict): CORS-заголовки, добавляемые к словарю заголовков ответа.
 
-        return 404, "404 Not Found", 'text/html'
+        Returns:
+            tuple: Кортеж (статус, тело, тип контента) или None, если результат
+                не удалось преобразовать и нужно продолжить поиск маршрута.
+        """
+        if isinstance(result, tuple):
+            if len(result) == 3:
+                status_code, response_body, content_type = result
+                if isinstance(content_type, dict):
+                    content_type.update(headers)
+            elif len(result) == 2:
+                status_code, response_body = result
+                content_type = 'text/html'
+            else:
+                raise ValueError(f"Invalid return value from route handler: {result}")
+        else:
+            status_code = 200
+            response_body = result
+            content_type = 'text/html'
+
+        if content_type == 'application/json':
+            return status_code, response_body, content_type
+
+        if isinstance(response_body, (str, bytes)) or hasattr(response_body, '__next__'):
+            return status_code, response_body, content_type
+
+        if isinstance(response_body, dict):
+            context = response_body
+            if 'session' not in context:
+                context['session'] = data.get('session', {})
+            return status_code, self.render_with_cache(response_body.get('template', 'admin/base.html'), context), content_type
+        return None
 
     def render(self, template_name, context={}):
         """Рендерит шаблон с заданным контекстом.
@@ -154,7 +505,7 @@ class DarkFream:
             str: Содержимое отрендеренного шаблона.
         """
         template = self.env.get_template(template_name)
-        return template.render(context)
+        return self.render_template(template, template_name, context)
 
     def render_code(self, status_code, message, template_name=None, context=None):
         """Рендерит ответ с заданным статусом и сообщением.
@@ -200,7 +551,29 @@ class DarkFream:
             str: Содержимое отрендеренного шаблона.
         """
         template = self.cache_template(template_name)
-        return template.render(context)
+        return self.render_template(template, template_name, context)
+
+    def render_template(self, template, template_name, context):
+        """Рендерит загруженный шаблон, учитывая время в метриках и трассе запроса.
+
+        Args:
+            template (Template): Шаблон Jinja.
+            template_name (str): Имя шаблона.
+            context (dict): Контекст для шаблона.
+
+        Returns:
+            str: Содержимое отрендеренного шаблона.
+        """
+        if self.metrics is None:
+            with span('render'):
+                return template.render(context)
+        start = time.perf_counter()
+        try:
+            return template.render(context)
+        finally:
+            seconds = time.perf_counter() - start
+            record('render', start, seconds)
+            self.metrics.observe_template(template_name, seconds)
 
     def redirect(self, path, method='GET'):
         """Перенаправляет на указанный путь.
@@ -238,6 +611,9 @@ class DarkFream:
     def api_handler(self, func):
         """Обработчик для API маршрута, обрабатывающий ошибки.
 
+        Если обработчик возвращает запрос DarkModel, генератор или итератор,
+        ответ отдается потоком (см. stream_response).
+
         Args:
             func (callable): Обработчик API.
 
@@ -247,11 +623,52 @@ class DarkFream:
         def wrapper(data, *args, **kwargs):
             try:
                 result = func(data, *args, **kwargs)
+                if is_streamable(result):
+                    return self.stream_response(200, result, ndjson=self.wants_ndjson(data))
                 return self.json_response(200, result)
             except Exception as e:
-                print(str(e))
+                logs.error(str(e), path=data.get('path') if isinstance(data, dict) else None)
                 return self.json_response(500, {"error": str(e)})
         return wrapper
+
+    def wants_ndjson(self, data):
+        """Проверяет, запросил ли клиент NDJSON.
+
+        Args:
+            data (dict): Данные запроса.
+
+        Returns:
+            bool: True при заголовке Accept: application/x-ndjson или параметре ?format=ndjson.
+        """
+        if not data:
+            return False
+        accept = (data.get('headers') or {}).get('Accept') or ''
+        if 'application/x-ndjson' in accept:
+            return True
+        query = urllib.parse.urlsplit(data.get('path') or '').query
+        return 'ndjson' in urllib.parse.parse_qs(query).get('format', [])
+
+    def stream_response(self, status_code, data, ndjson=False):
+        """Создает потоковый JSON-ответ.
+
+        Строки запроса читаются курсором и сериализуются фрагментами, поэтому
+        потребление памяти не растет с размером ответа. Первый фрагмент
+        формируется сразу: ошибка выполнения запроса выбрасывается здесь, пока
+        заголовки еще не отправлены, и обработчик может ответить статусом 500.
+
+        Args:
+            status_code (int): Код статуса HTTP.
+            data: Запрос DarkModel, генератор или итератор строк.
+            ndjson (bool, optional): Отдавать NDJSON вместо JSON-массива. По умолчанию False.
+
+        Returns:
+            tuple: Кортеж, содержащий код статуса, генератор фрагментов и заголовки.
+        """
+        headers = self.json_headers('application/x-ndjson' if ndjson else 'application/json')
+        chunks = stream_json(data, ndjson=ndjson)
+        first = next(chunks, b'')
+        return status_code, chain((first,), chunks), headers
+
     def json_response(self, status_code, data):
         """Создает JSON-ответ с заданным статусом и данными.
 
@@ -262,15 +679,24 @@ class DarkFream:
         Returns:
             tuple: Кортеж, содержащий код статуса, JSON-строку и заголовки для ответа.
         """
-        import json
-        response_body = json.dumps(data)
-        headers = {
-            'Content-Type': 'application/json',
+        response_body = dumps(data)
+        return status_code, response_body, self.json_headers()
+
+    def json_headers(self, content_type='application/json'):
+        """Возвращает заголовки JSON-ответа.
+
+        Args:
+            content_type (str, optional): Тип содержимого. По умолчанию 'application/json'.
+
+        Returns:
+            dict: Content-Type и заголовки CORS.
+        """
+        return {
+            'Content-Type': content_type,
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
             'Access-Control-Allow-Headers': 'Content-Type'
         }
-        return status_code, response_body, headers
 
 
     def run(self, server_address='', port=8000):
@@ -281,13 +707,14 @@ class DarkFream:
             port (int): Порт, на котором будет запущен сервер. По умолчанию 8000.
         """
         self.load_plugins()
+        self.compile_middleware()
         try:
             handler = get_handler() or DarkHandler
             httpd = HTTPServer((server_address, port), handler)
-            print(f'Serving on port {port}...')
+            logs.info(f'Serving on port {port}...')
             httpd.serve_forever()
         except KeyboardInterrupt:
-            print('Server stopped')
+            logs.info('Server stopped')
 
     async def __call__(self, scope, receive, send):
         request = Request(scope, receive)
@@ -336,46 +763,129 @@ class DarkHandler(BaseHTTPRequestHandler):
 
         Читает данные из запроса, обрабатывает их и возвращает ответ клиенту.
         """
+        self.handle_body_request('POST')
+
+    def do_PUT(self):
+        """Обрабатывает HTTP PUT запрос так же, как POST."""
+        self.handle_body_request('PUT')
+
+    def do_PATCH(self):
+        """Обрабатывает HTTP PATCH запрос так же, как POST."""
+        self.handle_body_request('PATCH')
+
+    def do_DELETE(self):
+        """Обрабатывает HTTP DELETE запрос так же, как POST."""
+        self.handle_body_request('DELETE')
+
+    def handle_body_request(self, method):
+        """Обрабатывает запрос, который может содержать тело.
+
+        Args:
+            method (str): HTTP-метод запроса.
+        """
         if self.darkfream is None:
             self.darkfream = self.__class__.initialize()
+        trace = self.begin_request(method)
+        status_code = None
+        request_data = None
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            content_type = self.headers.get('Content-Type', '')
+            with span('read'):
+                content_length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(content_length) if content_length else b''
 
-            if 'application/json' in content_type:
-                import json
-                parsed_data = json.loads(post_data.decode('utf-8'))
-            else:
-                parsed_data = urllib.parse.parse_qs(post_data.decode('utf-8'))
-
-            request_data = {
-                'method': 'POST',
-                'path': self.path,
-                'headers': dict(self.headers),
-                'data': parsed_data,
-                'session': self.parse_session()
-            }
-
-            status_code, response, content_type = self.darkfream.handle_request(self.path, method='POST', data=request_data)
-
-            self.send_response(status_code)
-            if isinstance(content_type, dict):
-                for header, value in content_type.items():
-                    self.send_header(header, value)
-            else:
-                self.send_header('Content-type', content_type)
-            self.end_headers()
+            request_data = RequestData(method, self.path, self.headers, self.client_address[0], body)
+            self.mark_traced(request_data, trace)
 
-            if isinstance(content_type, dict) and 'Location' in content_type:
-                return
+            status_code, response, content_type = self.darkfream.handle_request(self.path, method=method, data=request_data)
 
-            self.wfile.write(response.encode('utf-8'))
+            with span('write'):
+                self.send_response(status_code)
+                if isinstance(content_type, dict):
+                    for header, value in content_type.items():
+                        self.send_header(header, value)
+                else:
+                    self.send_header('Content-type', content_type)
+                self.end_headers()
+
+                if isinstance(content_type, dict) and 'Location' in content_type:
+                    return
+
+                self.write_body(response)
 
         except ConnectionAbortedError:
-            print('Client connection aborted')
+            logs.warning('Client connection aborted', path=self.path)
         except Exception as e:
-            print(f'Error handling POST request: {str(e)}')
+            status_code = status_code or 500
+            logs.error(f'Error handling {method} request: {str(e)}', path=self.path)
+        finally:
+            self.finish_request(method, trace, status_code, request_data)
+
+    def begin_request(self, method):
+        """Запоминает время начала запроса и начинает трассу, если запрос попал в выборку.
+
+        Args:
+            method (str): HTTP-метод запроса.
+
+        Returns:
+            Trace: Трасса или None.
+        """
+        self.request_started = time.perf_counter()
+        self.bytes_sent = 0
+        self.stream_error = None
+        tracer = self.darkfream.tracer
+        if tracer is None:
+            return None
+        return tracer.begin(method, self.path, self.headers)
+
+    def mark_traced(self, request_data, trace):
+        """Передает в данные запроса решение о трассировке, принятое в begin_request.
+
+        Ключ traced говорит handle_instrumented, что выборка уже сделана, и
+        запрос не трассируется повторно со второй случайной попыткой.
+
+        Args:
+            request_data (dict): Данные запроса.
+            trace (Trace): Трасса или None.
+        """
+        if self.darkfream.tracer is None:
+            return
+        request_data['traced'] = trace is not None
+        if trace is not None:
+            request_data['request_id'] = trace.request_id
+
+    def finish_request(self, method, trace, status_code, request_data=None):
+        """Завершает трассу и пишет запись в журнал доступа.
+
+        Args:
+            method (str): HTTP-метод запроса.
+            trace (Trace): Трасса или None.
+            status_code (int): Код ответа или None, если ответ не был отправлен.
+            request_data (dict, optional): Данные запроса.
+        """
+        if trace is not None:
+            self.darkfream.tracer.end(trace, status_code)
+        route = None
+        request_id = None
+        queries = {}
+        if request_data is not None:
+            route = request_data.get('route')
+            route = self.darkfream.route_paths.get(route, route)
+            request_id = request_data.get('request_id')
+            stats = request_data.get('query_stats')
+            if stats is not None:
+                queries = {'queries': stats.count, 'query_ms': round(stats.seconds * 1000.0, 3)}
+        logs.access(
+            method=method,
+            path=self.path,
+            route=route,
+            status=status_code,
+            duration_ms=round((time.perf_counter() - self.request_started) * 1000.0, 3),
+            bytes=self.bytes_sent,
+            client_ip=get_client_ip(self.headers, self.client_address[0]),
+            request_id=request_id,
+            **queries,
+            **({'stream_error': self.stream_error} if self.stream_error else {}),
+        )
 
     def do_OPTIONS(self):
         """Обрабатывает HTTP OPTIONS запрос.
@@ -384,15 +894,48 @@ class DarkHandler(BaseHTTPRequestHandler):
         """
         if self.darkfream is None:
             self.darkfream = self.__class__.initialize()
+        self.begin_request('OPTIONS')
+        status_code = None
         try:
             self.send_response(204)
             self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, PATCH, DELETE, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type')
             self.send_header('Access-Control-Allow-Credentials', 'true')
             self.end_headers()
+            status_code = 204
         except Exception as e:
-            print(f'Error handling OPTIONS request: {str(e)}')
+            logs.error(f'Error handling OPTIONS request: {str(e)}', path=self.path)
+        finally:
+            self.finish_request('OPTIONS', None, status_code)
+
+    def write_body(self, response):
+        """Записывает тело ответа в сокет.
+
+        Число записанных байт накапливается в bytes_sent для журнала доступа.
+        Ошибка во время потоковой передачи (заголовки уже отправлены)
+        сохраняется в stream_error для журнала доступа, а соединение
+        закрывается, чтобы клиент не принял обрезанный ответ за полный.
+
+        Args:
+            response (str, bytes or iterable): Тело ответа или итератор фрагментов
+                для потоковой передачи.
+        """
+        if isinstance(response, str):
+            response = response.encode('utf-8')
+        if isinstance(response, bytes):
+            self.wfile.write(response)
+            self.bytes_sent += len(response)
+        else:
+            try:
+                for chunk in response:
+                    chunk = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+                    self.wfile.write(chunk)
+                    self.bytes_sent += len(chunk)
+            except Exception as e:
+                self.stream_error = str(e)
+                self.close_connection = True
+                logs.error(f'Error streaming response: {str(e)}', path=self.path)
 
     def parse_session(self):
         """Парсит данные сессии из заголовка Cookie.
@@ -400,14 +943,7 @@ class DarkHandler(BaseHTTPRequestHandler):
         Returns:
             dict: Данные сессии, если они существуют, иначе пустой словарь.
         """
-        session_cookie = self.headers.get('Cookie')
-        if session_cookie:
-            try:
-                session_data = session_cookie.split('session=')[1].split(';')[0]
-                return json.loads(session_data)
-            except:
-                pass
-        return {}
+        return parse_session(parse_cookies(self.headers.get('Cookie', '')))
 
     def do_GET(self):
         """Обрабатывает HTTP GET запрос.
@@ -416,6 +952,9 @@ class DarkHandler(BaseHTTPRequestHandler):
         """
         if self.darkfream is None:
             self.darkfream = self.__class__.initialize()
+        trace = self.begin_request('GET')
+        status_code = None
+        request_data = None
         try:
             for prefix, handler in self.darkfream.static_handlers.items():
                 if self.path.startswith(prefix):
@@ -423,79 +962,83 @@ class DarkHandler(BaseHTTPRequestHandler):
                     self.send_response(status_code)
                     self.send_header('Content-type', content_type)
                     self.end_headers()
-                    if isinstance(content, str):
-                        self.wfile.write(content.encode('utf-8'))
-                    else:
-                        self.wfile.write(content)
+                    self.write_body(content)
                     return
 
-            request_data = {
-                'method': 'GET',
-                'path': self.path,
-                'headers': dict(self.headers),
-                'data': {},
-                'session': self.parse_session()
-            }
+            request_data = RequestData('GET', self.path, self.headers, self.client_address[0])
+            self.mark_traced(request_data, trace)
 
             status_code, response, content_type = self.darkfream.handle_request(
                 self.path, method='GET', data=request_data)
 
-            self.send_response(status_code)
-            if isinstance(content_type, dict):
-                for header, value in content_type.items():
-                    self.send_header(header, value)
-            else:
-            self.send_response(status_code)
-            if isinstance(content_type, dict):
-                for header, value in content_type.items():
-                    self.send_header(header, value)
-            else:
-                self.send_header('Content-type', content_type)
-            self.end_headers()
-            self.wfile.write(response.encode('utf-8'))
+            with span('write'):
+                self.send_response(status_code)
+                if isinstance(content_type, dict):
+                    for header, value in content_type.items():
+                        self.send_header(header, value)
+                else:
+                    self.send_header('Content-type', content_type)
+                self.end_headers()
+                self.write_body(response)
 
         except ConnectionAbortedError:
-            print('Client connection aborted')
+            logs.warning('Client connection aborted', path=self.path)
+        finally:
+            self.finish_request('GET', trace, status_code, request_data)
+
+    def log_request(self, code='-', size='-'):
+        """Отключает строку журнала BaseHTTPRequestHandler: запрос пишется в журнал доступа в finish_request."""
 
     def log_message(self, format, *args):
-        """Логирует сообщения о запросах.
+        """Пишет служебные сообщения сервера (например, об ошибочных запросах) в журнал.
 
         Args:
             format (str): Формат сообщения.
             *args: Дополнительные аргументы для форматирования сообщения.
         """
-        client_ip = self.headers.get('X-Forwarded-For', self.headers.get('X-Real-IP', self.client_address[0]))
-        print(f'{client_ip} - {self.client_address[0]} - - [{self.log_date_time_string()}] - %s' % (format % args))
+        headers = getattr(self, 'headers', None) or {}
+        logs.warning(format % args, client_ip=get_client_ip(headers, self.client_address[0]))
 
 
 
 from .global_config import get_user_model, set_user_model, get_handler
 
-def migrate(models=[], custom_user_model=None, initial_admin_data=None):
+def migrate(models=[], custom_user_model=None, initial_admin_data=None, indexes=None, force=False):
     """Мигрирует модели базы данных и создает начального администратора.
 
     Эта функция добавляет указанные модели в базу данных, настраивает пользовательскую модель пользователя,
     и создает начального администратора, если он еще не существует.
 
+    Схема сравнивается с моделями по сохраненному хэшу: если модели и индексы
+    не менялись, запуск ограничивается одним SELECT. Иначе отсутствующие
+    таблицы, колонки и индексы создаются в одной транзакции (см. schema.sync_schema).
+
     Args:
         models (list, optional): Список моделей для миграции. По умолчанию пустой список.
         custom_user_model (type, optional): Пользовательская модель пользователя, которая должна наследоваться от User.
         initial_admin_data (dict, optional): Данные для создания начального администратора. Должны включать 'username' и 'password'.
+        indexes (list, optional): Индексы для создания после таблиц: IndexSuggestion
+            (например, из IndexAdvisor.suggestions()) или SQL-строки CREATE INDEX.
+        force (bool, optional): Сравнить схему с моделями, даже если хэш совпадает.
+
+    Returns:
+        MigrationResult: Итог миграции; ложен, если схема не менялась.
 
     Raises:
         ValueError: Если custom_user_model не наследуется от User.
     """
-    models += [User , Session]
+    models = list(models) + [User, Session]
     if custom_user_model:
         if not issubclass(custom_user_model, User):
             raise ValueError("Custom user model must inherit from User class")
         set_user_model(custom_user_model)
-        print("Setting user model to:", custom_user_model)
+        logs.info(f"Setting user model to: {custom_user_model}")
 
     user_model = get_user_model() or User
+    if user_model not in models:
+        models.append(user_model)
     handler = get_handler() or DarkHandler
     handler.darkfream.admin.register_model(user_model)
-    print("Migrate user model:", user_model)
 
     default_admin = {
         'username': 'admin',
@@ -513,15 +1056,19 @@ def migrate(models=[], custom_user_model=None, initial_admin_data=None):
             default_admin.update(initial_admin_data)
 
     conn.connect()
-    conn.create_tables(models)
-
     try:
-        if not user_model.select().exists():
-            default_admin['password'] = user_model.hash_password(default_admin['password'])
-            user_model.create(**default_admin)
-            print(f"Created admin user: {default_admin['username']}")
+        with conn.atomic():
+            result = sync_schema(models, indexes or [], force=force)
+            if not result:
+                return result
+            logs.info(f"Migrate user model: {user_model}")
+            if not user_model.select().exists():
+                default_admin['password'] = user_model.hash_password(default_admin['password'])
+                user_model.create(**default_admin)
+                logs.info(f"Created admin user: {default_admin['username']}")
+        return result
     except Exception as e:
-        print(f"Error creating admin user: {str(e)}")
+        logs.error(f"Error migrating database: {str(e)}")
         raise
     finally:
         conn.close()
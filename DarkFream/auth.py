@@ -1,33 +1,34 @@
 from datetime import datetime, timedelta
 import json
-from pprint import pprint
 import uuid
 
+from . import logs
 from .config import DarkFreamConfig
 from .orm import User, Session
 from .global_config import get_user_model
+from .ratelimit import LOGIN_RATE_LIMITS
+from .request import get_cookie
+from .tracing import span
 
 class AdminAuth:
+    login_rate_limits = LOGIN_RATE_LIMITS
+
     def __init__(self, app):
         self.app = app
         self.base_url = '/admin/'
         self.user_model = get_user_model() or User
-        print("AdminAuth user model:", self.user_model)
+        logs.info(f"AdminAuth user model: {self.user_model}")
         self.register_routes()
 
     def register_routes(self):
-        self.app.route(f'{self.base_url}login', methods=['GET', 'POST'])(self.login)
+        self.app.route(f'{self.base_url}login', methods=['GET', 'POST'],
+                       rate_limit=self.login_rate_limits)(self.login)
         self.app.route(f'{self.base_url}logout')(self.logout)
 
     def login(self, data):
-        cookie = data['headers'].get('Cookie', '')
-        cookie_parts = cookie.split('=')
-        if len(cookie_parts) > 1:
-            logging = self.get_current_user(cookie_parts[1])
-        else:
-            logging = None
+        session = get_cookie(data, 'session')
+        logging = self.get_current_user(session)
         if logging:
-            session = data['headers']['Cookie'].split('=')[1]
             return 302, '', {
                 'Location': self.base_url,
                 'Content-Type': 'text/html',
@@ -71,17 +72,12 @@ class AdminAuth:
         }, 'text/html'
 
     def logout(self, data):
-        cookie = data['headers'].get('Cookie', '')
-        cookie_parts = cookie.split('=')
-        if len(cookie_parts) > 1:
-            session = self.get_current_user(cookie_parts[1])
-        else:
-            session = None
+        session = self.get_current_user(get_cookie(data, 'session'))
         if session:
             try:
                 Session.delete().where(Session.user == session.user).execute()
             except self.user_model.DoesNotExist:
-                print(f"User {session.user.username} does not exist during logout.")
+                logs.warning(f"User {session.user.username} does not exist during logout.")
         data['session'] = {}
         return 302, '', {
             'Location': f'{self.base_url}login',
@@ -93,12 +89,7 @@ class AdminAuth:
     def login_required(self, func):
         @wraps(func)
         def wrapper(data, *args, **kwargs):
-            cookie = data['headers'].get('Cookie', '')
-            cookie_parts = cookie.split('=')
-            if len(cookie_parts) > 1:
-                logging = self.get_current_user(cookie_parts[1])
-            else:
-                logging = None
+            logging = self.get_current_user(get_cookie(data, 'session'))
             if logging is None:
                 return (302, '', {
                     'Location': '/admin/login',
@@ -119,12 +110,13 @@ class AdminAuth:
 
     def get_current_user(self, session_id):
         if session_id:
-            try:
-                session_obj = Session.get(Session.session_id == session_id)
-                if session_obj.expires_at > datetime.utcnow():
-                    return session_obj
-            except Session.DoesNotExist:
-                return None
+            with span('session'):
+                try:
+                    session_obj = Session.get(Session.session_id == session_id)
+                    if session_obj.expires_at > datetime.utcnow():
+                        return session_obj
+                except Session.DoesNotExist:
+                    return None
         return None
 
 
@@ -132,6 +124,7 @@ from functools import wraps
 
 class Auth:
     base_url = '/'
+    login_rate_limits = LOGIN_RATE_LIMITS
 
     def __init__(self, app):
         """Инициализирует класс Auth с приложением.
@@ -141,14 +134,15 @@ class Auth:
         """
         self.app = app
         self.user_model = get_user_model() or User
-        print("Auth user model:", self.user_model)
+        logs.info(f"Auth user model: {self.user_model}")
 
     def login(self, data, redirect_uri=None):
         """Обрабатывает процесс аутентификации пользователя.
 
         Проверяет, есть ли активная сессия, и если да, перенаправляет пользователя.
         Если сессии нет и метод запроса POST, проверяет учетные данные пользователя.
-        Если учетные данные верны, создает новую сессию.
+        Если учетные данные верны, создает новую сессию. Перед проверкой пароля
+        применяются лимиты login_rate_limits, поэтому перебор отсекается без bcrypt.
 
         Args:
             data (dict): Данные запроса, содержащие информацию о пользователе и заголовки.
@@ -160,7 +154,7 @@ class Auth:
         logging = self.get_current_user(data)
         redirect = redirect_uri or self.base_url
         if logging:
-            session = data['headers']['Cookie'].split('=')[1]
+            session = get_cookie(data, 'session')
             return 302, '', {
                 'Location': redirect,
                 'Content-Type': 'text/html',
@@ -168,6 +162,11 @@ class Auth:
             }
 
         if data['method'] == 'POST':
+            rate_limiter = getattr(self.app, 'rate_limiter', None)
+            if rate_limiter is not None:
+                rejected = rate_limiter.check(self.login_rate_limits, data, 'auth:login')
+                if rejected is not None:
+                    return rejected
             username = data['data'].get('username', [''])[0]
             password = data['data'].get('password', [''])[0]
             try:
@@ -186,9 +185,9 @@ class Auth:
                         'Set-Cookie': f'session={session_id}; Path=/; HttpOnly; Expires={expires_at.strftime("%a, %d %b %Y %H:%M:%S GMT")}'
                     }
                 else:
-                    print('Invalid username or password')
+                    logs.info('Invalid username or password')
             except User.DoesNotExist:
-                print('Invalid username or password')
+                logs.info('Invalid username or password')
 
     def logout(self, data):
         """Обрабатывает выход пользователя из системы.
@@ -201,17 +200,12 @@ class Auth:
         Returns:
             tuple: Код состояния HTTP, пустой ответ и заголовки для перенаправления.
         """
-        cookie = data['headers'].get('Cookie', '')
-        cookie_parts = cookie.split('=')
-        if len(cookie_parts) > 1:
-            session = self.get_current_user(cookie_parts[1])
-        else:
-            session = None
+        session = self.get_current_user(data)
         if session:
             try:
                 Session.delete().where(Session.user == session.user).execute()
             except self.user_model.DoesNotExist:
-                print(f"User  {session.user.username} does not exist during logout.")
+                logs.warning(f"User {session.user.username} does not exist during logout.")
         data['session'] = {}
         return 302, '', {
             'Location': f'{self.base_url}login',
@@ -281,14 +275,13 @@ class Auth:
         """
         if data is None:
             return None
-        cookie = data['headers'].get('Cookie', '')
-        cookie_parts = cookie.split('=')
-        if cookie_parts:
-            try:
-                if cookie_parts[0] == 'session':
-                    session_obj = Session.get(Session.session_id == cookie_parts[1])
+        session_id = get_cookie(data, 'session')
+        if session_id:
+            with span('session'):
+                try:
+                    session_obj = Session.get(Session.session_id == session_id)
                     if session_obj.expires_at > datetime.utcnow():
                         return session_obj
-            except Session.DoesNotExist:
-                return None
+                except Session.DoesNotExist:
+                    return None
         return None
@@ -0,0 +1,164 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from . import logs
+from .ratelimit import RateLimit
+
+FORWARDED_HEADERS = ('Cookie', 'Authorization', 'Accept-Language', 'User-Agent',
+                     'X-Forwarded-For', 'X-Real-IP')
+
+
+class BatchEndpoint:
+    """Маршрут, выполняющий несколько API-запросов за один HTTP-запрос.
+
+    Тело запроса - JSON-массив подзапросов или объект {"requests": [...],
+    "sequential": false}. Подзапрос: {"method": "GET", "path": "/api/...",
+    "body": {...}, "headers": {...}}. Подзапросы выполняются через
+    handle_request без сокетов, независимые - параллельно в пуле потоков.
+    Cookie и заголовки клиента передаются в подзапросы, поэтому авторизация
+    и лимиты маршрутов работают как для обычных запросов. Кроме того, каждый
+    подзапрос списывает токен из лимита rate_limits (по умолчанию 120 в
+    минуту на IP), и пакет не позволяет обойти ограничение частоты;
+    отклоненные подзапросы получают статус 429.
+
+    Ответ - JSON-массив {"status", "headers", "body"} в порядке подзапросов.
+
+    Attributes:
+        app (DarkFream): Приложение.
+        path (str): Путь маршрута.
+        max_workers (int): Размер пула потоков.
+        max_requests (int): Максимальное число подзапросов в пакете.
+        rate_limits (list): Лимиты, которые списываются за каждый подзапрос.
+    """
+    def __init__(self, app, path='/api/batch', max_workers=8, max_requests=20, rate_limit=None):
+        """Инициализация и регистрация маршрута.
+
+        Args:
+            app (DarkFream): Приложение.
+            path (str, optional): Путь маршрута. По умолчанию '/api/batch'.
+            max_workers (int, optional): Размер пула потоков. По умолчанию 8.
+            max_requests (int, optional): Максимум подзапросов. По умолчанию 20.
+            rate_limit (RateLimit or list, optional): Лимит подзапросов. По умолчанию
+                120 в минуту на IP; пустой список отключает лимит.
+        """
+        self.app = app
+        self.path = path
+        self.max_workers = max_workers
+        self.max_requests = max_requests
+        if rate_limit is None:
+            rate_limit = RateLimit(120, per=60, key='ip')
+        self.rate_limits = [rate_limit] if isinstance(rate_limit, RateLimit) else list(rate_limit)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.app.route(path, methods=['POST'])(self.handle)
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='darkfream-batch')
+        return self._executor
+
+    def handle(self, data):
+        payload = data.get('data')
+        sequential = False
+        if isinstance(payload, dict):
+            sequential = bool(payload.get('sequential'))
+            payload = payload.get('requests')
+        if not isinstance(payload, list):
+            return self.app.json_response(400, {'error': 'Expected a JSON list of requests'})
+        if len(payload) > self.max_requests:
+            return self.app.json_response(400, {'error': f'At most {self.max_requests} requests per batch'})
+
+        items = []
+        for index, item in enumerate(payload):
+            problem = self.validate(item)
+            if problem:
+                return self.app.json_response(400, {'error': f'Request {index}: {problem}'})
+            items.append(self.build_request(data, item))
+
+        responses = [None] * len(items)
+        allowed = []
+        for index, item in enumerate(items):
+            rejected = self.app.rate_limiter.check(self.rate_limits, data, self.path) if self.rate_limits else None
+            if rejected is None:
+                allowed.append(index)
+            else:
+                responses[index] = {'status': rejected[0], 'headers': rejected[2], 'body': rejected[1]}
+
+        if sequential or len(allowed) < 2:
+            results = [self.execute(items[index]) for index in allowed]
+        else:
+            results = self.executor.map(self.execute, [items[index] for index in allowed])
+        for index, response in zip(allowed, results):
+            responses[index] = response
+        return self.app.json_response(200, responses)
+
+    def validate(self, item):
+        if not isinstance(item, dict):
+            return 'must be an object'
+        path = item.get('path')
+        if not isinstance(path, str) or not path.startswith('/'):
+            return 'path must be an absolute path'
+        if path.partition('?')[0] == self.path:
+            return 'nested batch requests are not allowed'
+        if str(item.get('method', 'GET')).upper() not in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE'):
+            return 'unsupported method'
+        if not isinstance(item.get('headers', {}), dict):
+            return 'headers must be an object'
+        return None
+
+    def build_request(self, data, item):
+        parent_headers = data.get('headers') or {}
+        headers = {name: parent_headers[name] for name in FORWARDED_HEADERS if name in parent_headers}
+        headers.update(item.get('headers') or {})
+        body = item.get('body')
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        return {
+            'method': str(item.get('method', 'GET')).upper(),
+            'path': item['path'],
+            'headers': headers,
+            'data': body if body is not None else {},
+            'session': dict(data.get('session') or {}),
+            'client_address': data.get('client_address'),
+        }
+
+    def execute(self, request):
+        """Выполняет один подзапрос.
+
+        Ошибка обработчика, чтения потокового тела или его разбора
+        возвращается как ответ этого подзапроса со статусом 500 и не
+        прерывает остальные подзапросы пакета.
+
+        Args:
+            request (dict): Данные подзапроса.
+
+        Returns:
+            dict: Статус, заголовки и тело ответа.
+        """
+        try:
+            status_code, body, content_type = self.app.handle_request(
+                request['path'], method=request['method'], data=request)
+            if isinstance(content_type, dict):
+                headers = {name: value for name, value in content_type.items()
+                           if not name.startswith('Access-Control-')}
+            else:
+                headers = {'Content-Type': content_type}
+
+            if hasattr(body, '__next__'):
+                body = b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in body)
+            if isinstance(body, bytes):
+                body = body.decode('utf-8')
+            if body and 'json' in headers.get('Content-Type', ''):
+                if 'ndjson' in headers['Content-Type']:
+                    body = [json.loads(line) for line in body.splitlines() if line]
+                else:
+                    body = json.loads(body)
+        except Exception as e:
+            logs.error(f'Error handling batch request: {str(e)}', path=request['path'])
+            return {'status': 500, 'headers': {}, 'body': {'error': str(e)}}
+        return {'status': status_code, 'headers': headers, 'body': body}
@@ -1,17 +1,19 @@
+from . import global_config
+
+
 class DarkFreamConfig:
     """Класс конфигурации для DarkFream.
 
     Этот класс реализует паттерн Singleton и предоставляет методы для настройки
-    пользовательской модели и числа раундов.
+    пользовательской модели и числа раундов. Число раундов хранится
+    в global_config, чтобы у хэширования паролей был единственный источник настроек.
 
     Attributes:
         _instance (DarkFreamConfig): Экземпляр класса, реализующий паттерн Singleton.
         _user_model (type): Пользовательская модель пользователя.
-        _round (int): Число раундов, используемое в конфигурации.
     """
     _instance = None
     _user_model = None
-    _round = 12
 
     def __new__(cls):
         """Создает новый экземпляр класса, если он еще не существует.
@@ -48,7 +50,7 @@ class DarkFreamConfig:
         Args:
             round (int): Число раундов, которое будет установлено.
         """
-        cls._round = round
+        global_config.set_round(round)
 
     @classmethod
     def get_round(cls):
@@ -57,4 +59,4 @@ class DarkFreamConfig:
         Returns:
             int: Текущее количество раундов.
         """
-        return cls._round
+        return global_config.get_round()
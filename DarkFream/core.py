@@ -1,8 +1,20 @@
-import smtplib
-from email.message import EmailMessage
+import ast
+from functools import lru_cache
+from importlib import metadata
 import math
 import os
 from pathlib import Path
+import threading
+import time
+
+from . import logs
+from .mail import build_message, enqueue_email, get_pool
+from .middleware import MiddlewarePipeline
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class Request:
     """Класс для обработки HTTP-запросов.
@@ -109,7 +121,7 @@ class StaticFiles:
             else:
                 return "File not found", 404, 'text/plain'
         except Exception as e:
-            print(f"Error serving static file: {e}")
+            logs.error(f"Error serving static file: {e}", path=request.path)
             return "Internal server error", 500, 'text/plain'
 
     def get_content_type(self, path):
@@ -190,53 +202,360 @@ def sin(x: float) -> float:
     """
     return math.sin(x)
 
-def calculator(input_str: str) -> float:
+def _as_array(values):
+    if np is None:
+        raise RuntimeError("NumPy is required for batch math functions. Install it with: pip install numpy")
+    return np.asarray(values, dtype=np.float64)
+
+
+def log_batch(values, base: float = math.e):
+    """Возвращает логарифмы последовательности чисел с заданным основанием.
+
+    Вычисление векторизуется NumPy; для недопустимых значений получаются
+    nan/-inf по правилам NumPy. Пакетные функции требуют NumPy: цикл по
+    скалярным функциям ничуть не быстрее обычного вызова log для каждого числа.
+
+    Args:
+        values: Список, array.array или numpy.ndarray чисел.
+        base (float): Основание логарифма (по умолчанию e).
+
+    Returns:
+        numpy.ndarray: Логарифмы чисел.
+
+    Raises:
+        RuntimeError: Если NumPy не установлен.
+    """
+    values = _as_array(values)
+    if base == math.e:
+        return np.log(values)
+    return np.log(values) / math.log(base)
+
+def sqrt_batch(values):
+    """Возвращает квадратные корни последовательности чисел.
+
+    Args:
+        values: Список, array.array или numpy.ndarray чисел.
+
+    Returns:
+        numpy.ndarray: Квадратные корни чисел.
+    """
+    values = _as_array(values)
+    return np.sqrt(values)
+
+def tan_batch(values):
+    """Возвращает тангенсы последовательности углов.
+
+    Args:
+        values: Список, array.array или numpy.ndarray углов в радианах.
+
+    Returns:
+        numpy.ndarray: Тангенсы углов.
+    """
+    values = _as_array(values)
+    return np.tan(values)
+
+def cos_batch(values):
+    """Возвращает косинусы последовательности углов.
+
+    Args:
+        values: Список, array.array или numpy.ndarray углов в радианах.
+
+    Returns:
+        numpy.ndarray: Косинусы углов.
+    """
+    values = _as_array(values)
+    return np.cos(values)
+
+def sin_batch(values):
+    """Возвращает синусы последовательности углов.
+
+    Args:
+        values: Список, array.array или numpy.ndarray углов в радианах.
+
+    Returns:
+        numpy.ndarray: Синусы углов.
+    """
+    values = _as_array(values)
+    return np.sin(values)
+
+_EXPRESSION_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.FloorDiv)
+_EXPRESSION_UNARYOPS = (ast.UAdd, ast.USub)
+_EXPRESSION_MAX_LENGTH = 10000
+_EXPRESSION_MAX_INT_BITS = 65536
+
+
+def _safe_pow(base, exponent):
+    # Размер результата целочисленной степени ограничен: большие степени
+    # считаются в float, а переполнение float превращается в ValueError.
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 \
+            and base.bit_length() * exponent > _EXPRESSION_MAX_INT_BITS:
+        return float(base) ** exponent
+    return base ** exponent
+
+
+_EXPRESSION_FUNCTIONS = {
+    'log': log,
+    'sqrt': sqrt,
+    'sin': sin,
+    'cos': cos,
+    'tan': tan,
+    'abs': abs,
+    'min': min,
+    'max': max,
+    'round': round,
+}
+_EXPRESSION_CONSTANTS = {
+    'pi': math.pi,
+    'e': math.e,
+}
+
+
+class _ExpressionCompiler:
+    """Проверяет дерево выражения и заменяет возведение в степень безопасной функцией.
+
+    Дерево обходится итеративно, поэтому длинные цепочки операций вроде
+    1+1+...+1 не упираются в предел рекурсии Python.
+    """
+
+    _ALLOWED = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+                ast.Name, ast.Call, ast.Load) + _EXPRESSION_BINOPS + _EXPRESSION_UNARYOPS
+
+    def __init__(self):
+        self.variables = []
+
+    def compile(self, tree):
+        """Проверяет дерево и возвращает тело выражения.
+
+        Args:
+            tree (ast.Expression): Разобранное выражение.
+
+        Returns:
+            ast.expr: Тело выражения с вызовами _pow вместо **.
+
+        Raises:
+            ValueError: Если выражение содержит недопустимые элементы.
+        """
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            self.check(node)
+            if isinstance(node, ast.Call):
+                children = node.args
+            else:
+                children = list(ast.iter_child_nodes(node))
+            stack.extend(reversed(children))
+        for node in ast.walk(tree):
+            for name, value in ast.iter_fields(node):
+                if isinstance(value, list):
+                    value[:] = [self.replace_pow(item) for item in value]
+                else:
+                    setattr(node, name, self.replace_pow(value))
+        return tree.body
+
+    def check(self, node):
+        if not isinstance(node, self._ALLOWED):
+            raise ValueError(f"Unsupported expression element: {type(node).__name__}")
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f"Unsupported constant: {node.value!r}")
+        elif isinstance(node, ast.Name):
+            if node.id.startswith('_'):
+                raise ValueError(f"Invalid name: {node.id}")
+            if node.id not in _EXPRESSION_FUNCTIONS and node.id not in _EXPRESSION_CONSTANTS \
+                    and node.id not in self.variables:
+                self.variables.append(node.id)
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _EXPRESSION_FUNCTIONS:
+                raise ValueError("Only the functions " + ", ".join(_EXPRESSION_FUNCTIONS) + " can be called")
+            if node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+                raise ValueError(f"Invalid arguments for {node.func.id}()")
+
+    @staticmethod
+    def replace_pow(node):
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            return ast.copy_location(ast.Call(func=ast.Name(id='_pow', ctx=ast.Load()),
+                                              args=[node.left, node.right], keywords=[]), node)
+        return node
+
+
+class CompiledExpression:
+    """Скомпилированное математическое выражение.
+
+    Выражение разбирается один раз и превращается в обычную функцию Python,
+    аргументы которой - переменные выражения в порядке первого появления.
+
+    Attributes:
+        source (str): Исходный текст выражения.
+        variables (tuple): Имена переменных выражения.
+    """
+    __slots__ = ('source', 'variables', '_function')
+
+    def __init__(self, source):
+        """Разбирает и компилирует выражение.
+
+        Args:
+            source (str): Текст выражения.
+
+        Raises:
+            ValueError: Если выражение некорректно или содержит недопустимые элементы.
+        """
+        if len(source) > _EXPRESSION_MAX_LENGTH:
+            raise ValueError("Expression is too long")
+        try:
+            tree = ast.parse(source.strip(), mode='eval')
+            compiler = _ExpressionCompiler()
+            body = compiler.compile(tree)
+            arguments = ast.arguments(posonlyargs=[], args=[ast.arg(arg=name) for name in compiler.variables],
+                                      kwonlyargs=[], kw_defaults=[], defaults=[])
+            function = ast.fix_missing_locations(ast.Expression(ast.Lambda(args=arguments, body=body)))
+            code = compile(function, '<expression>', 'eval')
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression: {e.msg}") from None
+        except (RecursionError, MemoryError):
+            raise ValueError("Expression is too complex") from None
+        namespace = {'__builtins__': {}, '_pow': _safe_pow}
+        namespace.update(_EXPRESSION_FUNCTIONS)
+        namespace.update(_EXPRESSION_CONSTANTS)
+        self.source = source
+        self.variables = tuple(compiler.variables)
+        self._function = eval(code, namespace)
+
+    def __call__(self, variables=None, **kwargs):
+        """Вычисляет выражение.
+
+        Переменные, которых нет в выражении, игнорируются.
+
+        Args:
+            variables (dict, optional): Значения переменных.
+            **kwargs: Значения переменных в виде именованных аргументов.
+
+        Returns:
+            Результат вычисления.
+
+        Raises:
+            ValueError: Если не задана переменная, аргументы функции неверны,
+                результат слишком велик или не является действительным числом.
+            ZeroDivisionError: Если происходит деление на ноль.
+        """
+        if variables:
+            kwargs.update(variables)
+        try:
+            arguments = [kwargs[name] for name in self.variables]
+        except KeyError:
+            raise self._missing(kwargs) from None
+        try:
+            result = self._function(*arguments)
+        except (TypeError, OverflowError, ZeroDivisionError) as e:
+            raise _evaluation_error(e) from None
+        if type(result) is complex:
+            raise ValueError("Result is not a real number")
+        return result
+
+    def evaluate_many(self, bindings):
+        """Вычисляет выражение для множества наборов переменных.
+
+        Ключи словаря, которых нет в выражении, игнорируются, поэтому можно
+        передавать строки таблицы с лишними колонками.
+
+        Args:
+            bindings (iterable): Словари переменных или кортежи значений в порядке self.variables.
+
+        Returns:
+            list: Результаты в порядке наборов.
+
+        Raises:
+            ValueError: Если в наборе не задана переменная, аргументы функции
+                неверны, результат слишком велик или не является действительным числом.
+            ZeroDivisionError: Если происходит деление на ноль.
+        """
+        function = self._function
+        variables = self.variables
+        count = len(variables)
+        results = []
+        for binding in bindings:
+            if isinstance(binding, (tuple, list)):
+                if len(binding) != count:
+                    raise self._missing(variables[:len(binding)])
+                arguments = binding
+            else:
+                try:
+                    arguments = [binding[name] for name in variables]
+                except KeyError:
+                    raise self._missing(binding) from None
+            try:
+                result = function(*arguments)
+            except (TypeError, OverflowError, ZeroDivisionError) as e:
+                raise _evaluation_error(e) from None
+            if type(result) is complex:
+                raise ValueError("Result is not a real number")
+            results.append(result)
+        return results
+
+    def _missing(self, names):
+        missing = [name for name in self.variables if name not in names]
+        if missing:
+            return ValueError(f"Missing variables: {', '.join(missing)}")
+        return ValueError(f"Expected {len(self.variables)} values: {', '.join(self.variables)}")
+
+    def __repr__(self):
+        return f'<CompiledExpression {self.source!r} variables={self.variables}>'
+
+
+def _evaluation_error(error):
+    """Превращает ошибку вычисления в ValueError или ZeroDivisionError."""
+    if isinstance(error, ZeroDivisionError):
+        return ZeroDivisionError("Cannot divide by zero!")
+    if isinstance(error, OverflowError):
+        return ValueError("Result is too large")
+    return ValueError(f"Invalid expression: {error}")
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(source: str) -> CompiledExpression:
+    """Компилирует выражение с кэшированием по тексту.
+
+    Поддерживаются числа, переменные, скобки, операторы +, -, *, /, //, %, **
+    с обычным приоритетом, константы pi и e и функции log, sqrt, sin, cos,
+    tan, abs, min, max, round.
+
+    Args:
+        source (str): Текст выражения.
+
+    Returns:
+        CompiledExpression: Скомпилированное выражение.
+
+    Raises:
+        ValueError: Если выражение некорректно.
+    """
+    return CompiledExpression(source)
+
+def calculator(input_str: str, variables: dict = None) -> float:
     """Вычисляет результат математического выражения.
 
     Args:
-        input_str (str): Строка, содержащая два числа и оператор.
+        input_str (str): Выражение, например "2 + 3" или "sqrt(x) * (y - 1)".
+        variables (dict, optional): Значения переменных выражения.
 
     Returns:
         float: Результат вычисления.
 
     Raises:
-        ValueError: Если строка не содержит два числа и оператора.
+        ValueError: Если выражение некорректно или его результат не является
+            действительным числом.
         ZeroDivisionError: Если происходит деление на ноль.
     """
-    numbers = input_str.split()
-
-    if len(numbers) != 3:
-        raise ValueError("Invalid input string. It should contain exactly two numbers and an operator.")
-
-    operator = numbers[1]
-    num1, num2 = float(numbers[0]), float(numbers[2])
-
-    if operator == "+":
-        result = num1 + num2
-    elif operator == "-":
-        result = num1 - num2
-    elif operator == "*":
-        result = num1 * num2
-    elif operator == "/":
-        if num2 == 0:
-            raise ZeroDivisionError("Cannot divide by zero!")
-        result = num1 / num2
-    elif operator == "**":
-        result = num1 ** num2
-    elif operator == "%":
-        result = num1 % num2
-    elif operator == "//":
-        if num2 == 0:
-            raise ZeroDivisionError("Cannot divide by zero!")
-        result = num1 // num2
-    else:
-        raise ValueError("Invalid operator. Supported operators are +, -, *, /, **, %, //.")
-
-    return result
-
+    result = compile_expression(input_str)(variables)
+    try:
+        return float(result)
+    except OverflowError:
+        raise ValueError("Result is too large") from None
+    except TypeError:
+        raise ValueError("Result is not a real number") from None
 
 def send_email(sender_email, password, recipient_email, subject, body, host, port):
-    """Отправляет электронное письмо.
+    """Отправляет электронное письмо через пул постоянных соединений (STARTTLS).
+
+    Для отправки без ожидания используйте mail.configure_mail и enqueue_email.
 
     Args:
         sender_email (str): Адрес электронной почты отправителя.
@@ -253,21 +572,12 @@ def send_email(sender_email, password, recipient_email, subject, body, host, por
     if not sender_email and not password:
         return "Sender's email and password are required."
 
-    msg = EmailMessage()
-    msg.set_content(body)
-    msg['Subject'] = subject
-    msg['From'] = sender_email
-    msg['To'] = recipient_email
-
-    server = smtplib.SMTP(host, port)
-    server.starttls()
-    server.login(sender_email, password)
-    server.send_message(msg)
-    server.quit()
+    msg = build_message(sender_email, recipient_email, subject, body)
+    get_pool(host, port, sender_email, password, 'starttls').send_message(msg)
 
 
 def send_html_email(sender_email, password, recipient_email, subject, html_body, host, port):
-    """Отправляет HTML-форматированное электронное письмо.
+    """Отправляет HTML-форматированное электронное письмо через пул SSL-соединений.
 
     Args:
         sender_email (str): Адрес электронной почты отправителя.
@@ -284,16 +594,8 @@ def send_html_email(sender_email, password, recipient_email, subject, html_body,
     if not sender_email and not password:
         return "Sender's email and password are required."
 
-    msg = EmailMessage()
-    msg.set_content(html_body, subtype='html')
-    msg['Subject'] = subject
-    msg['From'] = sender_email
-    msg['To'] = recipient_email
-
-    server = smtplib.SMTP_SSL(host, port)
-    server.login(sender_email, password)
-    server.send_message(msg)
-    server.quit()
+    msg = build_message(sender_email, recipient_email, subject, html_body, html=True)
+    get_pool(host, port, sender_email, password, 'ssl').send_message(msg)
 
 
 
@@ -302,12 +604,44 @@ class PluginManager:
 
     Attributes:
         plugins (dict): Словарь зарегистрированных плагинов.
+        entry_points (dict): Плагины, найденные через entry points, но еще не импортированные.
+        import_times (dict): Время импорта плагинов из entry points в миллисекундах.
         hooks (dict): Словарь хуков для расширения функциональности.
+        hooks_version (int): Счетчик изменений хуков, по которому приложение
+            понимает, что конвейер middleware нужно пересобрать.
     """
     def __init__(self):
         """Инициализация объекта PluginManager."""
         self.plugins = {}
+        self.entry_points = {}
+        self.import_times = {}
         self.hooks = {}
+        self.hooks_version = 0
+        self._load_lock = threading.Lock()
+
+    def discover_plugins(self, group: str = 'darkfream.plugins') -> list:
+        """Находит плагины, объявленные в entry points установленных пакетов.
+
+        Модули плагинов не импортируются: импорт происходит в get_plugin,
+        то есть только для включенных плагинов.
+
+        Args:
+            group (str, optional): Группа entry points. По умолчанию 'darkfream.plugins'.
+
+        Returns:
+            list: Имена найденных плагинов.
+        """
+        found = metadata.entry_points()
+        if hasattr(found, 'select'):
+            found = found.select(group=group)
+        else:
+            found = found.get(group, [])
+        names = []
+        for entry_point in found:
+            if entry_point.name not in self.plugins:
+                self.entry_points[entry_point.name] = entry_point
+                names.append(entry_point.name)
+        return names
 
     def register_plugin(self, plugin_name: str, plugin_class: object) -> None:
         """Регистрация нового плагина.
@@ -322,7 +656,7 @@ class PluginManager:
         if plugin_name in self.plugins:
             raise ValueError(f"Plugin {plugin_name} already registered")
         self.plugins[plugin_name] = plugin_class
-        print(f"Plugin '{plugin_name}' registered successfully")
+        logs.info(f"Plugin '{plugin_name}' registered successfully")
 
     def unregister_plugin(self, plugin_name: str) -> None:
         """Удаление плагина.
@@ -332,22 +666,41 @@ class PluginManager:
         """
         if plugin_name in self.plugins:
             del self.plugins[plugin_name]
-            print(f"Plugin '{plugin_name}' unregistered successfully")
+            logs.info(f"Plugin '{plugin_name}' unregistered successfully")
 
     def get_plugin(self, plugin_name: str) -> object:
         """Получение плагина по имени.
 
+        Плагин из entry point импортируется при первом запросе, один раз даже
+        при одновременных запросах из нескольких потоков. Если импорт не
+        удался, entry point остается, и следующий вызов повторит попытку.
+
         Args:
             plugin_name (str): Имя плагина.
 
         Returns:
             object: Класс плагина или None, если плагин не найден.
         """
-        return self.plugins.get(plugin_name)
+        plugin_class = self.plugins.get(plugin_name)
+        if plugin_class is not None or plugin_name not in self.entry_points:
+            return plugin_class
+        with self._load_lock:
+            plugin_class = self.plugins.get(plugin_name)
+            entry_point = self.entry_points.get(plugin_name)
+            if plugin_class is None and entry_point is not None:
+                start = time.perf_counter()
+                plugin_class = entry_point.load()
+                self.import_times[plugin_name] = (time.perf_counter() - start) * 1000
+                self.plugins[plugin_name] = plugin_class
+                del self.entry_points[plugin_name]
+        return plugin_class
 
     def register_hook(self, hook_name: str, callback: callable) -> None:
         """Регистрация хука (точки расширения).
 
+        Хуки before_request, after_response и on_error встраиваются в обработку
+        запросов; callback может быть обычной функцией или корутиной.
+
         Args:
             hook_name (str): Имя хука.
             callback (callable): Функция обратного вызова для хука.
@@ -355,6 +708,29 @@ class PluginManager:
         if hook_name not in self.hooks:
             self.hooks[hook_name] = []
         self.hooks[hook_name].append(callback)
+        self.hooks_version += 1
+
+    def unregister_hook(self, hook_name: str, callback: callable) -> None:
+        """Удаление хука.
+
+        Args:
+            hook_name (str): Имя хука.
+            callback (callable): Ранее зарегистрированная функция обратного вызова.
+        """
+        if callback in self.hooks.get(hook_name, []):
+            self.hooks[hook_name].remove(callback)
+            self.hooks_version += 1
+
+    def compile_middleware(self, profile: bool = False) -> MiddlewarePipeline:
+        """Собирает хуки запроса в конвейер middleware.
+
+        Args:
+            profile (bool, optional): Замерять время каждого middleware. По умолчанию False.
+
+        Returns:
+            MiddlewarePipeline: Скомпилированный конвейер.
+        """
+        return MiddlewarePipeline(self.hooks, profile=profile)
 
     def execute_hook(self, hook_name: str, *args, **kwargs) -> list:
         """Выполнение всех callback-функций для определенного хука.
@@ -379,7 +755,16 @@ class BasePlugin:
 
     Attributes:
         app: Ссылка на приложение, к которому подключен плагин.
+        initialization (str): Когда вызывать initialize(): 'eager' при запуске,
+            'lazy' при первом обращении через DarkFream.get_plugin,
+            'background' в фоновом потоке прогрева.
+        initialized (bool): Была ли выполнена инициализация.
+        init_ms (float): Время инициализации в миллисекундах.
     """
+    initialization = 'eager'
+    initialized = False
+    init_ms = None
+
     def __init__(self, app):
         """Инициализация базового плагина.
 
@@ -392,6 +777,22 @@ class BasePlugin:
         """Метод инициализации плагина"""
         pass
 
+    def ensure_initialized(self):
+        """Выполняет initialize() ровно один раз, в том числе при гонке потоков.
+
+        Returns:
+            BasePlugin: Инициализированный плагин.
+        """
+        if self.initialized:
+            return self
+        with self.__dict__.setdefault('_init_lock', threading.Lock()):
+            if not self.initialized:
+                start = time.perf_counter()
+                self.initialize()
+                self.init_ms = (time.perf_counter() - start) * 1000
+                self.initialized = True
+        return self
+
     def cleanup(self):
         """Метод очистки при отключении плагина"""
         pass
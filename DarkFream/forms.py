@@ -0,0 +1,275 @@
+from operator import attrgetter
+
+from peewee import BooleanField, CharField, FieldAccessor, FloatField, ForeignKeyField, IntegerField, TextField
+
+TRUE_VALUES = ('1', 'true', 'on', 'yes')
+PARSE_TEXT, PARSE_BOOL, PARSE_CALL = range(3)
+
+
+class FormField:
+    """Поле формы админ-панели, разобранное один раз при регистрации модели.
+
+    Attributes:
+        name (str): Имя поля модели.
+        label (str): Подпись в форме и заголовке таблицы.
+        kind (str): 'fk', 'bool', 'password' или 'text' - вид поля ввода.
+        field (Field): Поле peewee.
+        rel_model (type): Связанная модель для внешнего ключа или None.
+        convert (callable): Преобразует строку формы в значение поля.
+        validators (tuple): Проверки значения, выбрасывающие ValueError.
+        get (callable): Читает значение поля у объекта.
+        parse (callable): parse(values) - значение поля из формы; None, если поле
+            присваивается через decode.
+        decode (callable): decode(item, values, creating) - переносит значения формы в объект.
+    """
+    __slots__ = ('name', 'label', 'kind', 'field', 'rel_model', 'convert', 'validators', 'get', 'parse',
+                 'decode')
+
+    def __init__(self, name, field, kind, convert, validators):
+        self.name = name
+        self.label = name.title()
+        self.kind = kind
+        self.field = field
+        self.rel_model = field.rel_model if kind == 'fk' else None
+        self.convert = convert
+        self.validators = validators
+        self.get = attrgetter(name)
+        self.parse = None
+        self.decode = None
+
+
+def _converter(field):
+    if isinstance(field, (CharField, TextField)):
+        return field.adapt
+    if isinstance(field, IntegerField):
+        base = int
+    elif isinstance(field, FloatField):
+        base = float
+    else:
+        base = field.adapt
+    if field.null:
+        return lambda value: None if value == '' else base(value)
+    return base
+
+
+def _validators(name, field):
+    validators = []
+    max_length = getattr(field, 'max_length', None)
+    if isinstance(field, CharField) and max_length:
+        def check_length(value):
+            if value is not None and len(value) > max_length:
+                raise ValueError(f"{name} must be at most {max_length} characters")
+        validators.append(check_length)
+    if field.choices:
+        allowed = {choice[0] if isinstance(choice, (list, tuple)) else choice for choice in field.choices}
+
+        def check_choice(value):
+            if value not in allowed:
+                raise ValueError(f"{name} must be one of: {', '.join(map(str, allowed))}")
+        validators.append(check_choice)
+    return tuple(validators)
+
+
+class FormCodec:
+    """Разбор форм и отображение строк админ-панели для одной модели.
+
+    Типы полей, преобразователи, проверки и функции чтения значений
+    вычисляются один раз в конструкторе, поэтому обработка запроса не
+    обращается к model._meta и не проверяет классы полей. Значения обычных
+    полей записываются в объект одним обновлением __data__ и _dirty, минуя
+    дескрипторы peewee; через setattr присваиваются только внешние ключи,
+    пароль и поля с собственными дескрипторами.
+
+    Attributes:
+        model (type): Модель.
+        fields (list): FormField всех полей, кроме первичного ключа.
+        foreign_keys (list): FormField внешних ключей.
+    """
+    def __init__(self, model, user_model=None):
+        """Компилирует кодек.
+
+        Args:
+            model (type): Модель.
+            user_model (type, optional): Модель пользователя; ее поле password хэшируется.
+        """
+        self.model = model
+        is_user_model = user_model is not None and issubclass(model, user_model)
+        self.fields = []
+        for name, field in model._meta.fields.items():
+            if field.primary_key:
+                continue
+            if isinstance(field, ForeignKeyField):
+                kind = 'fk'
+            elif isinstance(field, BooleanField):
+                kind = 'bool'
+            elif is_user_model and name == 'password':
+                kind = 'password'
+            else:
+                kind = 'text'
+            spec = FormField(name, field, kind, _converter(field), _validators(name, field))
+            if kind in ('bool', 'text') and type(model.__dict__.get(name)) is FieldAccessor:
+                spec.parse = _parser(spec)
+            else:
+                spec.decode = _decoder(spec, model)
+            self.fields.append(spec)
+        self.foreign_keys = [spec for spec in self.fields if spec.kind == 'fk']
+        self._parsers = [_parse_entry(spec) for spec in self.fields if spec.parse is not None]
+        self._decoders = [(spec.name, spec.kind == 'bool', spec.decode)
+                          for spec in self.fields if spec.parse is None]
+        self._cells = [_fk_label(spec.get) if spec.kind == 'fk' else spec.get for spec in self.fields]
+
+    def decode(self, form, item):
+        """Переносит данные формы в объект.
+
+        Поля, которых нет в форме, не меняются; у нового объекта отсутствующий
+        флажок означает False. Пароль хэшируется, если он изменился.
+
+        Args:
+            form (dict): Разобранное тело запроса {имя: [значения]}.
+            item (DarkModel): Новый или редактируемый объект.
+
+        Returns:
+            DarkModel: Тот же объект.
+
+        Raises:
+            ValueError: Если значение не проходит преобразование или проверку.
+            DoesNotExist: Если связанный объект не найден.
+        """
+        creating = item.get_id() is None
+        get = form.get
+        updates = {}
+        # Строки и флажки разбираются прямо в цикле: вызов функции на каждое
+        # поле стоил бы больше, чем сам разбор.
+        for name, mode, arg in self._parsers:
+            values = get(name)
+            if not values:
+                if creating and mode == PARSE_BOOL:
+                    updates[name] = False
+                continue
+            if mode == PARSE_TEXT:
+                value = values[0]
+                if arg is not None and len(value) > arg:
+                    raise ValueError(f"{name} must be at most {arg} characters")
+            elif mode == PARSE_BOOL:
+                value = values[-1].lower() in TRUE_VALUES
+            else:
+                value = arg(values)
+            updates[name] = value
+        if updates:
+            item.__data__.update(updates)
+            item._dirty.update(updates)
+        for name, is_bool, decode in self._decoders:
+            values = form.get(name)
+            if values:
+                decode(item, values, creating)
+            elif creating and is_bool:
+                setattr(item, name, False)
+        return item
+
+    def values(self, item):
+        """Возвращает значения полей для формы редактирования.
+
+        Args:
+            item (DarkModel): Объект или None для формы создания.
+
+        Returns:
+            dict: Имя поля -> значение; для внешних ключей - id связанного объекта.
+        """
+        if item is None:
+            return {spec.name: None for spec in self.fields}
+        data = item.__data__
+        return {spec.name: data.get(spec.name) if spec.kind == 'fk' else spec.get(item)
+                for spec in self.fields}
+
+    def rows(self, items):
+        """Готовит строки таблицы списка объектов.
+
+        Args:
+            items (iterable): Объекты модели.
+
+        Yields:
+            tuple: (id объекта, список значений ячеек в порядке fields).
+        """
+        getters = self._cells
+        for item in items:
+            yield item.id, [get(item) for get in getters]
+
+
+def _parser(spec):
+    """Собирает функцию parse(values) для флажка или обычного поля формы."""
+    if spec.kind == 'bool':
+        def parse(values):
+            return values[-1].lower() in TRUE_VALUES
+        return parse
+    convert = spec.convert
+    validators = spec.validators
+    if validators:
+        def parse(values):
+            value = convert(values[0])
+            for validator in validators:
+                validator(value)
+            return value
+        return parse
+    return lambda values: convert(values[0])
+
+
+def _parse_entry(spec):
+    """Возвращает (имя, режим, аргумент) для цикла разбора FormCodec.decode.
+
+    Значения формы уже строки, поэтому строковому полю без choices нужна
+    только проверка max_length (аргумент режима PARSE_TEXT).
+    """
+    field = spec.field
+    if spec.kind == 'bool':
+        return spec.name, PARSE_BOOL, None
+    if isinstance(field, (CharField, TextField)) and not field.choices:
+        max_length = field.max_length if isinstance(field, CharField) else None
+        return spec.name, PARSE_TEXT, max_length or None
+    return spec.name, PARSE_CALL, spec.parse
+
+
+def _decoder(spec, model):
+    """Собирает функцию decode(item, values, creating) для поля формы."""
+    name = spec.name
+    if spec.kind == 'bool':
+        def decode(item, values, creating):
+            setattr(item, name, values[-1].lower() in TRUE_VALUES)
+    elif spec.kind == 'fk':
+        rel_model = spec.rel_model
+        nullable = spec.field.null
+
+        def decode(item, values, creating):
+            value = values[0]
+            setattr(item, name, None if value == '' and nullable else rel_model.get_by_id(int(value)))
+    elif spec.kind == 'password':
+        hash_password = model.hash_password
+
+        def decode(item, values, creating):
+            value = values[0]
+            if creating or value != getattr(item, name):
+                setattr(item, name, hash_password(value))
+    elif spec.validators:
+        convert = spec.convert
+        validators = spec.validators
+
+        def decode(item, values, creating):
+            value = convert(values[0])
+            for validator in validators:
+                validator(value)
+            setattr(item, name, value)
+    else:
+        convert = spec.convert
+
+        def decode(item, values, creating):
+            setattr(item, name, convert(values[0]))
+    return decode
+
+
+def _fk_label(get):
+    def label(item):
+        related = get(item)
+        if related is None:
+            return ''
+        return getattr(related, 'name', related.id)
+    return label
+
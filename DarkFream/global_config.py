@@ -1,5 +1,7 @@
 _user_model = None
 _round = 12
+_hash_scheme = 'bcrypt'
+_scrypt_cost = 14
 _handler = None
 
 def set_user_model(model):
@@ -55,3 +57,44 @@ def get_round():
     """
     global _round
     return _round
+
+def set_hash_scheme(scheme):
+    """Устанавливает схему хэширования паролей.
+
+    Args:
+        scheme (str): 'bcrypt' или 'scrypt'.
+
+    Raises:
+        ValueError: Если схема не поддерживается.
+    """
+    global _hash_scheme
+    if scheme not in ('bcrypt', 'scrypt'):
+        raise ValueError(f"Unsupported hash scheme: {scheme}")
+    _hash_scheme = scheme
+
+def get_hash_scheme():
+    """Получает текущую схему хэширования паролей.
+
+    Returns:
+        str: Схема хэширования ('bcrypt' или 'scrypt').
+    """
+    global _hash_scheme
+    return _hash_scheme
+
+def set_scrypt_cost(cost):
+    """Устанавливает стоимость scrypt (log2 от параметра N).
+
+    Args:
+        cost (int): Показатель степени двойки для параметра N.
+    """
+    global _scrypt_cost
+    _scrypt_cost = cost
+
+def get_scrypt_cost():
+    """Получает текущую стоимость scrypt.
+
+    Returns:
+        int: Показатель степени двойки для параметра N.
+    """
+    global _scrypt_cost
+    return _scrypt_cost
@@ -0,0 +1,197 @@
+import base64
+import hashlib
+import hmac
+import math
+import os
+import time
+
+import bcrypt
+
+from .global_config import (get_round, set_round, get_hash_scheme, set_hash_scheme,
+                            get_scrypt_cost, set_scrypt_cost)
+
+SCRYPT_PREFIX = '$scrypt$'
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_SALT_SIZE = 16
+SCRYPT_KEY_SIZE = 32
+
+COST_LIMITS = {
+    'bcrypt': (10, 16),
+    'scrypt': (12, 20),
+}
+PROBE_COST = {
+    'bcrypt': 8,
+    'scrypt': 12,
+}
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(data):
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+def _scrypt(password, salt, cost, r=SCRYPT_R, p=SCRYPT_P):
+    n = 1 << cost
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n + 1024 * 1024, dklen=SCRYPT_KEY_SIZE)
+
+
+def hash_password(password, scheme=None, cost=None):
+    """Хэширует пароль текущей схемой и стоимостью.
+
+    Args:
+        password (str): Пароль для хэширования.
+        scheme (str, optional): 'bcrypt' или 'scrypt'. По умолчанию из global_config.
+        cost (int, optional): Число раундов bcrypt или log2(N) для scrypt.
+
+    Returns:
+        str: Хэш пароля.
+    """
+    scheme = scheme or get_hash_scheme()
+    password = password.encode('utf-8')
+    if scheme == 'scrypt':
+        cost = cost or get_scrypt_cost()
+        salt = os.urandom(SCRYPT_SALT_SIZE)
+        key = _scrypt(password, salt, cost)
+        return f'{SCRYPT_PREFIX}ln={cost},r={SCRYPT_R},p={SCRYPT_P}${_b64encode(salt)}${_b64encode(key)}'
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=cost or get_round())).decode('utf-8')
+
+
+def parse_hash(hashed):
+    """Определяет схему и параметры сохраненного хэша.
+
+    Args:
+        hashed (str): Сохраненный хэш пароля.
+
+    Returns:
+        tuple: (схема, стоимость, параметры) или (None, None, None) для неизвестного формата.
+    """
+    if not hashed:
+        return None, None, None
+    if hashed.startswith(SCRYPT_PREFIX):
+        try:
+            params, salt, key = hashed[len(SCRYPT_PREFIX):].split('$')
+            params = dict(item.split('=') for item in params.split(','))
+            params = {name: int(value) for name, value in params.items()}
+            return 'scrypt', params['ln'], (params, salt, key)
+        except (ValueError, KeyError):
+            return None, None, None
+    if hashed.startswith(('$2a$', '$2b$', '$2y$')):
+        try:
+            return 'bcrypt', int(hashed.split('$')[2]), None
+        except (IndexError, ValueError):
+            return None, None, None
+    return None, None, None
+
+
+def verify_password(password, hashed):
+    """Проверяет пароль по сохраненному хэшу любой поддерживаемой схемы.
+
+    Args:
+        password (str): Введенный пароль.
+        hashed (str): Сохраненный хэш.
+
+    Returns:
+        bool: True, если пароль подходит, иначе False.
+    """
+    scheme, cost, extra = parse_hash(hashed)
+    if scheme == 'scrypt':
+        params, salt, key = extra
+        try:
+            expected = _b64decode(key)
+            actual = _scrypt(password.encode('utf-8'), _b64decode(salt), cost,
+                             r=params.get('r', SCRYPT_R), p=params.get('p', SCRYPT_P))
+        except (ValueError, TypeError):
+            return False
+        return hmac.compare_digest(actual, expected)
+    if scheme == 'bcrypt':
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:
+            return False
+    return False
+
+
+def needs_rehash(hashed):
+    """Проверяет, отличается ли хэш от текущей схемы или стоимости.
+
+    Args:
+        hashed (str): Сохраненный хэш.
+
+    Returns:
+        bool: True, если хэш нужно пересчитать.
+    """
+    scheme, cost, extra = parse_hash(hashed)
+    current = get_hash_scheme()
+    if scheme != current:
+        return True
+    if scheme == 'scrypt':
+        params = extra[0]
+        return (cost != get_scrypt_cost() or params.get('r') != SCRYPT_R
+                or params.get('p') != SCRYPT_P)
+    return cost != get_round()
+
+
+def measure(scheme, cost, repeat=3):
+    """Измеряет время хэширования (и проверки) пароля при заданной стоимости.
+
+    Args:
+        scheme (str): 'bcrypt' или 'scrypt'.
+        cost (int): Стоимость.
+        repeat (int): Число замеров, берется медиана.
+
+    Returns:
+        float: Время в миллисекундах.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hash_password('calibration-password', scheme=scheme, cost=cost)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def calibrate(target_ms=250, scheme=None, apply=True, min_cost=None, max_cost=None):
+    """Подбирает стоимость хэширования под целевую задержку на текущем железе.
+
+    Время bcrypt и scrypt удваивается с каждой единицей стоимости, поэтому
+    достаточно одного дешевого замера и экстраполяции, после чего выбранное
+    значение проверяется и при необходимости уменьшается.
+
+    Args:
+        target_ms (float): Целевое время проверки пароля в миллисекундах.
+        scheme (str, optional): 'bcrypt' или 'scrypt'. По умолчанию текущая схема.
+        apply (bool): Сохранить найденное значение в global_config.
+        min_cost (int, optional): Нижняя граница стоимости.
+        max_cost (int, optional): Верхняя граница стоимости.
+
+    Returns:
+        int: Подобранная стоимость.
+    """
+    scheme = scheme or get_hash_scheme()
+    if scheme not in COST_LIMITS:
+        raise ValueError(f"Unsupported hash scheme: {scheme}")
+    low, high = COST_LIMITS[scheme]
+    low = low if min_cost is None else min_cost
+    high = high if max_cost is None else max_cost
+
+    probe = PROBE_COST[scheme]
+    probe_ms = max(measure(scheme, probe), 0.01)
+    cost = probe + int(math.floor(math.log2(target_ms / probe_ms)))
+    cost = max(low, min(high, cost))
+
+    while cost > low and measure(scheme, cost, repeat=1) > target_ms * 1.1:
+        cost -= 1
+
+    if apply:
+        set_hash_scheme(scheme)
+        if scheme == 'scrypt':
+            set_scrypt_cost(cost)
+        else:
+            set_round(cost)
+    return cost
@@ -0,0 +1,115 @@
+import threading
+
+_local = threading.local()
+
+
+class IdentityMap:
+    """Объекты моделей, загруженные в рамках одного HTTP-запроса.
+
+    Объект запоминается по первичному ключу и по значениям уникальных полей,
+    поэтому повторные get_by_id, get(Model.unique_field == value) и обращения
+    к внешним ключам возвращают тот же экземпляр без SQL-запроса. Запись в
+    таблицу через базу данных удаляет объекты этой таблицы, сохраненный
+    объект добавляется заново.
+
+    Attributes:
+        hits (int): Число найденных объектов.
+        misses (int): Число промахов.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._tables = {}
+
+    def get(self, model, field, value):
+        """Ищет объект модели по полю.
+
+        Args:
+            model (type): Модель.
+            field (Field): Первичный ключ или уникальное поле.
+            value: Значение поля.
+
+        Returns:
+            DarkModel: Объект или None.
+        """
+        objects = self._tables.get(model._meta.table_name)
+        instance = None
+        if objects is not None:
+            key = _key(field, value)
+            instance = objects.get(key) if key is not None else None
+            if instance is not None and (type(instance) is not model
+                                         or _key(field, instance.__data__.get(field.name)) != key):
+                instance = None
+        if instance is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return instance
+
+    def add(self, instance):
+        """Запоминает объект по первичному ключу и уникальным полям.
+
+        Args:
+            instance (DarkModel): Загруженный или сохраненный объект.
+        """
+        meta = instance._meta
+        objects = self._tables.setdefault(meta.table_name, {})
+        for field in meta.sorted_fields:
+            if field.primary_key or field.unique:
+                key = _key(field, instance.__data__.get(field.name))
+                if key is not None:
+                    objects[key] = instance
+
+    def discard(self, tables):
+        """Удаляет объекты таблиц.
+
+        Args:
+            tables (iterable): Имена таблиц; None - удалить все объекты.
+        """
+        if tables is None:
+            self._tables.clear()
+            return
+        for table in tables:
+            self._tables.pop(table, None)
+
+    def __len__(self):
+        return len({id(instance) for objects in self._tables.values() for instance in objects.values()})
+
+
+def _key(field, value):
+    if value is None:
+        return None
+    try:
+        return field.name, field.db_value(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def current():
+    """Возвращает карту объектов текущего запроса или None вне запроса."""
+    return getattr(_local, 'identity_map', None)
+
+
+def begin():
+    """Открывает карту объектов для запроса в текущем потоке.
+
+    Вложенный вызов (например, handle_request из обработчика) использует
+    уже открытую карту.
+
+    Returns:
+        IdentityMap: Новая карта или None, если карта уже открыта.
+    """
+    if getattr(_local, 'identity_map', None) is not None:
+        return None
+    identity_map = _local.identity_map = IdentityMap()
+    return identity_map
+
+
+def end(identity_map):
+    """Закрывает карту, открытую begin().
+
+    Args:
+        identity_map (IdentityMap): Результат begin().
+    """
+    if identity_map is not None and getattr(_local, 'identity_map', None) is identity_map:
+        _local.identity_map = None
@@ -0,0 +1,273 @@
+import re
+
+from . import logs
+from .orm import conn
+
+SOURCE_RE = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+"(\w+)"(?:\s+AS\s+"(\w+)")?', re.IGNORECASE)
+CONDITION_RE = re.compile(r'"(\w+)"\."(\w+)"\s*(=|!=|<>|<=|>=|<|>|IN\b|IS\b|BETWEEN\b|LIKE\b)', re.IGNORECASE)
+ORDER_RE = re.compile(r'\bORDER BY\s+(.+?)(?:\bLIMIT\b|\bOFFSET\b|$)', re.IGNORECASE)
+COLUMN_RE = re.compile(r'"(\w+)"\."(\w+)"')
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(.*)$')
+EQUALITY = ('=', 'IN', 'IS')
+RANGE = ('<', '>', '<=', '>=', 'BETWEEN')
+
+
+class IndexSuggestion:
+    """Предлагаемый индекс.
+
+    Attributes:
+        table (str): Таблица.
+        columns (tuple): Колонки индекса в порядке: равенства, затем диапазон или сортировка.
+        queries (list): SQL-запросы, которым поможет индекс.
+        count (int): Сколько раз эти запросы выполнялись.
+        seconds (float): Суммарное время этих запросов.
+    """
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = tuple(columns)
+        self.queries = []
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def name(self):
+        return f"idx_{self.table}_{'_'.join(self.columns)}"
+
+    @property
+    def statement(self):
+        columns = ', '.join(f'"{column}"' for column in self.columns)
+        return f'CREATE INDEX IF NOT EXISTS "{self.name}" ON "{self.table}" ({columns})'
+
+    def __repr__(self):
+        return f'<IndexSuggestion {self.statement}>'
+
+
+class TableScan:
+    """Полный просмотр таблицы, найденный в плане запроса.
+
+    Attributes:
+        table (str): Таблица.
+        sql (str): Запрос.
+        detail (str): Строка EXPLAIN QUERY PLAN.
+        count (int): Число выполнений запроса.
+        seconds (float): Суммарное время запроса.
+        suggestion (IndexSuggestion): Предлагаемый индекс или None, если
+            запрос не фильтрует таблицу или подходящий индекс уже есть.
+    """
+    def __init__(self, table, sql, detail, count, seconds, suggestion=None):
+        self.table = table
+        self.sql = sql
+        self.detail = detail
+        self.count = count
+        self.seconds = seconds
+        self.suggestion = suggestion
+
+
+class IndexAdvisor:
+    """Находит запросы с полным просмотром таблиц и предлагает индексы.
+
+    Во время работы собирает различные формы SELECT/UPDATE/DELETE запросов
+    (SQL peewee уже параметризован, поэтому форма - это текст запроса),
+    затем выполняет для них EXPLAIN QUERY PLAN. Для строк SCAN без индекса
+    по условиям WHERE/JOIN и ORDER BY подбирается составной индекс. Индексы
+    применяются через migrate(indexes=advisor.suggestions()).
+
+    Attributes:
+        database (DarkSqliteDatabase): База данных.
+        max_shapes (int): Максимальное число запоминаемых форм запросов.
+        shapes (dict): SQL -> [пример параметров, число выполнений, суммарное время].
+    """
+    def __init__(self, database=conn, max_shapes=1000):
+        """Инициализация советника.
+
+        Args:
+            database (DarkSqliteDatabase, optional): База данных. По умолчанию orm.conn.
+            max_shapes (int, optional): Максимум форм запросов. По умолчанию 1000.
+        """
+        self.database = database
+        self.max_shapes = max_shapes
+        self.shapes = {}
+
+    def start(self):
+        """Начинает сбор запросов."""
+        self.database.add_query_listener(self.on_query)
+
+    def stop(self):
+        """Прекращает сбор запросов."""
+        self.database.remove_query_listener(self.on_query)
+
+    def on_query(self, sql, params, seconds):
+        """Слушатель запросов DarkSqliteDatabase."""
+        shape = self.shapes.get(sql)
+        if shape is not None:
+            shape[1] += 1
+            shape[2] += seconds
+            return
+        if len(self.shapes) >= self.max_shapes:
+            return
+        if sql[:6].upper() not in ('SELECT', 'UPDATE', 'DELETE') or 'sqlite_' in sql:
+            return
+        self.shapes[sql] = [tuple(params or ()), 1, seconds]
+
+    def add_query(self, query):
+        """Добавляет запрос peewee для анализа без его выполнения.
+
+        Args:
+            query: Запрос peewee (select, update или delete).
+        """
+        sql, params = query.sql()
+        if sql not in self.shapes:
+            self.shapes[sql] = [tuple(params), 0, 0.0]
+
+    def explain(self, sql, params=()):
+        """Выполняет EXPLAIN QUERY PLAN.
+
+        Args:
+            sql (str): Запрос.
+            params (tuple, optional): Параметры запроса.
+
+        Returns:
+            list: Строки detail плана запроса.
+        """
+        cursor = self.database.cursor()
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+    def analyze(self):
+        """Анализирует собранные запросы.
+
+        Returns:
+            list: TableScan для каждого полного просмотра таблицы,
+                отсортированные по суммарному времени запроса.
+        """
+        scans = []
+        for sql, (params, count, seconds) in list(self.shapes.items()):
+            try:
+                plan = self.explain(sql, params)
+            except Exception as e:
+                logs.error(f'Error explaining query: {str(e)}', sql=sql)
+                continue
+            sources = _sources(sql)
+            for detail in plan:
+                match = SCAN_RE.match(detail)
+                if not match or 'USING' in match.group(2) or match.group(1) not in sources:
+                    continue
+                alias = match.group(1)
+                table = sources[alias]
+                columns = _index_columns(sql, alias)
+                suggestion = None
+                if columns and not self.has_index(table, columns):
+                    suggestion = IndexSuggestion(table, columns)
+                scans.append(TableScan(table, sql, detail, count, seconds, suggestion))
+        scans.sort(key=lambda scan: (scan.seconds, scan.count), reverse=True)
+        return scans
+
+    def has_index(self, table, columns):
+        """Проверяет, есть ли индекс, начинающийся с этих колонок.
+
+        Args:
+            table (str): Таблица.
+            columns (tuple): Колонки.
+
+        Returns:
+            bool: True, если такой индекс уже существует.
+        """
+        for index in self.database.get_indexes(table):
+            if tuple(index.columns[:len(columns)]) == tuple(columns):
+                return True
+        return False
+
+    def suggestions(self, scans=None):
+        """Объединяет предложения индексов по всем запросам.
+
+        Индекс, колонки которого - префикс другого предложенного индекса той же
+        таблицы, не предлагается: его запросы обслужит более широкий индекс.
+
+        Args:
+            scans (list, optional): Результат analyze(). По умолчанию вызывается analyze().
+
+        Returns:
+            list: IndexSuggestion, отсортированные по времени затронутых запросов.
+        """
+        merged = {}
+        for scan in self.analyze() if scans is None else scans:
+            if scan.suggestion is None:
+                continue
+            key = (scan.table, scan.suggestion.columns)
+            suggestion = merged.setdefault(key, scan.suggestion)
+            if scan.sql not in suggestion.queries:
+                suggestion.queries.append(scan.sql)
+                suggestion.count += scan.count
+                suggestion.seconds += scan.seconds
+
+        for key, suggestion in list(merged.items()):
+            table, columns = key
+            wider = [other for (other_table, other_columns), other in merged.items()
+                     if other_table == table and len(other_columns) > len(columns)
+                     and other_columns[:len(columns)] == columns]
+            if wider:
+                target = max(wider, key=lambda other: len(other.columns))
+                target.queries.extend(sql for sql in suggestion.queries if sql not in target.queries)
+                target.count += suggestion.count
+                target.seconds += suggestion.seconds
+                del merged[key]
+        return sorted(merged.values(), key=lambda item: (item.seconds, item.count), reverse=True)
+
+    def report(self):
+        """Формирует текстовый отчет о полных просмотрах и предлагаемых индексах.
+
+        Returns:
+            str: Отчет.
+        """
+        scans = self.analyze()
+        if not scans:
+            return 'No full table scans found.'
+        lines = []
+        for scan in scans:
+            lines.append(f'{scan.detail} on {scan.table}: {scan.count} runs, {scan.seconds * 1000.0:.2f} ms')
+            lines.append(f'    {scan.sql}')
+            if scan.suggestion is None:
+                lines.append('    no index suggested (no filter columns or index already exists)')
+        suggestions = self.suggestions(scans)
+        if suggestions:
+            lines.append('')
+            lines.append('Suggested indexes:')
+            for suggestion in suggestions:
+                lines.append(f'    {suggestion.statement};')
+        return '\n'.join(lines)
+
+
+def _sources(sql):
+    sources = {}
+    for table, alias in SOURCE_RE.findall(sql):
+        sources[alias or table] = table
+    return sources
+
+
+def _index_columns(sql, alias):
+    """Подбирает колонки индекса для таблицы с псевдонимом alias.
+
+    Сначала колонки с условиями равенства (=, IN, IS), затем первая колонка
+    с диапазоном; если диапазона нет - колонки ORDER BY этой таблицы.
+    """
+    equality = []
+    ranges = []
+    for qualifier, column, operator in CONDITION_RE.findall(sql):
+        if qualifier != alias:
+            continue
+        operator = operator.upper()
+        if operator in EQUALITY and column not in equality:
+            equality.append(column)
+        elif operator in RANGE and column not in ranges:
+            ranges.append(column)
+    columns = list(equality)
+    ranges = [column for column in ranges if column not in columns]
+    if ranges:
+        columns.append(ranges[0])
+    else:
+        order = ORDER_RE.search(sql)
+        if order:
+            order_columns = COLUMN_RE.findall(order.group(1))
+            if order_columns and all(qualifier == alias for qualifier, _ in order_columns):
+                columns.extend(column for _, column in order_columns if column not in columns)
+    return columns
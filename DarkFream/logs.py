@@ -0,0 +1,208 @@
+import atexit
+from datetime import datetime, timezone
+import queue
+import sys
+import threading
+
+from .serializers import dumps
+
+_STOP = object()
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+class LogPipeline:
+    """Неблокирующий журнал в формате JSON Lines.
+
+    Записи кладутся в ограниченную очередь и пишутся фоновым потоком
+    пачками, поэтому медленный stdout или конвейер к сборщику логов не
+    тормозит обработку запросов. Если очередь заполнена, запись
+    отбрасывается и учитывается в dropped; о потерях пишется отдельная
+    запись при следующей пачке.
+
+    Attributes:
+        stream: Поток вывода; None означает текущий sys.stdout.
+        path (str): Файл журнала вместо потока или None.
+        batch_size (int): Максимальное число записей в одной пачке.
+        written (int): Число записанных записей.
+        dropped (int): Число отброшенных записей.
+        batches (int): Число выполненных записей пачек.
+    """
+    def __init__(self, stream=None, path=None, max_queue=10000, batch_size=256):
+        """Инициализация журнала.
+
+        Args:
+            stream (optional): Поток вывода. По умолчанию sys.stdout.
+            path (str, optional): Файл журнала, открываемый на дозапись.
+            max_queue (int, optional): Размер буфера записей. По умолчанию 10000.
+            batch_size (int, optional): Размер пачки. По умолчанию 256.
+        """
+        self.stream = stream
+        self.path = path
+        self.batch_size = batch_size
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._reported_dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        """Ставит запись в очередь, не дожидаясь вывода.
+
+        Args:
+            record (dict): Поля записи; ts добавляется автоматически.
+        """
+        if self._thread is None:
+            self._start()
+        record = {'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'), **record}
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='darkfream-log', daemon=True)
+            self._thread.start()
+
+    def _output(self):
+        if self.path:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            return self._file
+        return self.stream or sys.stdout
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            batch = []
+            stop = record is _STOP
+            if not stop:
+                batch.append(record)
+            while len(batch) < self.batch_size and not stop:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                else:
+                    batch.append(record)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        dropped = self.dropped - self._reported_dropped
+        if dropped:
+            self._reported_dropped += dropped
+            batch.append({'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                          'level': 'warning', 'type': 'log',
+                          'message': f'Log buffer full, dropped {dropped} records'})
+        if not batch:
+            return
+        lines = []
+        for record in batch:
+            try:
+                lines.append(dumps(record))
+            except TypeError:
+                lines.append(dumps({key: value if isinstance(value, _PLAIN_TYPES) else str(value)
+                                    for key, value in record.items()}))
+            except ValueError as e:
+                lines.append(dumps({'level': 'error', 'type': 'log', 'message': f'Unserializable log record: {e}'}))
+        try:
+            output = self._output()
+            output.write('\n'.join(lines) + '\n')
+            output.flush()
+        except (OSError, ValueError):
+            self.dropped += len(batch)
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def close(self, timeout=5.0):
+        """Дописывает очередь и останавливает фоновый поток.
+
+        Args:
+            timeout (float, optional): Время ожидания в секундах. По умолчанию 5.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'written': self.written,
+                'dropped': self.dropped, 'batches': self.batches}
+
+
+_pipeline = LogPipeline()
+atexit.register(lambda: _pipeline.close())
+
+
+def configure_logging(stream=None, path=None, max_queue=10000, batch_size=256):
+    """Заменяет журнал приложения.
+
+    Args:
+        stream (optional): Поток вывода. По умолчанию sys.stdout.
+        path (str, optional): Файл журнала.
+        max_queue (int, optional): Размер буфера записей.
+        batch_size (int, optional): Размер пачки.
+
+    Returns:
+        LogPipeline: Новый журнал.
+    """
+    global _pipeline
+    previous = _pipeline
+    _pipeline = LogPipeline(stream=stream, path=path, max_queue=max_queue, batch_size=batch_size)
+    previous.close()
+    return _pipeline
+
+
+def get_pipeline():
+    """Возвращает текущий журнал приложения."""
+    return _pipeline
+
+
+def _log(level, message, fields):
+    record = {'level': level, 'type': 'log', 'message': message}
+    if fields:
+        record.update(fields)
+    _pipeline.emit(record)
+
+
+def info(message, **fields):
+    """Пишет информационное сообщение в журнал.
+
+    Args:
+        message (str): Текст сообщения.
+        **fields: Дополнительные поля записи.
+    """
+    _log('info', message, fields)
+
+
+def warning(message, **fields):
+    """Пишет предупреждение в журнал."""
+    _log('warning', message, fields)
+
+
+def error(message, **fields):
+    """Пишет сообщение об ошибке в журнал."""
+    _log('error', message, fields)
+
+
+def access(**fields):
+    """Пишет запись журнала доступа (route, status, duration_ms, bytes, client_ip...)."""
+    _pipeline.emit({'type': 'access', **fields})
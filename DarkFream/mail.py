@@ -0,0 +1,648 @@
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+
+from . import logs
+
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+def build_message(sender, recipient, subject, body, html=False):
+    """Создает письмо.
+
+    Args:
+        sender (str): Адрес отправителя.
+        recipient (str): Адрес получателя.
+        subject (str): Тема письма.
+        body (str): Текст или HTML письма.
+        html (bool, optional): Отправить как HTML. По умолчанию False.
+
+    Returns:
+        EmailMessage: Готовое письмо.
+    """
+    msg = EmailMessage()
+    if html:
+        msg.set_content(body, subtype='html')
+    else:
+        msg.set_content(body)
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = recipient
+    return msg
+
+
+def is_transient(error):
+    """Проверяет, имеет ли смысл повторить отправку после ошибки.
+
+    Args:
+        error (Exception): Ошибка отправки.
+
+    Returns:
+        bool: True для сетевых ошибок и временных (4xx) ответов сервера.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class SMTPConnectionPool:
+    """Пул постоянных SMTP-соединений.
+
+    Соединение открывается, защищается (STARTTLS или SSL) и авторизуется один
+    раз, а затем переиспользуется для многих писем.
+
+    Attributes:
+        host (str): Хост SMTP-сервера.
+        port (int): Порт SMTP-сервера.
+        security (str): 'starttls', 'ssl' или None.
+        size (int): Максимальное число одновременно открытых соединений.
+        max_messages (int): Число писем, после которого соединение переоткрывается.
+        noop_after (float): Простой в секундах, после которого соединение проверяется NOOP.
+    """
+    def __init__(self, host, port, username=None, password=None, security='starttls',
+                 size=4, timeout=30, max_messages=100, noop_after=30):
+        """Инициализация пула.
+
+        Args:
+            host (str): Хост SMTP-сервера.
+            port (int): Порт SMTP-сервера.
+            username (str, optional): Логин. Без логина авторизация не выполняется.
+            password (str, optional): Пароль.
+            security (str, optional): 'starttls', 'ssl' или None. По умолчанию 'starttls'.
+            size (int, optional): Размер пула. По умолчанию 4.
+            timeout (float, optional): Таймаут сокета в секундах. По умолчанию 30.
+            max_messages (int, optional): Писем на одно соединение. По умолчанию 100.
+            noop_after (float, optional): Порог простоя для проверки NOOP. По умолчанию 30.
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.security = security
+        self.size = size
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self.noop_after = noop_after
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        if self.security == 'ssl':
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == 'starttls':
+                server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        server.darkfream_sent = 0
+        return server
+
+    def acquire(self, fresh=False):
+        """Берет соединение из пула или открывает новое.
+
+        Args:
+            fresh (bool, optional): Не брать простаивающие соединения, а открыть новое.
+
+        Returns:
+            smtplib.SMTP: Готовое к отправке соединение.
+        """
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle and not fresh else None
+                if entry is None:
+                    return self._connect()
+                server, released_at = entry
+                if time.monotonic() - released_at < self.noop_after:
+                    return server
+                try:
+                    if server.noop()[0] == 250:
+                        return server
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._discard(server)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, server, broken=False):
+        """Возвращает соединение в пул.
+
+        Args:
+            server (smtplib.SMTP): Соединение.
+            broken (bool, optional): Соединение неисправно и должно быть закрыто.
+        """
+        try:
+            if broken or server.darkfream_sent >= self.max_messages:
+                self._discard(server)
+            else:
+                with self._lock:
+                    self._idle.append((server, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def _discard(self, server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер для соединения из пула.
+
+        Yields:
+            smtplib.SMTP: Соединение. При сетевой ошибке оно закрывается.
+        """
+        server = self.acquire()
+        broken = False
+        try:
+            yield server
+        except TRANSIENT_ERRORS:
+            broken = True
+            raise
+        finally:
+            self.release(server, broken=broken)
+
+    def send_message(self, message):
+        """Отправляет одно письмо.
+
+        Соединение, простоявшее меньше noop_after, берется без проверки, и
+        сервер мог уже закрыть его. Поэтому при SMTPServerDisconnected письмо
+        один раз отправляется повторно через новое соединение.
+
+        Args:
+            message (EmailMessage): Письмо.
+        """
+        for attempt in range(2):
+            server = self.acquire(fresh=attempt > 0)
+            broken = False
+            try:
+                server.send_message(message)
+                server.darkfream_sent += 1
+                return
+            except smtplib.SMTPServerDisconnected:
+                broken = True
+                if attempt:
+                    raise
+            except TRANSIENT_ERRORS:
+                broken = True
+                raise
+            finally:
+                self.release(server, broken=broken)
+
+    def send(self, messages):
+        """Отправляет пачку писем через одно соединение.
+
+        Args:
+            messages (list): Список EmailMessage.
+
+        Returns:
+            list: Пары (письмо, ошибка) для неотправленных писем.
+        """
+        failures = []
+        server = self.acquire()
+        broken = False
+        try:
+            for message in messages:
+                if broken:
+                    failures.append((message, smtplib.SMTPServerDisconnected('Connection lost')))
+                    continue
+                try:
+                    server.send_message(message)
+                    server.darkfream_sent += 1
+                except TRANSIENT_ERRORS as e:
+                    broken = True
+                    failures.append((message, e))
+                except smtplib.SMTPException as e:
+                    failures.append((message, e))
+                    try:
+                        server.rset()
+                    except (smtplib.SMTPException, OSError):
+                        broken = True
+        finally:
+            self.release(server, broken=broken)
+        return failures
+
+    def close(self):
+        """Закрывает все простаивающие соединения."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._discard(server)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host, port, username=None, password=None, security='starttls', **options):
+    """Возвращает общий пул для сервера и учетной записи, создавая его при первом вызове.
+
+    Args:
+        host (str): Хост SMTP-сервера.
+        port (int): Порт SMTP-сервера.
+        username (str, optional): Логин.
+        password (str, optional): Пароль.
+        security (str, optional): 'starttls', 'ssl' или None.
+        **options: Дополнительные параметры SMTPConnectionPool.
+
+    Returns:
+        SMTPConnectionPool: Пул соединений.
+    """
+    key = (host, port, username, password, security)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SMTPConnectionPool(host, port, username, password, security, **options)
+        return pool
+
+
+class MailQueue:
+    """Фоновая очередь писем с пакетной отправкой и повторами.
+
+    Рабочие потоки забирают до batch_size писем и отправляют их через одно
+    соединение пула. Временные ошибки повторяются с экспоненциальной задержкой.
+
+    Attributes:
+        pool (SMTPConnectionPool): Пул соединений.
+        stats (dict): Счетчики sent, failed, retried и dropped.
+    """
+    def __init__(self, pool, workers=2, batch_size=50, max_retries=3, backoff=1.0,
+                 maxsize=10000, on_failure=None):
+        """Инициализация очереди.
+
+        Args:
+            pool (SMTPConnectionPool): Пул соединений.
+            workers (int, optional): Число рабочих потоков. По умолчанию 2.
+            batch_size (int, optional): Писем на одно соединение за раз. По умолчанию 50.
+            max_retries (int, optional): Число повторов. По умолчанию 3.
+            backoff (float, optional): Базовая задержка повтора в секундах. По умолчанию 1.
+            maxsize (int, optional): Емкость очереди. По умолчанию 10000.
+            on_failure (callable, optional): Вызывается как on_failure(message, error)
+                для окончательно неотправленных писем.
+        """
+        self.pool = pool
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_failure = on_failure
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0, 'dropped': 0}
+        self._queue = queue.Queue(maxsize)
+        self._threads = []
+        self._pending_retries = set()
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def start(self):
+        """Запускает рабочие потоки."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'darkfream-mail-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, message, attempt=0):
+        """Ставит письмо в очередь, не блокируя вызывающий поток.
+
+        Args:
+            message (EmailMessage): Письмо.
+            attempt (int, optional): Номер попытки. По умолчанию 0.
+
+        Returns:
+            bool: False, если очередь переполнена и письмо отброшено.
+        """
+        if not self._threads:
+            self.start()
+        try:
+            self._queue.put_nowait((message, attempt))
+            return True
+        except queue.Full:
+            self._count('dropped')
+            return False
+
+    def join(self, timeout=None):
+        """Ждет отправки всех писем, включая запланированные повторы.
+
+        Args:
+            timeout (float, optional): Максимальное время ожидания в секундах.
+
+        Returns:
+            bool: True, если очередь опустела.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                idle = not self._pending_retries and self._queue.unfinished_tasks == 0
+            if idle:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def stop(self, timeout=None):
+        """Дожидается отправки писем и останавливает рабочие потоки.
+
+        Args:
+            timeout (float, optional): Максимальное время ожидания в секундах.
+        """
+        self.join(timeout)
+        self._stopping = True
+        for _ in self._threads:
+            self._queue.put((None, 0))
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.pool.close()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.stats[name] += value
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item[0] is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[0] is None:
+                    self._queue.put(item)
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            try:
+                self._send_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _send_batch(self, batch):
+        attempts = {id(message): attempt for message, attempt in batch}
+        try:
+            failures = self.pool.send([message for message, _ in batch])
+        except Exception as e:
+            failures = [(message, e) for message, _ in batch]
+        self._count('sent', len(batch) - len(failures))
+        for message, error in failures:
+            attempt = attempts[id(message)]
+            if attempt < self.max_retries and is_transient(error) and not self._stopping:
+                self._schedule_retry(message, attempt + 1)
+            else:
+                self._count('failed')
+                if self.on_failure is not None:
+                    self.on_failure(message, error)
+                else:
+                    logs.error(f"Error sending email to {message['To']}: {str(error)}")
+
+    def _schedule_retry(self, message, attempt):
+        self._count('retried')
+        timer = threading.Timer(self.backoff * (2 ** (attempt - 1)), self._retry, (message, attempt))
+        timer.daemon = True
+        with self._lock:
+            self._pending_retries.add(timer)
+        timer.start()
+
+    def _retry(self, message, attempt):
+        try:
+            self.enqueue(message, attempt)
+        finally:
+            with self._lock:
+                self._pending_retries.discard(threading.current_thread())
+
+
+_default_queue = None
+_default_sender = None
+
+
+def configure_mail(host, port, username=None, password=None, security='starttls',
+                   sender=None, **options):
+    """Настраивает очередь по умолчанию для enqueue_email.
+
+    Args:
+        host (str): Хост SMTP-сервера.
+        port (int): Порт SMTP-сервера.
+        username (str, optional): Логин.
+        password (str, optional): Пароль.
+        security (str, optional): 'starttls', 'ssl' или None. По умолчанию 'starttls'.
+        sender (str, optional): Адрес отправителя по умолчанию. По умолчанию username.
+        **options: Параметры MailQueue (workers, batch_size, max_retries, backoff, maxsize).
+
+    Returns:
+        MailQueue: Очередь по умолчанию.
+    """
+    global _default_queue, _default_sender
+    if _default_queue is not None:
+        _default_queue.stop()
+    pool = get_pool(host, port, username, password, security)
+    _default_queue = MailQueue(pool, **options)
+    _default_sender = sender or username
+    return _default_queue
+
+
+def get_mail_queue():
+    """Возвращает очередь по умолчанию.
+
+    Returns:
+        MailQueue: Очередь или None, если configure_mail еще не вызывался.
+    """
+    return _default_queue
+
+
+def enqueue_email(recipient_email, subject, body, sender_email=None, html=False):
+    """Ставит письмо в фоновую очередь и сразу возвращает управление.
+
+    Args:
+        recipient_email (str): Адрес получателя.
+        subject (str): Тема письма.
+        body (str): Текст или HTML письма.
+        sender_email (str, optional): Адрес отправителя. По умолчанию из configure_mail.
+        html (bool, optional): Отправить как HTML. По умолчанию False.
+
+    Returns:
+        bool: False, если очередь переполнена.
+
+    Raises:
+        RuntimeError: Если очередь не настроена через configure_mail.
+    """
+    if _default_queue is None:
+        raise RuntimeError("Mail queue is not configured. Call configure_mail() first.")
+    message = build_message(sender_email or _default_sender, recipient_email, subject, body, html=html)
+    return _default_queue.enqueue(message)
+
+
+class MergeReport:
+    """Итоги рассылки send_mail_merge.
+
+    Attributes:
+        sent (int): Число отправленных писем.
+        failed (list): Пары (получатель, ошибка) для неотправленных писем.
+        skipped (int): Получатели без адреса.
+        elapsed (float): Длительность рассылки в секундах.
+    """
+    def __init__(self):
+        self.sent = 0
+        self.failed = []
+        self.skipped = 0
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        """Пропускная способность в письмах в секунду."""
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f'<MergeReport sent={self.sent} failed={len(self.failed)} skipped={self.skipped} '
+                f'elapsed={self.elapsed:.2f}s rate={self.rate:.1f} msg/s>')
+
+
+def send_mail_merge(app, template_name, recipients, subject, pool, sender_email=None,
+                    email_field='email', context=None, parallelism=4, html=True,
+                    buffer_size=None, progress=None, progress_every=1000):
+    """Рендерит шаблон для каждого получателя и рассылает письма потоком.
+
+    Получатели перебираются лениво (запросы peewee через iterator()), поэтому
+    в памяти находится не больше buffer_size отрисованных писем. Каждый из
+    parallelism потоков держит одно соединение из пула на всю рассылку.
+    Любая ошибка отправки записывается в report.failed и не останавливает
+    поток; если все потоки все же завершились, оставшиеся получатели тоже
+    попадают в report.failed, и рассылка не зависает на полном буфере.
+
+    Args:
+        app (DarkFream): Приложение, чье окружение шаблонов (app.env) используется.
+        template_name (str): Имя шаблона тела письма.
+        recipients (iterable): Запрос DarkModel или любой итерируемый объект получателей.
+        subject (str): Тема письма; может содержать выражения Jinja.
+        pool (SMTPConnectionPool): Пул соединений.
+        sender_email (str, optional): Адрес отправителя. По умолчанию логин пула.
+        email_field (str, optional): Атрибут или ключ с адресом получателя. По умолчанию 'email'.
+        context (callable, optional): Функция recipient -> dict с переменными шаблона.
+            По умолчанию {'recipient': recipient}.
+        parallelism (int, optional): Число отправляющих потоков. По умолчанию 4.
+        html (bool, optional): Отправлять как HTML. По умолчанию True.
+        buffer_size (int, optional): Размер буфера отрисованных писем. По умолчанию parallelism * 16.
+        progress (callable, optional): Вызывается как progress(report) каждые progress_every писем.
+        progress_every (int, optional): Период вызова progress. По умолчанию 1000.
+
+    Returns:
+        MergeReport: Итоги рассылки с пропускной способностью в письмах в секунду.
+    """
+    body_template = app.cache_template(template_name)
+    subject_template = app.env.from_string(subject) if '{' in subject else None
+    sender_email = sender_email or pool.username
+    parallelism = max(1, min(parallelism, pool.size))
+    pending = queue.Queue(buffer_size or parallelism * 16)
+    report = MergeReport()
+    lock = threading.Lock()
+    stop = object()
+
+    if hasattr(recipients, 'iterator'):
+        recipients = recipients.iterator()
+
+    def sender():
+        server = None
+        try:
+            while True:
+                item = pending.get()
+                if item is stop:
+                    return
+                recipient, message = item
+                try:
+                    if server is None:
+                        server = pool.acquire()
+                    server.send_message(message)
+                    server.darkfream_sent += 1
+                except TRANSIENT_ERRORS as e:
+                    if server is not None:
+                        pool.release(server, broken=True)
+                        server = None
+                    with lock:
+                        report.failed.append((recipient, e))
+                    continue
+                except smtplib.SMTPException as e:
+                    with lock:
+                        report.failed.append((recipient, e))
+                    continue
+                except Exception as e:
+                    if server is not None:
+                        pool.release(server, broken=True)
+                        server = None
+                    with lock:
+                        report.failed.append((recipient, e))
+                    continue
+                with lock:
+                    report.sent += 1
+                    notify = progress is not None and report.sent % progress_every == 0
+                if notify:
+                    report.elapsed = time.perf_counter() - started
+                    try:
+                        progress(report)
+                    except Exception as e:
+                        logs.error(f"Error in mail merge progress callback: {str(e)}")
+        finally:
+            if server is not None:
+                pool.release(server)
+
+    def put(item):
+        # Блокирующий put() без таймаута зависнет навсегда, если все
+        # отправляющие потоки завершились и буфер уже не разгрузится.
+        while any(thread.is_alive() for thread in threads):
+            try:
+                pending.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=sender, name=f'darkfream-merge-{index}', daemon=True)
+               for index in range(parallelism)]
+    for thread in threads:
+        thread.start()
+    try:
+        for recipient in recipients:
+            if isinstance(recipient, dict):
+                address = recipient.get(email_field)
+            else:
+                address = getattr(recipient, email_field, None)
+            if not address:
+                report.skipped += 1
+                continue
+            variables = context(recipient) if context is not None else {'recipient': recipient}
+            rendered_subject = subject_template.render(variables) if subject_template else subject
+            message = build_message(sender_email, address, rendered_subject,
+                                    body_template.render(variables), html=html)
+            if not put((recipient, message)):
+                report.failed.append((recipient, RuntimeError('Mail merge sender threads stopped')))
+    finally:
+        for _ in threads:
+            if not put(stop):
+                break
+        for thread in threads:
+            thread.join()
+    while True:
+        try:
+            item = pending.get_nowait()
+        except queue.Empty:
+            break
+        if item is not stop:
+            report.failed.append((item[0], RuntimeError('Mail merge sender threads stopped')))
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,323 @@
+from bisect import bisect_left
+import glob
+import json
+import os
+import threading
+import time
+
+from . import logs
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+KEY_SEPARATOR = '\x1f'
+UNMATCHED_ROUTE = '<unmatched>'
+HISTOGRAM_TABLES = ('requests', 'db', 'templates')
+COUNTER_TABLES = ('status', 'in_flight')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, key):
+    values = key.split(KEY_SEPARATOR)
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class _ThreadState:
+    """Метрики одного потока; пишутся без блокировок, читаются при сборе."""
+
+    def __init__(self, bucket_count):
+        self.bucket_count = bucket_count
+        self.requests = {}
+        self.db = {}
+        self.templates = {}
+        self.status = {}
+        self.in_flight = {}
+        self.db_seconds = 0.0
+        self.tracking = False
+
+    def observe(self, table, key, index, value):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = [[0] * (self.bucket_count + 1), 0.0, 0]
+        histogram[0][index] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+
+class Metrics:
+    """Низконакладные метрики запросов в формате Prometheus.
+
+    Гистограммы и счетчики ведутся отдельно в каждом потоке, поэтому запись
+    не требует блокировок; при отдаче /metrics они суммируются. Метрики
+    завершившихся потоков (ThreadingHTTPServer создает поток на запрос)
+    переносятся в общую сумму, и число хранимых состояний не растет. Если задан
+    multiprocess_dir, каждый процесс (например, pre-fork воркер) сохраняет
+    туда свой снимок, и /metrics любого процесса отдает сумму по всем.
+
+    Собираются:
+        darkfream_request_duration_seconds - латентность по шаблону маршрута и методу;
+        darkfream_requests_total - число ответов по маршруту, методу и статусу;
+        darkfream_requests_in_flight - запросы в обработке;
+        darkfream_request_db_seconds - время SQL-запросов за один HTTP-запрос;
+        darkfream_template_render_seconds - время рендеринга шаблонов.
+
+    Attributes:
+        buckets (tuple): Границы корзин гистограмм в секундах.
+        multiprocess_dir (str): Каталог для снимков процессов или None.
+        flush_interval (float): Период сохранения снимка в секундах.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, multiprocess_dir=None, flush_interval=5.0):
+        """Инициализация метрик.
+
+        Args:
+            buckets (tuple, optional): Границы корзин гистограмм.
+            multiprocess_dir (str, optional): Каталог для снимков процессов.
+            flush_interval (float, optional): Период сохранения снимка. По умолчанию 5 секунд.
+        """
+        self.buckets = tuple(buckets)
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._states = []
+        self._retired = _empty_snapshot()
+        self._lock = threading.Lock()
+        self._flusher = None
+        if multiprocess_dir:
+            os.makedirs(multiprocess_dir, exist_ok=True)
+
+    def _state(self):
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            state = self._local.state = _ThreadState(len(self.buckets))
+            with self._lock:
+                self._reap()
+                self._states.append((threading.current_thread(), state))
+            self._start_flusher()
+        return state
+
+    def _reap(self):
+        # Вызывается под self._lock: состояния завершившихся потоков больше
+        # не меняются, их можно сложить в общую сумму и забыть.
+        live = []
+        for thread, state in self._states:
+            if thread.is_alive():
+                live.append((thread, state))
+            else:
+                _fold(self._retired, state)
+        self._states = live
+
+    def _start_flusher(self):
+        if not self.multiprocess_dir or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='darkfream-metrics', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logs.error(f'Error writing metrics snapshot: {str(e)}')
+
+    def track(self, route, method, func):
+        """Выполняет обработчик, замеряя время, статус и время SQL.
+
+        Args:
+            route (str): Шаблон маршрута.
+            method (str): HTTP-метод.
+            func (callable): Функция без аргументов, возвращающая ответ (status, body, type).
+
+        Returns:
+            Результат func.
+        """
+        state = self._state()
+        key = f'{route}{KEY_SEPARATOR}{method}'
+        state.in_flight[key] = state.in_flight.get(key, 0) + 1
+        nested = state.tracking
+        if not nested:
+            state.tracking = True
+            state.db_seconds = 0.0
+        status = 500
+        start = time.perf_counter()
+        try:
+            result = func()
+            status = result[0] if result is not None else 404
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            state.in_flight[key] -= 1
+            state.observe(state.requests, key, bisect_left(self.buckets, elapsed), elapsed)
+            status_key = f'{key}{KEY_SEPARATOR}{status}'
+            state.status[status_key] = state.status.get(status_key, 0) + 1
+            if not nested:
+                state.tracking = False
+                db = state.db_seconds
+                state.observe(state.db, key, bisect_left(self.buckets, db), db)
+
+    def count_unmatched(self, method, status=404):
+        """Учитывает запрос, для которого не нашелся маршрут.
+
+        Args:
+            method (str): HTTP-метод.
+            status (int, optional): Код ответа. По умолчанию 404.
+        """
+        state = self._state()
+        status_key = f'{UNMATCHED_ROUTE}{KEY_SEPARATOR}{method}{KEY_SEPARATOR}{status}'
+        state.status[status_key] = state.status.get(status_key, 0) + 1
+
+    def observe_template(self, template_name, seconds):
+        """Учитывает время рендеринга шаблона.
+
+        Args:
+            template_name (str): Имя шаблона.
+            seconds (float): Время рендеринга.
+        """
+        state = self._state()
+        state.observe(state.templates, template_name, bisect_left(self.buckets, seconds), seconds)
+
+    def on_query(self, sql, params, seconds):
+        """Слушатель запросов DarkSqliteDatabase: копит время SQL текущего HTTP-запроса."""
+        state = getattr(self._local, 'state', None)
+        if state is not None and state.tracking:
+            state.db_seconds += seconds
+
+    def snapshot(self):
+        """Суммирует метрики всех потоков процесса.
+
+        Returns:
+            dict: Сериализуемый в JSON снимок.
+        """
+        with self._lock:
+            self._reap()
+            states = [state for _, state in self._states]
+            merged = _empty_snapshot()
+            for table in HISTOGRAM_TABLES:
+                for key, (counts, total, count) in self._retired[table].items():
+                    merged[table][key] = [list(counts), total, count]
+            for table in COUNTER_TABLES:
+                merged[table].update(self._retired[table])
+        for state in states:
+            _fold(merged, state)
+        return merged
+
+    def write_snapshot(self):
+        """Сохраняет снимок процесса в multiprocess_dir."""
+        if not self.multiprocess_dir:
+            return
+        path = os.path.join(self.multiprocess_dir, f'metrics_{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Собирает снимки всех процессов.
+
+        Gauge in_flight завершившихся процессов отбрасывается, счетчики и
+        гистограммы сохраняются.
+
+        Returns:
+            dict: Объединенный снимок.
+        """
+        merged = self.snapshot()
+        if not self.multiprocess_dir:
+            return merged
+        self.write_snapshot()
+        own = f'metrics_{os.getpid()}.json'
+        for path in glob.glob(os.path.join(self.multiprocess_dir, 'metrics_*.json')):
+            name = os.path.basename(path)
+            if name == own:
+                continue
+            try:
+                with open(path) as f:
+                    other = json.load(f)
+                pid = int(name[len('metrics_'):-len('.json')])
+            except (OSError, ValueError):
+                continue
+            for table in HISTOGRAM_TABLES:
+                for key, (counts, total, count) in other.get(table, {}).items():
+                    _merge_histogram(merged[table], key, counts, total, count)
+            tables = COUNTER_TABLES if _pid_alive(pid) else ('status',)
+            for table in tables:
+                target = merged[table]
+                for key, value in other.get(table, {}).items():
+                    target[key] = target.get(key, 0) + value
+        return merged
+
+    def render(self):
+        """Отдает метрики в текстовом формате Prometheus.
+
+        Returns:
+            str: Текст экспозиции.
+        """
+        data = self.collect()
+        lines = []
+        self._render_histogram(lines, 'darkfream_request_duration_seconds',
+                               'Request latency by route pattern and method.',
+                               ('route', 'method'), data['requests'])
+        lines.append('# HELP darkfream_requests_total Responses by route pattern, method and status.')
+        lines.append('# TYPE darkfream_requests_total counter')
+        for key, value in sorted(data['status'].items()):
+            lines.append(f'darkfream_requests_total{{{_labels(("route", "method", "status"), key)}}} {value}')
+        lines.append('# HELP darkfream_requests_in_flight Requests currently being processed.')
+        lines.append('# TYPE darkfream_requests_in_flight gauge')
+        for key, value in sorted(data['in_flight'].items()):
+            lines.append(f'darkfream_requests_in_flight{{{_labels(("route", "method"), key)}}} {value}')
+        self._render_histogram(lines, 'darkfream_request_db_seconds',
+                               'Total SQL time per request by route pattern and method.',
+                               ('route', 'method'), data['db'])
+        self._render_histogram(lines, 'darkfream_template_render_seconds',
+                               'Template render time by template.', ('template',), data['templates'])
+        return '\n'.join(lines) + '\n'
+
+    def _render_histogram(self, lines, name, description, label_names, histograms):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, (counts, total, count) in sorted(histograms.items()):
+            labels = _labels(label_names, key)
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{{labels}}} {total}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+
+
+def _empty_snapshot():
+    return {table: {} for table in HISTOGRAM_TABLES + COUNTER_TABLES}
+
+
+def _fold(merged, state):
+    for table in HISTOGRAM_TABLES:
+        for key, (counts, total, count) in list(getattr(state, table).items()):
+            _merge_histogram(merged[table], key, list(counts), total, count)
+    for table in COUNTER_TABLES:
+        target = merged[table]
+        for key, value in list(getattr(state, table).items()):
+            target[key] = target.get(key, 0) + value
+
+
+def _merge_histogram(table, key, counts, total, count):
+    existing = table.get(key)
+    if existing is None:
+        table[key] = [list(counts), total, count]
+        return
+    existing[0] = [a + b for a, b in zip(existing[0], counts)]
+    existing[1] += total
+    existing[2] += count
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
@@ -0,0 +1,169 @@
+import asyncio
+import inspect
+import threading
+import time
+
+HOOK_POINTS = ('before_request', 'after_response', 'on_error')
+
+
+class _AsyncRunner:
+    """Фоновый цикл событий для выполнения асинхронных middleware.
+
+    Сервер обрабатывает запросы синхронно, поэтому корутины отправляются
+    в один долгоживущий цикл вместо создания нового цикла на каждый вызов.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+                                       name='darkfream-middleware-loop', daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+
+def _callback_name(callback):
+    module = getattr(callback, '__module__', None)
+    name = getattr(callback, '__qualname__', None) or repr(callback)
+    return f'{module}.{name}' if module else name
+
+
+def _adapt(callback):
+    if inspect.iscoroutinefunction(callback) or inspect.iscoroutinefunction(
+            getattr(callback, '__call__', None)):
+        def sync_callback(*args):
+            return _AsyncRunner.get().run(callback(*args))
+        return sync_callback
+    return callback
+
+
+class MiddlewarePipeline:
+    """Скомпилированная цепочка middleware вокруг обработчика запросов.
+
+    Хуки before_request, after_response и on_error собираются один раз в
+    кортежи, и на каждый запрос не выполняется поиск по словарю хуков.
+
+    Хуки вызываются так:
+        before_request(data) -> ответ или None (ответ прерывает цепочку);
+        after_response(data, response) -> новый ответ или None;
+        on_error(data, exception) -> ответ или None (None пробрасывает исключение).
+
+    Attributes:
+        profile (bool): Собирать ли время выполнения каждого middleware.
+        timings (dict): Имя middleware -> [число вызовов, суммарное время, максимум].
+    """
+    def __init__(self, hooks, profile=False):
+        """Инициализация конвейера.
+
+        Args:
+            hooks (dict): Словарь хуков PluginManager.
+            profile (bool, optional): Включить замер времени. По умолчанию False.
+        """
+        self.profile = profile
+        self.timings = {}
+        self._timings_lock = threading.Lock()
+        self.before_request = self._prepare('before_request', hooks)
+        self.after_response = self._prepare('after_response', hooks)
+        self.on_error = self._prepare('on_error', hooks)
+
+    def __len__(self):
+        return len(self.before_request) + len(self.after_response) + len(self.on_error)
+
+    def _prepare(self, hook_name, hooks):
+        prepared = []
+        for callback in hooks.get(hook_name, ()):
+            adapted = _adapt(callback)
+            if self.profile:
+                adapted = self._timed(f'{hook_name}:{_callback_name(callback)}', adapted)
+            prepared.append(adapted)
+        return tuple(prepared)
+
+    def _timed(self, name, callback):
+        stats = self.timings.setdefault(name, [0, 0.0, 0.0])
+        lock = self._timings_lock
+
+        def timed_callback(*args):
+            start = time.perf_counter()
+            try:
+                return callback(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                with lock:
+                    stats[0] += 1
+                    stats[1] += elapsed
+                    if elapsed > stats[2]:
+                        stats[2] = elapsed
+        return timed_callback
+
+    def compile(self, dispatch):
+        """Собирает функцию обработки запроса вокруг dispatch.
+
+        Если хуков нет, возвращается сам dispatch без накладных расходов.
+
+        Args:
+            dispatch (callable): Функция (path, method, data) -> ответ.
+
+        Returns:
+            callable: Функция (path, method, data) -> ответ.
+        """
+        if not len(self):
+            return dispatch
+
+        before_request = self.before_request
+        after_response = self.after_response
+        on_error = self.on_error
+
+        def handle(path, method='GET', data=None):
+            response = None
+            for callback in before_request:
+                response = callback(data)
+                if response is not None:
+                    break
+            if response is None:
+                try:
+                    response = dispatch(path, method, data)
+                except Exception as e:
+                    for callback in on_error:
+                        response = callback(data, e)
+                        if response is not None:
+                            break
+                    if response is None:
+                        raise
+            for callback in after_response:
+                result = callback(data, response)
+                if result is not None:
+                    response = result
+            return response
+        return handle
+
+    def timing_report(self):
+        """Возвращает разбивку времени по middleware.
+
+        Returns:
+            list: Словари с полями name, calls, total_ms, avg_ms, max_ms,
+                отсортированные по суммарному времени.
+        """
+        with self._timings_lock:
+            timings = [(name, tuple(stats)) for name, stats in self.timings.items()]
+        report = []
+        for name, (calls, total, maximum) in timings:
+            report.append({
+                'name': name,
+                'calls': calls,
+                'total_ms': total * 1000,
+                'avg_ms': total * 1000 / calls if calls else 0.0,
+                'max_ms': maximum * 1000,
+            })
+        report.sort(key=lambda item: item['total_ms'], reverse=True)
+        return report
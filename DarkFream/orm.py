@@ -1,13 +1,327 @@
-import bcrypt
+from itertools import chain, islice
+import threading
+import time
+
+import peewee
 from peewee import *
 
-from .global_config import get_round
+from . import hashing, identitymap, logs, search
+from .querycache import CachedCursor, PrefetchedCursor, QueryCache, write_tables
+from .signals import post_delete, post_save, pre_save
+
+BULK_BATCH_SIZE = 1000
+
+
+class DarkSqliteDatabase(SqliteDatabase):
+    """SqliteDatabase, уведомляющая слушателей о каждом выполненном запросе.
+
+    Слушатель вызывается как listener(sql, params, seconds). Пока слушателей
+    нет, execute_sql не делает ничего сверх обычной SqliteDatabase.
+
+    Если у какой-либо модели задано Meta.cache = True, база создает
+    QueryCache: SELECT-запросы с LIMIT вне транзакций к таблицам таких моделей
+    обслуживаются из кэша, а любая запись в таблицу сбрасывает ее результаты
+    (повторно - при завершении транзакции).
+
+    Attributes:
+        query_listeners (tuple): Зарегистрированные слушатели.
+        query_cache (QueryCache): Кэш запросов или None.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_listeners = ()
+        self.query_cache = None
+        self._pending = threading.local()
+
+    def add_query_listener(self, listener):
+        """Добавляет слушателя запросов.
+
+        Args:
+            listener (callable): Функция listener(sql, params, seconds).
+        """
+        if listener not in self.query_listeners:
+            self.query_listeners = self.query_listeners + (listener,)
+
+    def remove_query_listener(self, listener):
+        """Удаляет слушателя запросов.
+
+        Args:
+            listener (callable): Ранее добавленный слушатель.
+        """
+        self.query_listeners = tuple(item for item in self.query_listeners if item != listener)
+
+    def configure_query_cache(self, max_entries=1000, ttl=60.0, max_rows=1000):
+        """Задает размер и время жизни записей кэша запросов.
+
+        Args:
+            max_entries (int, optional): Максимальное число записей. По умолчанию 1000.
+            ttl (float, optional): Время жизни записи по умолчанию. По умолчанию 60 секунд.
+            max_rows (int, optional): Результаты длиннее этого числа строк не кэшируются.
+                По умолчанию 1000.
+
+        Returns:
+            QueryCache: Кэш запросов.
+        """
+        if self.query_cache is None:
+            self.query_cache = QueryCache(max_entries=max_entries, ttl=ttl, max_rows=max_rows)
+        else:
+            self.query_cache.max_entries = max_entries
+            self.query_cache.ttl = ttl
+            self.query_cache.max_rows = max_rows
+        return self.query_cache
 
-conn = SqliteDatabase('darkfream.db')
+    def register_cached_model(self, model):
+        """Включает кэширование запросов к таблице модели (Meta.cache, Meta.cache_ttl).
 
-class DarkModel(Model):
+        Args:
+            model (type): Модель.
+        """
+        if self.query_cache is None:
+            self.query_cache = QueryCache()
+        self.query_cache.register(model._meta.table_name, getattr(model._meta, 'cache_ttl', None))
+
+    def execute_sql(self, sql, params=None, commit=None):
+        cache = self.query_cache
+        if cache is None and identitymap.current() is None:
+            return self._execute(sql, params, commit)
+        if cache is not None and sql[:6].upper() == 'SELECT' and self.transaction_depth() == 0:
+            tables = cache.tables_for(sql)
+            if tables is not None:
+                key = (sql, tuple(params or ()))
+                cached = cache.get(key, tables)
+                if cached is not None:
+                    return CachedCursor(*cached)
+                generation = cache.generation(tables)
+                cursor = self._execute(sql, params, commit)
+                rows = cursor.fetchmany(cache.max_rows + 1)
+                if len(rows) > cache.max_rows:
+                    return PrefetchedCursor(cursor, rows)
+                cache.put(key, tables, cursor.description, rows, generation)
+                return CachedCursor(cursor.description, rows)
+        cursor = self._execute(sql, params, commit)
+        self._invalidate(write_tables(sql))
+        return cursor
+
+    def _invalidate(self, tables):
+        if tables == ():
+            return
+        identity_map = identitymap.current()
+        if identity_map is not None:
+            identity_map.discard(tables)
+        if self.query_cache is None:
+            return
+        self.query_cache.invalidate(tables)
+        if self.transaction_depth() > 0:
+            pending = getattr(self._pending, 'tables', None)
+            if pending is None:
+                pending = self._pending.tables = set()
+            if tables is None:
+                pending.add(None)
+            else:
+                pending.update(tables)
+
+    def _end_transaction(self):
+        pending = getattr(self._pending, 'tables', None)
+        if pending:
+            self._pending.tables = None
+            self.query_cache.invalidate(None if None in pending else pending)
+
+    def on_commit(self, callback):
+        """Вызывает callback после фиксации текущей транзакции потока.
+
+        Вне транзакции callback вызывается сразу. При откате транзакции он
+        отбрасывается, при откате точки сохранения (вложенный atomic()) -
+        отбрасываются callback, добавленные после ее создания.
+
+        Args:
+            callback (callable): Функция без аргументов.
+        """
+        if self.transaction_depth() == 0:
+            callback()
+            return
+        levels = getattr(self._pending, 'callbacks', None)
+        if not levels:
+            levels = self._pending.callbacks = [[]]
+        levels[-1].append(callback)
+
+    def savepoint(self, sid=None):
+        return _DarkSavepoint(self, sid)
+
+    def _push_callbacks(self):
+        levels = getattr(self._pending, 'callbacks', None)
+        if not levels:
+            levels = self._pending.callbacks = [[]]
+        levels.append([])
+
+    def _release_callbacks(self):
+        levels = self._pending.callbacks
+        if levels and len(levels) > 1:
+            levels[-2].extend(levels[-1])
+            levels[-1] = []
+
+    def _discard_callbacks(self):
+        levels = self._pending.callbacks
+        if levels:
+            levels[-1] = []
+        identity_map = identitymap.current()
+        if identity_map is not None:
+            identity_map.discard(None)
+
+    def _pop_callbacks(self):
+        levels = self._pending.callbacks
+        if levels and len(levels) > 1:
+            levels[-2].extend(levels.pop())
+
+    def commit(self):
+        super().commit()
+        self._end_transaction()
+        levels = getattr(self._pending, 'callbacks', None)
+        if levels:
+            self._pending.callbacks = None
+            for callback in chain.from_iterable(levels):
+                callback()
+
+    def rollback(self):
+        super().rollback()
+        self._end_transaction()
+        self._pending.callbacks = None
+        identity_map = identitymap.current()
+        if identity_map is not None:
+            identity_map.discard(None)
+
+    def _execute(self, sql, params=None, commit=None):
+        listeners = self.query_listeners
+        if not listeners:
+            return super().execute_sql(sql, params, commit)
+        start = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, commit)
+        finally:
+            elapsed = time.perf_counter() - start
+            for listener in listeners:
+                listener(sql, params, elapsed)
+
+    def execute_many(self, sql, seq_of_params):
+        """Выполняет запрос для каждого набора параметров через cursor.executemany.
+
+        Слушатели получают один вызов с params=None и общим временем.
+
+        Args:
+            sql (str): Запрос с параметрами.
+            seq_of_params (list): Наборы параметров.
+
+        Returns:
+            int: Число затронутых строк.
+        """
+        start = time.perf_counter()
+        try:
+            cursor = self.cursor()
+            with peewee.__exception_wrapper__:
+                cursor.executemany(sql, seq_of_params)
+            return cursor.rowcount
+        finally:
+            elapsed = time.perf_counter() - start
+            for listener in self.query_listeners:
+                listener(sql, None, elapsed)
+            self._invalidate(write_tables(sql))
+
+
+class _DarkSavepoint(peewee._savepoint):
+    """Точка сохранения, отслеживающая callback on_commit своего уровня."""
+
+    def _begin(self):
+        super()._begin()
+        self._tracked = self.db.transaction_depth() > 0
+        if self._tracked:
+            self.db._push_callbacks()
+
+    def commit(self, begin=True):
+        super().commit(begin=False)
+        if self._tracked:
+            self.db._release_callbacks()
+        if begin:
+            peewee._savepoint._begin(self)
+
+    def rollback(self):
+        super().rollback()
+        if self._tracked:
+            self.db._discard_callbacks()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            return super().__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            if self._tracked:
+                self.db._pop_callbacks()
+
+
+conn = DarkSqliteDatabase('darkfream.db')
+
+
+class BulkResult:
+    """Итог массовой операции DarkModel.bulk_*.
+
+    Attributes:
+        rows (int): Число обработанных строк (для bulk_update - измененных).
+        batches (int): Число пакетов executemany.
+        seconds (float): Время операции, включая перестроение индексов.
+    """
+    def __init__(self, rows=0, batches=0, seconds=0.0):
+        self.rows = rows
+        self.batches = batches
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return f'<BulkResult rows={self.rows} batches={self.batches} {self.rows_per_second:.0f} rows/s>'
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _row_keys(row):
+    return row.__data__.keys() if isinstance(row, Model) else row.keys()
+
+
+class DarkModelBase(peewee.ModelBase):
+    """Метакласс DarkModel: подключает кэш запросов для моделей с Meta.cache."""
+
+    def __new__(cls, name, bases, attrs, **kwargs):
+        model = super().__new__(cls, name, bases, attrs, **kwargs)
+        database = model._meta.database
+        if getattr(model._meta, 'cache', False) and hasattr(database, 'register_cached_model'):
+            database.register_cached_model(model)
+        return model
+
+
+class DarkModel(Model, metaclass=DarkModelBase):
     """Базовая модель для всех моделей в приложении.
 
+    save() и delete_instance() отправляют сигналы pre_save, post_save и
+    post_delete (см. signals), массовые операции - по одному сигналу на пакет.
+
+    Во время HTTP-запроса get_by_id, get по первичному ключу или уникальному
+    полю и обращения к внешним ключам используют карту объектов запроса
+    (см. identitymap): повторная загрузка той же строки возвращает тот же
+    экземпляр без SQL-запроса.
+
+    Кэширование запросов и полнотекстовый поиск включаются в Meta модели:
+
+        class Post(DarkModel):
+            class Meta:
+                cache = True
+                cache_ttl = 30
+                search_fields = ('title', 'body')
+
     Attributes:
         Meta: Настройки базы данных.
     """
@@ -34,6 +348,399 @@ class DarkModel(Model):
         """
         return {field_name: getattr(cls, field_name) for field_name, _ in cls.get_fields()}
 
+    def save(self, force_insert=False, only=None):
+        """Сохраняет объект, отправляя сигналы pre_save и post_save.
+
+        Args:
+            force_insert (bool, optional): Всегда выполнять INSERT.
+            only (list, optional): Сохраняемые поля.
+
+        Returns:
+            int: Число измененных строк.
+        """
+        cls = type(self)
+        database = cls._meta.database
+        created = force_insert or self._pk is None
+        if pre_save.has_receivers(cls):
+            pre_save.send(cls, database=database, instance=self, created=created)
+        rows = super().save(force_insert=force_insert, only=only)
+        identity_map = identitymap.current()
+        if identity_map is not None:
+            identity_map.add(self)
+        if post_save.has_receivers(cls):
+            post_save.send(cls, database=database, instance=self, created=created)
+        return rows
+
+    def delete_instance(self, recursive=False, delete_nullable=False):
+        """Удаляет объект и отправляет сигнал post_delete.
+
+        Зависимые объекты, удаляемые при recursive=True, сигналов не получают.
+
+        Args:
+            recursive (bool, optional): Удалить зависимые объекты.
+            delete_nullable (bool, optional): Удалять, а не обнулять, необязательные ссылки.
+
+        Returns:
+            int: Число удаленных строк.
+        """
+        rows = super().delete_instance(recursive=recursive, delete_nullable=delete_nullable)
+        if post_delete.has_receivers(type(self)):
+            post_delete.send(type(self), database=self._meta.database, instance=self)
+        return rows
+
+    @classmethod
+    def get_by_id(cls, pk):
+        """Возвращает объект по первичному ключу.
+
+        Для моделей с Meta.cache результат кэшируется по (таблица, ключ), так что
+        повторные вызовы не строят SQL и не обращаются к базе.
+
+        Args:
+            pk: Значение первичного ключа.
+
+        Returns:
+            DarkModel: Найденный объект.
+
+        Raises:
+            DoesNotExist: Если объект не найден.
+        """
+        database = cls._meta.database
+        cache = getattr(database, 'query_cache', None)
+        table = cls._meta.table_name
+        if cache is None or table not in cache.tables or database.transaction_depth():
+            return super().get_by_id(pk)
+        identity_map = identitymap.current()
+        if identity_map is not None:
+            instance = identity_map.get(cls, cls._meta.primary_key, pk)
+            if instance is not None:
+                return instance
+        key = ('get_by_id', table, pk)
+        tables = (table,)
+        cached = cache.get(key, tables)
+        if cached is not None:
+            instance = cls(__no_default__=1)
+            instance.__data__ = dict(cached[1])
+            instance._dirty.clear()
+        else:
+            generation = cache.generation(tables)
+            instance = super().get(cls._meta.primary_key == pk)
+            cache.put(key, tables, None, dict(instance.__data__), generation)
+        if identity_map is not None:
+            identity_map.add(instance)
+        return instance
+
+    @classmethod
+    def get(cls, *query, **filters):
+        """Возвращает один объект по условиям.
+
+        Во время HTTP-запроса выборка по первичному ключу или уникальному полю
+        сначала ищется в карте объектов запроса, а загруженный объект
+        добавляется в нее.
+
+        Args:
+            *query: Условия peewee или значение первичного ключа.
+            **filters: Условия вида поле=значение.
+
+        Returns:
+            DarkModel: Найденный объект.
+
+        Raises:
+            DoesNotExist: Если объект не найден.
+        """
+        identity_map = identitymap.current()
+        if identity_map is None:
+            return super().get(*query, **filters)
+        lookup = cls._identity_lookup(query, filters)
+        if lookup is not None:
+            instance = identity_map.get(cls, *lookup)
+            if instance is not None:
+                return instance
+        instance = super().get(*query, **filters)
+        identity_map.add(instance)
+        return instance
+
+    @classmethod
+    def _identity_lookup(cls, query, filters):
+        """Возвращает (поле, значение), если условие - равенство ключу или уникальному полю."""
+        if filters:
+            if query or len(filters) != 1:
+                return None
+            (name, value), = filters.items()
+            field = cls._meta.fields.get(name)
+        elif len(query) == 1:
+            expression = query[0]
+            if isinstance(expression, int):
+                return cls._meta.primary_key, expression
+            if not isinstance(expression, peewee.Expression) or expression.op != peewee.OP.EQ:
+                return None
+            field, value = expression.lhs, expression.rhs
+        else:
+            return None
+        if not isinstance(field, Field) or field.model is not cls or isinstance(value, peewee.Node):
+            return None
+        if not (field.primary_key or field.unique):
+            return None
+        return field, value
+
+    @classmethod
+    def search(cls, text):
+        """Ищет объекты по полям Meta.search_fields через индекс FTS5.
+
+        Индекс создается в migrate(). Находятся объекты, содержащие все слова
+        строки (последнее - по префиксу); результаты упорядочены по релевантности.
+
+        Args:
+            text (str): Строка поиска.
+
+        Returns:
+            ModelSelect: Запрос найденных объектов.
+
+        Raises:
+            ValueError: Если у модели нет Meta.search_fields.
+        """
+        return search.search(cls, text)
+
+    @classmethod
+    def cache_stats(cls):
+        """Возвращает попадания и промахи кэша запросов для таблицы модели.
+
+        Returns:
+            dict: {'hits': ..., 'misses': ...} или None, если кэш не используется.
+        """
+        cache = getattr(cls._meta.database, 'query_cache', None)
+        if cache is None or cls._meta.table_name not in cache.tables:
+            return None
+        hits, misses = cache.table_stats.get(cls._meta.table_name, (0, 0))
+        return {'hits': hits, 'misses': misses}
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Сбрасывает кэш запросов таблицы модели, например после записи в обход ORM."""
+        cache = getattr(cls._meta.database, 'query_cache', None)
+        if cache is not None:
+            cache.invalidate([cls._meta.table_name])
+
+    @classmethod
+    def bulk_create(cls, rows, batch_size=None, rebuild_indexes=False):
+        """Массово вставляет строки одной транзакцией через executemany.
+
+        Не заполняет id у переданных экземпляров. Сигналы pre_save и post_save
+        отправляются один раз на пакет с instance=None, rows=<строки пакета>,
+        created=True.
+
+        Args:
+            rows (iterable): Словари {поле: значение} или экземпляры модели.
+                Может быть генератором: строки читаются пакетами. Строки могут
+                задавать разные наборы полей: подряд идущие строки с одинаковым
+                набором записываются одним запросом.
+            batch_size (int, optional): Размер пакета executemany. По умолчанию 1000.
+            rebuild_indexes (bool, optional): Удалить неуникальные индексы на время
+                загрузки и построить заново в конце. Ускоряет очень большие загрузки.
+
+        Returns:
+            BulkResult: Число строк, пакетов и скорость загрузки.
+        """
+        return cls._bulk_write(rows, lambda fields: cls._insert_sql(fields), batch_size, rebuild_indexes,
+                               created=True)
+
+    @classmethod
+    def bulk_upsert(cls, rows, conflict_target=None, update=None, batch_size=None, rebuild_indexes=False):
+        """Массово вставляет строки, обновляя уже существующие (INSERT ... ON CONFLICT).
+
+        Сигналы отправляются на пакет, как в bulk_create, с created=None.
+
+        Args:
+            rows (iterable): Словари {поле: значение} или экземпляры модели.
+            conflict_target (list, optional): Поля уникального ключа. По умолчанию первичный ключ.
+            update (list, optional): Поля, обновляемые при конфликте. По умолчанию
+                все вставляемые поля, кроме ключа; пустой список - DO NOTHING.
+            batch_size (int, optional): Размер пакета executemany. По умолчанию 1000.
+            rebuild_indexes (bool, optional): Перестроить неуникальные индексы после загрузки.
+
+        Returns:
+            BulkResult: Число строк, пакетов и скорость загрузки.
+
+        Raises:
+            ValueError: Если поля ключа отсутствуют во вставляемых строках.
+        """
+        target = cls._resolve_fields(conflict_target or [cls._meta.primary_key])
+
+        target_names = {field.name for field in target}
+
+        def build(fields):
+            names = {field.name for field in fields}
+            missing = [field.name for field in target if field.name not in names]
+            if missing:
+                raise ValueError(f"Conflict target fields missing from rows: {', '.join(missing)}")
+            updated = cls._resolve_fields(update) if update is not None else \
+                [field for field in fields if field.name not in target_names and not field.primary_key]
+            columns = ', '.join(f'"{field.column_name}"' for field in target)
+            if updated:
+                assignments = ', '.join(f'"{field.column_name}" = excluded."{field.column_name}"'
+                                        for field in updated)
+                action = f'DO UPDATE SET {assignments}'
+            else:
+                action = 'DO NOTHING'
+            return f'{cls._insert_sql(fields)} ON CONFLICT ({columns}) {action}'
+
+        return cls._bulk_write(rows, build, batch_size, rebuild_indexes)
+
+    @classmethod
+    def bulk_update(cls, rows, fields, batch_size=None, rebuild_indexes=False):
+        """Массово обновляет указанные поля по первичному ключу через executemany.
+
+        Сигналы отправляются на пакет, как в bulk_create, с created=False.
+
+        Args:
+            rows (iterable): Экземпляры модели или словари с первичным ключом.
+            fields (list): Обновляемые поля (имена или объекты Field).
+            batch_size (int, optional): Размер пакета executemany. По умолчанию 1000.
+            rebuild_indexes (bool, optional): Перестроить неуникальные индексы после обновления.
+
+        Returns:
+            BulkResult: rows - число измененных строк.
+        """
+        primary_key = cls._meta.primary_key
+        updated = cls._resolve_fields(fields)
+        assignments = ', '.join(f'"{field.column_name}" = ?' for field in updated)
+        sql = f'UPDATE "{cls._meta.table_name}" SET {assignments} WHERE "{primary_key.column_name}" = ?'
+        columns = updated + [primary_key]
+        return cls._bulk_write(rows, lambda row_fields: sql, batch_size, rebuild_indexes,
+                               fields=columns, count_changes=True, created=False)
+
+    @classmethod
+    def _resolve_fields(cls, fields):
+        resolved = []
+        for field in fields:
+            if isinstance(field, str):
+                name = field
+                field = cls._meta.fields.get(name) or cls._meta.columns.get(name)
+                if field is None:
+                    raise ValueError(f"Unknown field {name} for {cls.__name__}")
+            resolved.append(field)
+        return resolved
+
+    @classmethod
+    def _insert_sql(cls, fields):
+        columns = ', '.join(f'"{field.column_name}"' for field in fields)
+        placeholders = ', '.join('?' for _ in fields)
+        return f'INSERT INTO "{cls._meta.table_name}" ({columns}) VALUES ({placeholders})'
+
+    @classmethod
+    def _row_fields(cls, row):
+        if isinstance(row, Model):
+            names = [name for name in cls._meta.fields if name in row.__data__]
+        else:
+            names = list(row)
+        fields = cls._resolve_fields(names)
+        present = {field.name for field in fields}
+        for field in cls._meta.sorted_fields:
+            if field.name not in present and field.default is not None:
+                fields.append(field)
+        return fields
+
+    @classmethod
+    def _row_values(cls, row, fields):
+        if isinstance(row, Model):
+            data = row.__data__
+        else:
+            data = {}
+            for key, value in row.items():
+                field = cls._meta.fields.get(key) or cls._meta.columns.get(key)
+                data[field.name if field is not None else key] = value
+        values = []
+        for field in fields:
+            if field.name in data:
+                value = data[field.name]
+            else:
+                value = field.default() if callable(field.default) else field.default
+            values.append(field.db_value(value))
+        return values
+
+    @classmethod
+    def _bulk_write(cls, rows, build_sql, batch_size, rebuild_indexes, fields=None, count_changes=False,
+                    created=None):
+        database = cls._meta.database
+        result = BulkResult()
+        start = time.perf_counter()
+        iterator = iter(rows)
+        first = next(iterator, None)
+        if first is None:
+            return result
+        statements = {}
+        if fields is not None:
+            statements[None] = (fields, build_sql(fields))
+        else:
+            cls._statement(_row_keys(first), first, build_sql, statements)
+        send_pre_save = pre_save.has_receivers(cls)
+        send_post_save = post_save.has_receivers(cls)
+        with database.atomic():
+            dropped = cls._drop_secondary_indexes() if rebuild_indexes else []
+            for chunk in _chunks(chain([first], iterator), batch_size or BULK_BATCH_SIZE):
+                if send_pre_save:
+                    pre_save.send(cls, database=database, instance=None, rows=chunk, created=created)
+                for run_fields, sql, run in cls._statement_runs(chunk, build_sql, statements):
+                    changed = database.execute_many(sql, [cls._row_values(row, run_fields) for row in run])
+                    result.rows += changed if count_changes else len(run)
+                    result.batches += 1
+                if send_post_save:
+                    post_save.send(cls, database=database, instance=None, rows=chunk, created=created)
+            for index_sql in dropped:
+                database.execute_sql(index_sql)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    @classmethod
+    def _statement_runs(cls, chunk, build_sql, statements):
+        """Делит пакет на подряд идущие строки с одинаковым набором ключей.
+
+        Каждая серия записывается своим запросом, поэтому строки с ключами,
+        которых нет в первой строке, не теряют значения. При явно заданных
+        полях (bulk_update) весь пакет - одна серия.
+
+        Yields:
+            tuple: (поля, SQL, строки серии).
+        """
+        if None in statements:
+            yield statements[None] + (chunk,)
+            return
+        run = []
+        run_keys = None
+        for row in chunk:
+            keys = _row_keys(row)
+            if run and keys != run_keys:
+                yield cls._statement(run_keys, run[0], build_sql, statements) + (run,)
+                run = []
+            run_keys = keys
+            run.append(row)
+        if run:
+            yield cls._statement(run_keys, run[0], build_sql, statements) + (run,)
+
+    @classmethod
+    def _statement(cls, keys, row, build_sql, statements):
+        key = frozenset(keys)
+        statement = statements.get(key)
+        if statement is None:
+            fields = cls._row_fields(row)
+            statement = statements[key] = (fields, build_sql(fields))
+        return statement
+
+    @classmethod
+    def _drop_secondary_indexes(cls):
+        """Удаляет неуникальные индексы таблицы.
+
+        Returns:
+            list: SQL для их повторного создания.
+        """
+        database = cls._meta.database
+        statements = []
+        for index in database.get_indexes(cls._meta.table_name):
+            if index.unique or not index.sql:
+                continue
+            database.execute_sql(f'DROP INDEX "{index.name}"')
+            statements.append(index.sql)
+        return statements
+
     def __str__(self):
         """Возвращает строковое представление модели.
 
@@ -63,7 +770,7 @@ class User(DarkModel):
 
     @staticmethod
     def hash_password(password):
-        """Хэширует пароль пользователя.
+        """Хэширует пароль пользователя текущей схемой и стоимостью.
 
         Args:
             password (str): Пароль для хэширования.
@@ -71,21 +778,30 @@ class User(DarkModel):
         Returns:
             str: Хэшированный пароль.
         """
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=get_round())).decode('utf-8')
+        return hashing.hash_password(password)
 
     def verify_password(self, password):
         """Проверяет, соответствует ли введенный пароль хэшированному паролю.
 
+        Если пароль верен, а хэш создан другой схемой или стоимостью,
+        он прозрачно пересчитывается и сохраняется, поэтому смена настроек
+        хэширования не требует миграции.
+
         Args:
             password (str): Введенный пароль для проверки.
 
         Returns:
             bool: True, если пароли совпадают, иначе False.
         """
-        try:
-            return bcrypt.checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
-        except ValueError:
+        if not hashing.verify_password(password, self.password):
             return False
+        if hashing.needs_rehash(self.password) and self.id is not None:
+            try:
+                self.password = self.hash_password(password)
+                self.save(only=[self.__class__.password])
+            except DatabaseError as e:
+                logs.error(f"Error rehashing password: {str(e)}", user_id=self.id)
+        return True
 
     def __str__(self):
         """Возвращает имя пользователя.
@@ -0,0 +1,280 @@
+from contextlib import nullcontext
+import os
+import signal
+import sys
+import threading
+import time
+
+from . import logs
+
+_NULL_CONTEXT = nullcontext()
+MAX_RATE = 1000
+
+
+def _check_rate(rate):
+    rate = float(rate)
+    if not 0 < rate <= MAX_RATE:
+        raise ValueError(f'rate must be greater than 0 and at most {MAX_RATE} Hz')
+    return rate
+
+
+class _RouteTag:
+    def __init__(self, profiler, route):
+        self.profiler = profiler
+        self.route = route
+        self.thread_id = None
+        self.previous = None
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        self.previous = self.profiler.active_routes.get(self.thread_id)
+        self.profiler.active_routes[self.thread_id] = self.route
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.previous is None:
+            self.profiler.active_routes.pop(self.thread_id, None)
+        else:
+            self.profiler.active_routes[self.thread_id] = self.previous
+        return False
+
+
+def route_tag(profiler, route):
+    """Помечает текущий поток шаблоном маршрута на время обработки запроса.
+
+    Args:
+        profiler (SamplingProfiler): Профилировщик или None.
+        route (str): Шаблон маршрута.
+
+    Returns:
+        Контекстный менеджер; пустой, если профилировщик не запущен.
+    """
+    if profiler is None or not profiler.running:
+        return _NULL_CONTEXT
+    return _RouteTag(profiler, route)
+
+
+class SamplingProfiler:
+    """Сэмплирующий профилировщик для работающего сервера.
+
+    Фоновый поток с частотой rate опрашивает sys._current_frames() и
+    считает одинаковые стеки. Корнем каждого стека служит шаблон маршрута,
+    который поток обрабатывал в момент выборки, или имя потока, поэтому на
+    flamegraph горячие обработчики видны сразу. Результат выгружается в
+    формате collapsed stacks ("кадр;кадр;кадр число"), который понимают
+    flamegraph.pl, speedscope и inferno.
+
+    Attributes:
+        rate (float): Частота выборки в герцах.
+        include_idle (bool): Учитывать потоки, не обрабатывающие запрос.
+        active_routes (dict): Идентификатор потока -> шаблон маршрута.
+        samples (int): Число сделанных выборок.
+    """
+    def __init__(self, rate=100, include_idle=False):
+        """Инициализация профилировщика.
+
+        Args:
+            rate (float, optional): Частота выборки в герцах. По умолчанию 100.
+            include_idle (bool, optional): Учитывать потоки вне запросов. По умолчанию False.
+
+        Raises:
+            ValueError: Если частота не в диапазоне (0, MAX_RATE].
+        """
+        self.rate = _check_rate(rate)
+        self.include_idle = include_idle
+        self.active_routes = {}
+        self.samples = 0
+        self.started_at = None
+        self._stacks = {}
+        self._names = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, rate=None):
+        """Запускает поток выборки, если он еще не запущен.
+
+        Args:
+            rate (float, optional): Новая частота выборки в герцах.
+
+        Raises:
+            ValueError: Если частота не в диапазоне (0, MAX_RATE].
+        """
+        if rate is not None:
+            rate = _check_rate(rate)
+        with self._lock:
+            if rate is not None:
+                self.rate = rate
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='darkfream-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Останавливает поток выборки, сохраняя накопленные стеки."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        self.active_routes.clear()
+
+    def toggle(self):
+        """Запускает или останавливает профилировщик.
+
+        Returns:
+            bool: True, если профилировщик запущен после вызова.
+        """
+        if self.running:
+            self.stop()
+            return False
+        self.start()
+        return True
+
+    def reset(self):
+        """Удаляет накопленные стеки."""
+        with self._lock:
+            self._stacks = {}
+            self.samples = 0
+
+    def _frame_name(self, code):
+        name = self._names.get(code)
+        if name is None:
+            name = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+            name = self._names[code] = name.replace(';', ':')
+        return name
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(1.0 / self.rate):
+            self.sample(skip=own)
+
+    def sample(self, skip=None):
+        """Делает одну выборку стеков всех потоков.
+
+        Args:
+            skip (int, optional): Идентификатор потока, который не нужно учитывать.
+        """
+        routes = self.active_routes
+        thread_names = None
+        stacks = self._stacks
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip:
+                continue
+            route = routes.get(thread_id)
+            if route is None:
+                if not self.include_idle:
+                    continue
+                if thread_names is None:
+                    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                root = f'thread:{thread_names.get(thread_id, thread_id)}'
+            else:
+                root = f'route:{route}'
+            names = []
+            while frame is not None:
+                names.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+            names.append(root)
+            names.reverse()
+            key = ';'.join(names)
+            stacks[key] = stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def collapsed(self):
+        """Возвращает накопленные стеки в формате collapsed stacks.
+
+        Returns:
+            str: Строки "кадр;кадр;кадр число", отсортированные по убыванию числа.
+        """
+        stacks = sorted(self._stacks.items(), key=lambda item: item[1], reverse=True)
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def routes(self):
+        """Суммирует выборки по маршрутам.
+
+        Returns:
+            dict: Корневой кадр (маршрут или поток) -> число выборок.
+        """
+        totals = {}
+        for stack, count in list(self._stacks.items()):
+            root = stack.split(';', 1)[0]
+            totals[root] = totals.get(root, 0) + count
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+    def write(self, path):
+        """Сохраняет collapsed stacks в файл.
+
+        Args:
+            path (str): Путь к файлу.
+
+        Returns:
+            str: Путь к файлу.
+        """
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+        return path
+
+    def status(self):
+        return {
+            'running': self.running,
+            'rate': self.rate,
+            'samples': self.samples,
+            'stacks': len(self._stacks),
+            'started_at': self.started_at,
+            'routes': self.routes(),
+        }
+
+    def install_signal(self, signal_number=None, output=None):
+        """Включает переключение профилировщика сигналом (по умолчанию SIGUSR2).
+
+        Первый сигнал запускает выборку, второй останавливает ее и сохраняет
+        стеки в output. Обработчик сигнала только пишет байт в канал, а
+        запуск, остановку и запись файла выполняет отдельный поток: сигнал,
+        пришедший, пока главный поток держит блокировку профилировщика, не
+        приводит к взаимной блокировке.
+
+        Args:
+            signal_number (int, optional): Номер сигнала.
+            output (str, optional): Файл для результата. По умолчанию
+                darkfream-<pid>.collapsed в текущем каталоге.
+
+        Returns:
+            bool: True, если обработчик установлен; False на платформах без
+                сигнала или вне главного потока.
+        """
+        if signal_number is None:
+            signal_number = getattr(signal, 'SIGUSR2', None)
+        if signal_number is None:
+            return False
+        output = output or f'darkfream-{os.getpid()}.collapsed'
+        read_fd, write_fd = os.pipe()
+
+        def handle_signal(signum, frame):
+            os.write(write_fd, b'\0')
+
+        try:
+            signal.signal(signal_number, handle_signal)
+        except ValueError:
+            os.close(read_fd)
+            os.close(write_fd)
+            return False
+        threading.Thread(target=self._signal_loop, args=(read_fd, output),
+                         name='darkfream-profiler-signal', daemon=True).start()
+        return True
+
+    def _signal_loop(self, read_fd, output):
+        while True:
+            requests = os.read(read_fd, 64)
+            if not requests:
+                return
+            for _ in requests:
+                if self.toggle():
+                    logs.info(f'Sampling profiler started at {self.rate:g} Hz')
+                else:
+                    logs.info(f'Sampling profiler stopped, {self.samples} samples written to {self.write(output)}')
@@ -0,0 +1,268 @@
+from collections import OrderedDict
+import re
+import threading
+import time
+
+READ_TABLES_RE = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)"?', re.IGNORECASE)
+WRITE_TABLE_RE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+"?(\w+)"?',
+    re.IGNORECASE)
+SCHEMA_RE = re.compile(r'^\s*(?:CREATE|DROP|ALTER)\s', re.IGNORECASE)
+LIMIT_RE = re.compile(r'\bLIMIT\s', re.IGNORECASE)
+
+
+def write_tables(sql):
+    """Определяет таблицу, изменяемую запросом.
+
+    Args:
+        sql (str): SQL-запрос.
+
+    Returns:
+        tuple: Имена таблиц; None для DDL, после которого нужно сбросить весь кэш;
+            пустой кортеж, если запрос ничего не изменяет.
+    """
+    match = WRITE_TABLE_RE.match(sql)
+    if match:
+        return (match.group(1),)
+    if SCHEMA_RE.match(sql):
+        return None
+    return ()
+
+
+class CachedCursor:
+    """Курсор поверх сохраненного результата запроса, совместимый с peewee."""
+
+    rowcount = -1
+    lastrowid = None
+
+    def __init__(self, description, rows):
+        self.description = description
+        self._rows = rows
+        self._index = 0
+
+    def fetchone(self):
+        if self._index >= len(self._rows):
+            return None
+        row = self._rows[self._index]
+        self._index += 1
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._index:self._index + size]
+        self._index += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._index:]
+        self._index = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
+
+
+class PrefetchedCursor(CachedCursor):
+    """Курсор, отдающий уже прочитанные строки, а затем остаток исходного курсора.
+
+    Используется, когда результат оказался слишком большим для кэша: строки
+    не загружаются в память целиком, а читаются из курсора SQLite по мере нужды.
+    """
+
+    def __init__(self, cursor, rows):
+        super().__init__(cursor.description, rows)
+        self._cursor = cursor
+
+    def fetchone(self):
+        row = super().fetchone()
+        return self._cursor.fetchone() if row is None else row
+
+    def fetchmany(self, size=1):
+        rows = super().fetchmany(size)
+        if len(rows) < size:
+            rows = rows + self._cursor.fetchmany(size - len(rows))
+        return rows
+
+    def fetchall(self):
+        return super().fetchall() + self._cursor.fetchall()
+
+    def __iter__(self):
+        yield from super().fetchall()
+        yield from self._cursor
+
+    def close(self):
+        self._cursor.close()
+
+
+class QueryCache:
+    """LRU-кэш результатов SELECT с TTL и инвалидацией по таблицам.
+
+    Кэшируются только запросы, все таблицы которых принадлежат моделям с
+    Meta.cache = True и в которых есть LIMIT; результаты длиннее max_rows строк
+    тоже не сохраняются. Ключ - текст SQL и параметры. Любая запись в таблицу
+    (INSERT/UPDATE/DELETE через эту базу) удаляет зависящие от нее записи
+    кэша и увеличивает поколение таблицы, поэтому результат чтения,
+    начатого до записи, в кэш уже не попадет.
+
+    Attributes:
+        max_entries (int): Максимальное число записей.
+        ttl (float): Время жизни записи по умолчанию в секундах.
+        max_rows (int): Максимальное число строк в кэшируемом результате.
+        tables (dict): Таблица -> TTL для кэшируемых моделей.
+        hits (int): Число попаданий.
+        misses (int): Число промахов.
+        invalidations (int): Число удаленных при записи результатов.
+        evictions (int): Число результатов, вытесненных по размеру или TTL.
+    """
+    def __init__(self, max_entries=1000, ttl=60.0, max_rows=1000):
+        """Инициализация кэша.
+
+        Args:
+            max_entries (int, optional): Максимальное число записей. По умолчанию 1000.
+            ttl (float, optional): Время жизни записи. По умолчанию 60 секунд.
+            max_rows (int, optional): Максимум строк в результате. По умолчанию 1000.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.tables = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.table_stats = {}
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._generations = {}
+        self._sql_tables = {}
+        self._lock = threading.Lock()
+
+    def register(self, table, ttl=None):
+        """Включает кэширование таблицы.
+
+        Args:
+            table (str): Имя таблицы.
+            ttl (float, optional): Время жизни записей. По умолчанию ttl кэша.
+        """
+        self.tables[table] = ttl
+        self._sql_tables.clear()
+
+    def tables_for(self, sql):
+        """Возвращает таблицы запроса, если все они кэшируемые.
+
+        Запросы без LIMIT не кэшируются: их результат может быть сколь угодно
+        большим, и такой запрос читается из курсора SQLite построчно.
+
+        Args:
+            sql (str): SELECT-запрос.
+
+        Returns:
+            tuple: Таблицы запроса или None, если запрос не кэшируется.
+        """
+        tables = self._sql_tables.get(sql, False)
+        if tables is False:
+            names = tuple(sorted(set(READ_TABLES_RE.findall(sql))))
+            cacheable = names and LIMIT_RE.search(sql) and all(name in self.tables for name in names)
+            tables = names if cacheable else None
+            if len(self._sql_tables) < self.max_entries * 4:
+                self._sql_tables[sql] = tables
+        return tables
+
+    def generation(self, tables):
+        return tuple(self._generations.get(table, 0) for table in tables)
+
+    def get(self, key, tables):
+        """Ищет результат запроса.
+
+        Args:
+            key (tuple): (sql, параметры).
+            tables (tuple): Таблицы запроса.
+
+        Returns:
+            tuple: (description, rows) или None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                entry = None
+            hit = entry is not None
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            for table in tables:
+                stats = self.table_stats.setdefault(table, [0, 0])
+                stats[0 if hit else 1] += 1
+            return (entry[2], entry[3]) if hit else None
+
+    def put(self, key, tables, description, rows, generation):
+        """Сохраняет результат, если таблицы не изменились с начала чтения.
+
+        Args:
+            key (tuple): (sql, параметры).
+            tables (tuple): Таблицы запроса.
+            description (tuple): cursor.description.
+            rows (list): Строки результата.
+            generation (tuple): Поколения таблиц до выполнения запроса.
+        """
+        ttls = [self.tables.get(table) for table in tables]
+        ttl = min(value if value is not None else self.ttl for value in ttls)
+        with self._lock:
+            if self.generation(tables) != generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, tables, description, rows)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for table in entry[1]:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+    def invalidate(self, tables=None):
+        """Удаляет результаты, зависящие от таблиц.
+
+        Args:
+            tables (iterable, optional): Таблицы; None - очистить весь кэш.
+        """
+        with self._lock:
+            if tables is None:
+                tables = list(self._by_table) + list(self.tables)
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._by_table.pop(table, ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def stats(self):
+        """Возвращает статистику кэша.
+
+        Returns:
+            dict: Попадания, промахи, доля попаданий, инвалидации, вытеснения,
+                число записей и попадания/промахи по таблицам.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'tables': {table: {'hits': hits, 'misses': misses}
+                       for table, (hits, misses) in self.table_stats.items()},
+        }
@@ -0,0 +1,176 @@
+from contextlib import contextmanager
+import threading
+
+from . import logs
+from .orm import conn
+
+
+class QueryStats:
+    """Счетчики SQL-запросов одного HTTP-запроса или блока кода.
+
+    Attributes:
+        count (int): Число запросов.
+        seconds (float): Суммарное время запросов.
+        queries (list): Список (sql, params, seconds), если запись включена.
+    """
+    def __init__(self, keep_queries=False):
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = [] if keep_queries else None
+
+    def add(self, sql, params, seconds):
+        self.count += 1
+        self.seconds += seconds
+        if self.queries is not None:
+            self.queries.append((sql, params, seconds))
+
+
+class QueryLog:
+    """Учет SQL-запросов по HTTP-запросам и журнал медленных запросов.
+
+    Для каждого запроса считаются число SQL-запросов и их время. Запросы
+    дольше slow_ms пишутся в журнал вместе с шаблоном маршрута. В режиме
+    debug ответы получают заголовки X-Query-Count и X-Query-Time.
+
+    Attributes:
+        app (DarkFream): Приложение.
+        slow_ms (float): Порог медленного запроса в миллисекундах.
+        debug (bool): Добавлять отладочные заголовки в ответы.
+    """
+    def __init__(self, app, slow_ms=100.0, debug=False, database=conn):
+        """Инициализация и подключение к базе данных.
+
+        Args:
+            app (DarkFream): Приложение.
+            slow_ms (float, optional): Порог медленного запроса. По умолчанию 100 мс.
+            debug (bool, optional): Добавлять заголовки X-Query-*. По умолчанию False.
+            database (DarkSqliteDatabase, optional): База данных. По умолчанию orm.conn.
+        """
+        self.app = app
+        self.slow_ms = slow_ms
+        self.debug = debug
+        self._local = threading.local()
+        database.add_query_listener(self.on_query)
+
+    def begin(self, data):
+        """Начинает учет запросов для HTTP-запроса.
+
+        Args:
+            data (dict): Данные запроса; из них берется шаблон маршрута для журнала.
+
+        Returns:
+            QueryStats: Счетчики запроса.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stats = QueryStats()
+        stack.append((stats, data))
+        return stats
+
+    def end(self, stats):
+        stack = self._local.stack
+        if stack and stack[-1][0] is stats:
+            stack.pop()
+
+    def headers(self, stats):
+        """Возвращает отладочные заголовки для ответа.
+
+        Args:
+            stats (QueryStats): Счетчики запроса.
+
+        Returns:
+            dict: X-Query-Count и X-Query-Time или пустой словарь вне режима debug.
+        """
+        if not self.debug:
+            return {}
+        return {'X-Query-Count': str(stats.count), 'X-Query-Time': f'{stats.seconds * 1000.0:.2f}ms'}
+
+    def on_query(self, sql, params, seconds):
+        """Слушатель запросов DarkSqliteDatabase."""
+        stack = getattr(self._local, 'stack', None)
+        data = None
+        if stack:
+            for stats, _ in stack:
+                stats.add(sql, params, seconds)
+            data = stack[-1][1]
+        duration_ms = seconds * 1000.0
+        if duration_ms >= self.slow_ms:
+            route = data.get('route') if isinstance(data, dict) else None
+            logs.warning('Slow query', sql=sql, params=list(params or ()),
+                         duration_ms=round(duration_ms, 3),
+                         route=self.app.route_paths.get(route, route),
+                         request_id=data.get('request_id') if isinstance(data, dict) else None)
+
+
+class QueryCounter:
+    """Контекстный менеджер, считающий SQL-запросы текущего потока.
+
+    Пример:
+        with QueryCounter() as counter:
+            app.handle_request('/admin/User', data=request)
+        print(counter.count, counter.queries)
+
+    Attributes:
+        count (int): Число запросов.
+        seconds (float): Суммарное время запросов.
+        queries (list): Список (sql, params, seconds).
+    """
+    def __init__(self, database=conn):
+        self.database = database
+        self.stats = QueryStats(keep_queries=True)
+        self._thread_id = None
+
+    @property
+    def count(self):
+        return self.stats.count
+
+    @property
+    def seconds(self):
+        return self.stats.seconds
+
+    @property
+    def queries(self):
+        return self.stats.queries
+
+    def on_query(self, sql, params, seconds):
+        if threading.get_ident() == self._thread_id:
+            self.stats.add(sql, params, seconds)
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self.database.add_query_listener(self.on_query)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.database.remove_query_listener(self.on_query)
+        return False
+
+
+@contextmanager
+def assert_max_queries(max_queries, database=conn):
+    """Проверяет, что блок кода выполняет не больше max_queries SQL-запросов.
+
+    Помогает ловить N+1 в тестах:
+
+        with assert_max_queries(3):
+            app.handle_request('/admin/Post', data=request)
+
+    Учитываются запросы текущего потока.
+
+    Args:
+        max_queries (int): Допустимое число запросов.
+        database (DarkSqliteDatabase, optional): База данных. По умолчанию orm.conn.
+
+    Yields:
+        QueryCounter: Счетчик запросов блока.
+
+    Raises:
+        AssertionError: Если запросов больше max_queries.
+    """
+    with QueryCounter(database) as counter:
+        yield counter
+    if counter.count > max_queries:
+        listing = '\n'.join(f'  {index}. {sql} {list(params or ())}'
+                            for index, (sql, params, _) in enumerate(counter.queries, 1))
+        raise AssertionError(f'Expected at most {max_queries} queries, got {counter.count}:\n{listing}')
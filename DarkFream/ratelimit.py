@@ -0,0 +1,346 @@
+from collections import OrderedDict
+import ipaddress
+import math
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+
+_trusted_proxies = ()
+
+
+def configure_trusted_proxies(proxies):
+    """Задает прокси, которым разрешено сообщать адрес клиента.
+
+    Args:
+        proxies (list): IP-адреса или сети ('10.0.0.0/8') обратных прокси.
+            Пустой список - заголовки X-Forwarded-For и X-Real-IP игнорируются.
+
+    Raises:
+        ValueError: Если адрес или сеть записаны неверно.
+    """
+    global _trusted_proxies
+    _trusted_proxies = tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies or ())
+
+
+def _is_trusted(address):
+    try:
+        ip = ipaddress.ip_address(address.strip())
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_proxies)
+
+
+def get_client_ip(headers, client_address=None):
+    """Определяет IP клиента.
+
+    По умолчанию это адрес сокета: заголовки X-Forwarded-For и X-Real-IP
+    задает клиент, и доверять им можно, только если запрос пришел от
+    своего прокси (configure_trusted_proxies). Тогда из X-Forwarded-For
+    берется самый правый адрес, не принадлежащий доверенным прокси, - его
+    добавил последний доверенный прокси, и подделать его клиент не может.
+
+    Args:
+        headers (dict): Заголовки запроса.
+        client_address (str, optional): Адрес сокета клиента.
+
+    Returns:
+        str: IP-адрес клиента или None.
+    """
+    if not _trusted_proxies or not headers or not client_address or not _is_trusted(client_address):
+        return client_address
+    forwarded = headers.get('X-Forwarded-For')
+    if forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        for hop in reversed(hops):
+            if not _is_trusted(hop):
+                return hop
+        if hops:
+            return hops[0]
+    real_ip = headers.get('X-Real-IP')
+    if real_ip:
+        return real_ip.strip()
+    return client_address
+
+
+class RateLimit:
+    """Описание лимита запросов по алгоритму token bucket.
+
+    Attributes:
+        rate (float): Число запросов за период.
+        per (float): Период в секундах.
+        burst (float): Емкость ведра (максимальный всплеск).
+        key (str or callable): 'ip', 'username', 'ip_username' (пара IP и имя
+            пользователя), 'route' или функция data -> ключ.
+        methods (set): HTTP-методы, к которым применяется лимит, или None для всех.
+    """
+    def __init__(self, rate, per=60.0, burst=None, key='ip', methods=None):
+        """Инициализация лимита.
+
+        Args:
+            rate (float): Число запросов за период.
+            per (float, optional): Период в секундах. По умолчанию 60.
+            burst (float, optional): Емкость ведра. По умолчанию равна rate.
+            key (str or callable, optional): Ключ ведра. По умолчанию 'ip'.
+            methods (list, optional): HTTP-методы для лимита. По умолчанию все.
+        """
+        if key not in ('ip', 'username', 'ip_username', 'route') and not callable(key):
+            raise ValueError(f"Unsupported rate limit key: {key}")
+        self.rate = float(rate)
+        self.per = float(per)
+        self.burst = float(burst if burst is not None else rate)
+        self.key = key
+        self.methods = set(methods) if methods else None
+        self.refill = self.rate / self.per
+
+    def bucket_key(self, data, scope):
+        """Строит ключ ведра для запроса.
+
+        Args:
+            data (dict): Данные запроса.
+            scope (str): Область лимита (обычно шаблон маршрута).
+
+        Returns:
+            str: Ключ ведра или None, если лимит к запросу не применяется.
+        """
+        data = data or {}
+        if self.methods is not None and data.get('method') not in self.methods:
+            return None
+        if self.key == 'ip':
+            value = get_client_ip(data.get('headers'), data.get('client_address'))
+        elif self.key == 'username':
+            value = _form_value(data.get('data'), 'username')
+        elif self.key == 'ip_username':
+            username = _form_value(data.get('data'), 'username')
+            ip = get_client_ip(data.get('headers'), data.get('client_address'))
+            value = f'{ip}|{username}' if username else None
+        elif self.key == 'route':
+            value = '*'
+        else:
+            value = self.key(data)
+        if not value:
+            return None
+        name = self.key if isinstance(self.key, str) else getattr(self.key, '__name__', 'custom')
+        return f'{scope}|{name}|{value}'
+
+
+# Лимиты формы входа: попытки с одного IP и подбор пароля одного пользователя
+# с одного IP. Лимит только по имени пользователя позволял бы любому держать
+# чужую учетную запись заблокированной.
+LOGIN_RATE_LIMITS = (
+    RateLimit(30, per=60, key='ip', methods=['POST']),
+    RateLimit(5, per=60, key='ip_username', methods=['POST']),
+)
+
+
+def _form_value(form, name):
+    if not isinstance(form, dict):
+        return None
+    value = form.get(name)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+
+class MemoryBackend:
+    """Хранилище ведер в памяти процесса.
+
+    Проверка сводится к поиску в словаре и нескольким арифметическим
+    операциям под блокировкой, поэтому отказ стоит микросекунды. Ведра
+    хранятся в порядке последнего использования: при превышении max_keys
+    удаляется самое давнее, поэтому поток новых ключей (клиент управляет
+    X-Forwarded-For и именем пользователя) стоит O(1) на запрос.
+
+    Attributes:
+        max_keys (int): Максимальное число ведер.
+    """
+    def __init__(self, max_keys=100000):
+        """Инициализация хранилища.
+
+        Args:
+            max_keys (int, optional): Максимальное число ведер. По умолчанию 100000.
+        """
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, refill, burst, cost=1.0):
+        """Списывает токены из ведра.
+
+        Args:
+            key (str): Ключ ведра.
+            refill (float): Скорость пополнения в токенах в секунду.
+            burst (float): Емкость ведра.
+            cost (float, optional): Стоимость запроса. По умолчанию 1.
+
+        Returns:
+            tuple: (разрешено, секунд до следующей попытки).
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                tokens = burst
+                bucket = buckets[key] = [tokens, now]
+                if len(buckets) > self.max_keys:
+                    buckets.popitem(last=False)
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * refill)
+                buckets.move_to_end(key)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return True, 0.0
+            bucket[0] = tokens
+            return False, (cost - tokens) / refill
+
+    def reset(self):
+        """Удаляет все ведра."""
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBackend:
+    """Хранилище ведер в SQLite для нескольких процессов.
+
+    Все воркеры, указавшие один и тот же файл, разделяют лимиты.
+    Каждое списание выполняется в транзакции BEGIN IMMEDIATE.
+
+    Attributes:
+        path (str): Путь к файлу базы данных.
+    """
+    def __init__(self, path='darkfream_ratelimit.db', timeout=5.0):
+        """Инициализация хранилища.
+
+        Args:
+            path (str, optional): Путь к файлу базы. По умолчанию 'darkfream_ratelimit.db'.
+            timeout (float, optional): Таймаут ожидания блокировки в секундах.
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+                               'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            self._local.connection = connection
+        return connection
+
+    def consume(self, key, refill, burst, cost=1.0):
+        """Списывает токены из ведра.
+
+        Args:
+            key (str): Ключ ведра.
+            refill (float): Скорость пополнения в токенах в секунду.
+            burst (float): Емкость ведра.
+            cost (float, optional): Стоимость запроса. По умолчанию 1.
+
+        Returns:
+            tuple: (разрешено, секунд до следующей попытки).
+        """
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?',
+                                     (key,)).fetchone()
+            if row is None:
+                tokens = burst
+            else:
+                tokens = min(burst, row[0] + max(0.0, now - row[1]) * refill)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            connection.execute('INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                               'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, '
+                               'updated = excluded.updated', (key, tokens, now))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        if allowed:
+            return True, 0.0
+        return False, (cost - tokens) / refill
+
+    def reset(self):
+        """Удаляет все ведра."""
+        self._connection().execute('DELETE FROM rate_limit_buckets')
+
+
+class RateLimiter:
+    """Проверяет лимиты запросов перед вызовом обработчика.
+
+    Attributes:
+        backend: Хранилище ведер (MemoryBackend или SQLiteBackend).
+    """
+    def __init__(self, backend=None):
+        """Инициализация ограничителя.
+
+        Args:
+            backend (optional): Хранилище ведер. По умолчанию MemoryBackend.
+        """
+        self.backend = backend or MemoryBackend()
+
+    def check(self, limits, data, scope):
+        """Проверяет все лимиты для запроса.
+
+        Args:
+            limits (list): Список объектов RateLimit.
+            data (dict): Данные запроса.
+            scope (str): Область лимита.
+
+        Returns:
+            tuple: Ответ 429, если лимит превышен, иначе None.
+        """
+        for limit in limits:
+            key = limit.bucket_key(data, scope)
+            if key is None:
+                continue
+            allowed, retry_after = self.backend.consume(key, limit.refill, limit.burst)
+            if not allowed:
+                return self.too_many_requests(retry_after)
+        return None
+
+    def too_many_requests(self, retry_after):
+        """Создает ответ 429 Too Many Requests.
+
+        Args:
+            retry_after (float): Секунд до следующей попытки.
+
+        Returns:
+            tuple: Кортеж, содержащий код статуса, тело и заголовки.
+        """
+        return 429, 'Too Many Requests', {
+            'Content-Type': 'text/plain',
+            'Retry-After': str(max(1, int(math.ceil(retry_after))))
+        }
+
+    def limit(self, limits, scope):
+        """Декоратор, применяющий лимиты к обработчику маршрута.
+
+        Args:
+            limits (RateLimit or list): Лимит или список лимитов.
+            scope (str): Область лимита.
+
+        Returns:
+            callable: Декоратор обработчика.
+        """
+        if isinstance(limits, RateLimit):
+            limits = [limits]
+        limits = list(limits)
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(data, *args, **kwargs):
+                rejected = self.check(limits, data, scope)
+                if rejected is not None:
+                    return rejected
+                return func(data, *args, **kwargs)
+            return wrapper
+        return decorator
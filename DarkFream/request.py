@@ -0,0 +1,202 @@
+import json
+import urllib.parse
+
+
+def parse_cookies(header):
+    """Разбирает заголовок Cookie.
+
+    Пары разделяются ';', имя и значение - первым '='. Значения в кавычках
+    освобождаются от них; при повторе имени остается первое значение
+    (браузер присылает более специфичную cookie первой).
+
+    Args:
+        header (str): Значение заголовка Cookie.
+
+    Returns:
+        dict: Имя cookie -> значение.
+    """
+    cookies = {}
+    if not header:
+        return cookies
+    for pair in header.split(';'):
+        name, sep, value = pair.partition('=')
+        if not sep:
+            continue
+        name = name.strip()
+        value = value.strip()
+        if len(value) > 1 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        if name and name not in cookies:
+            cookies[name] = value
+    return cookies
+
+
+def get_cookie(data, name, default=None):
+    """Возвращает значение cookie из данных запроса.
+
+    Работает и с RequestData (cookie разбираются один раз), и с обычным
+    словарем, содержащим только headers.
+
+    Args:
+        data (dict): Данные запроса.
+        name (str): Имя cookie.
+        default (optional): Значение, если cookie нет.
+
+    Returns:
+        str: Значение cookie или default.
+    """
+    if not data:
+        return default
+    cookies = data.get('cookies')
+    if cookies is None:
+        cookies = parse_cookies((data.get('headers') or {}).get('Cookie', ''))
+    return cookies.get(name, default)
+
+
+def parse_session(cookies):
+    """Декодирует JSON-данные сессии из cookie session.
+
+    Значение, не похожее на JSON-объект (обычный идентификатор сессии),
+    не разбирается.
+
+    Args:
+        cookies (dict): Разобранные cookie.
+
+    Returns:
+        dict: Данные сессии или пустой словарь.
+    """
+    value = cookies.get('session')
+    if value and value[0] == '{':
+        try:
+            session = json.loads(value)
+        except ValueError:
+            return {}
+        if isinstance(session, dict):
+            return session
+    return {}
+
+
+def _load_headers(request):
+    return dict(request._message)
+
+
+def _load_data(request):
+    body = request._body
+    if not body:
+        return {}
+    text = body.decode('utf-8')
+    if 'application/json' in request._message.get('Content-Type', ''):
+        return json.loads(text)
+    return urllib.parse.parse_qs(text)
+
+
+def _load_query(request):
+    return urllib.parse.parse_qs(request['path'].partition('?')[2])
+
+
+def _load_cookies(request):
+    return parse_cookies(request._message.get('Cookie', ''))
+
+
+def _load_session(request):
+    return parse_session(request['cookies'])
+
+
+LOADERS = {
+    'headers': _load_headers,
+    'data': _load_data,
+    'query': _load_query,
+    'cookies': _load_cookies,
+    'session': _load_session,
+}
+
+
+class RequestData(dict):
+    """Данные HTTP-запроса, которые DarkHandler передает обработчикам.
+
+    Это словарь с прежними ключами method, path, client_address, headers,
+    data, query и session (плюс cookies), но headers, data, query, cookies
+    и session вычисляются при первом обращении: запрос, обработчик
+    которого не читает тело или сессию, не тратит время на их разбор.
+    Вычисленное значение сохраняется в словаре, поэтому повторные
+    обращения - обычный поиск по ключу. Ключи можно перезаписывать, как
+    раньше (например, data['session'] = {}).
+    """
+    __slots__ = ('_message', '_body')
+
+    def __init__(self, method, path, message, client_address, body=None):
+        """Создает данные запроса.
+
+        Args:
+            method (str): HTTP-метод.
+            path (str): Путь со строкой запроса.
+            message (http.client.HTTPMessage): Заголовки запроса.
+            client_address (str): IP-адрес клиента.
+            body (bytes, optional): Прочитанное тело запроса.
+        """
+        super().__init__(method=method, path=path, client_address=client_address)
+        self._message = message
+        self._body = body
+
+    def __missing__(self, key):
+        loader = LOADERS.get(key)
+        if loader is None:
+            raise KeyError(key)
+        value = loader(self)
+        dict.__setitem__(self, key, value)
+        return value
+
+    def __bool__(self):
+        return True
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in LOADERS
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, key, *default):
+        if key in LOADERS and not dict.__contains__(self, key):
+            self[key]
+        return dict.pop(self, key, *default)
+
+    def load(self):
+        """Вычисляет все отложенные ключи."""
+        for key in LOADERS:
+            if not dict.__contains__(self, key):
+                self[key]
+
+    def __iter__(self):
+        self.load()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self.load()
+        return dict.__len__(self)
+
+    def keys(self):
+        self.load()
+        return dict.keys(self)
+
+    def items(self):
+        self.load()
+        return dict.items(self)
+
+    def values(self):
+        self.load()
+        return dict.values(self)
+
+    def copy(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f'<RequestData {self["method"]} {self["path"]}>'
@@ -0,0 +1,233 @@
+import hashlib
+
+from peewee import BooleanField, FloatField, ForeignKeyField, IntegerField, IntegrityError
+
+from .request import get_cookie
+from .serializers import dumps_bytes, model_to_dict
+
+RESERVED_PARAMS = ('fields', 'after', 'limit')
+
+
+def _first(value):
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+class ModelAPI:
+    """Автоматический JSON CRUD API для моделей, зарегистрированных в DarkAdmin.
+
+    Маршруты (доступны только администраторам):
+        GET    {base_url}<model_name>            - список с keyset-пагинацией;
+        POST   {base_url}<model_name>            - создание;
+        GET    {base_url}<model_name>/<item_id>  - один объект;
+        PUT    {base_url}<model_name>/<item_id>  - изменение (также PATCH и POST);
+        DELETE {base_url}<model_name>/<item_id>  - удаление.
+
+    Параметры списка: ?fields=a,b - выбор полей, ?after=<id>&limit=N - страница
+    после указанного первичного ключа, ?<поле>=<значение> - фильтр по
+    индексированному полю. GET-ответы снабжаются ETag и поддерживают If-None-Match.
+
+    Attributes:
+        admin (DarkAdmin): Админ-панель, чьи модели публикуются.
+        base_url (str): Префикс маршрутов API.
+        page_size (int): Размер страницы по умолчанию.
+        max_page_size (int): Максимальный размер страницы.
+    """
+    def __init__(self, admin, base_url='/api/admin/', page_size=50, max_page_size=500):
+        """Инициализация API и регистрация маршрутов.
+
+        Args:
+            admin (DarkAdmin): Админ-панель.
+            base_url (str, optional): Префикс маршрутов. По умолчанию '/api/admin/'.
+            page_size (int, optional): Размер страницы по умолчанию. По умолчанию 50.
+            max_page_size (int, optional): Максимальный размер страницы. По умолчанию 500.
+        """
+        self.admin = admin
+        self.app = admin.app
+        self.base_url = base_url
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.register_routes()
+
+    def register_routes(self):
+        self.app.route(f'{self.base_url}<model_name>', methods=['GET', 'POST'])(self.collection)
+        self.app.route(f'{self.base_url}<model_name>/<item_id>',
+                       methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])(self.item)
+
+    def error(self, status_code, message):
+        return self.app.json_response(status_code, {'error': message})
+
+    def check_access(self, data):
+        session = self.admin.auth.get_current_user(get_cookie(data, 'session'))
+        if session is None:
+            return self.error(401, 'Authentication required')
+        if not session.user.is_admin:
+            return self.error(403, 'Admin access required')
+        return None
+
+    def hidden_fields(self, model):
+        if issubclass(model, self.admin.user_model):
+            return {'password'}
+        return set()
+
+    def public_fields(self, model):
+        hidden = self.hidden_fields(model)
+        return {name: field for name, field in model._meta.fields.items() if name not in hidden}
+
+    def indexed_fields(self, model):
+        """Возвращает поля, по которым разрешена фильтрация.
+
+        Args:
+            model (DarkModel): Модель.
+
+        Returns:
+            dict: Имя поля -> поле для первичного ключа, уникальных,
+                индексированных полей, внешних ключей и первых колонок Meta.indexes.
+        """
+        leading = set()
+        for index in model._meta.indexes:
+            columns = index[0] if isinstance(index, (tuple, list)) else ()
+            if columns:
+                leading.add(columns[0])
+        return {name: field for name, field in self.public_fields(model).items()
+                if field.primary_key or field.unique or field.index
+                or isinstance(field, ForeignKeyField) or name in leading}
+
+    def projection(self, model, query):
+        fields = self.public_fields(model)
+        requested = _first(query.get('fields'))
+        if not requested:
+            return list(fields.values()), None
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in fields]
+        if unknown:
+            return None, f"Unknown fields: {', '.join(unknown)}"
+        primary_key = model._meta.primary_key.name
+        if primary_key not in names:
+            names.insert(0, primary_key)
+        return [fields[name] for name in names], None
+
+    def convert(self, field, value):
+        if isinstance(field, BooleanField):
+            return str(value).lower() in ('1', 'true', 'yes', 'on')
+        if value in ('', None) and field.null:
+            return None
+        if isinstance(field, (ForeignKeyField, IntegerField)):
+            return int(value)
+        if isinstance(field, FloatField):
+            return float(value)
+        return field.adapt(value)
+
+    def conditional(self, data, status_code, payload):
+        body = dumps_bytes(payload)
+        etag = 'W/"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        if data['headers'].get('If-None-Match') == etag:
+            return 304, '', {'ETag': etag, 'Content-Type': 'application/json'}
+        headers = self.app.json_headers()
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'private, no-cache'
+        return status_code, body, headers
+
+    def collection(self, data, model_name=None):
+        denied = self.check_access(data)
+        if denied:
+            return denied
+        model = self.admin.models.get(model_name)
+        if model is None:
+            return self.error(404, f"Model {model_name} not found")
+        if data['method'] == 'POST':
+            return self.save(data, model, model())
+
+        query = data.get('query') or {}
+        fields, problem = self.projection(model, query)
+        if problem:
+            return self.error(400, problem)
+        try:
+            limit = int(_first(query.get('limit')) or self.page_size)
+        except ValueError:
+            return self.error(400, 'limit must be an integer')
+        limit = max(1, min(limit, self.max_page_size))
+
+        primary_key = model._meta.primary_key
+        select = model.select(*fields).order_by(primary_key)
+        after = _first(query.get('after'))
+        if after:
+            try:
+                select = select.where(primary_key > self.convert(primary_key, after))
+            except (TypeError, ValueError):
+                return self.error(400, 'Invalid after value')
+
+        filters = self.indexed_fields(model)
+        for name, values in query.items():
+            if name in RESERVED_PARAMS:
+                continue
+            field = filters.get(name)
+            if field is None:
+                return self.error(400, f"Filtering by {name} is not allowed; use an indexed field")
+            try:
+                select = select.where(field == self.convert(field, _first(values)))
+            except (TypeError, ValueError):
+                return self.error(400, f"Invalid value for {name}")
+
+        items = list(select.limit(limit + 1).dicts())
+        next_after = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_after = items[-1][primary_key.name]
+        return self.conditional(data, 200, {'items': items, 'next': next_after})
+
+    def item(self, data, model_name=None, item_id=None):
+        denied = self.check_access(data)
+        if denied:
+            return denied
+        model = self.admin.models.get(model_name)
+        if model is None:
+            return self.error(404, f"Model {model_name} not found")
+        primary_key = model._meta.primary_key
+        try:
+            item_id = self.convert(primary_key, item_id)
+        except (TypeError, ValueError):
+            return self.error(400, f"Invalid item ID: {item_id}")
+
+        if data['method'] == 'GET':
+            fields, problem = self.projection(model, data.get('query') or {})
+            if problem:
+                return self.error(400, problem)
+            row = model.select(*fields).where(primary_key == item_id).dicts().first()
+            if row is None:
+                return self.error(404, f"Item with id {item_id} not found")
+            return self.conditional(data, 200, row)
+
+        try:
+            item = model.get_by_id(item_id)
+        except model.DoesNotExist:
+            return self.error(404, f"Item with id {item_id} not found")
+        if data['method'] == 'DELETE':
+            item.delete_instance()
+            return 204, '', {'Content-Type': 'application/json'}
+        return self.save(data, model, item)
+
+    def save(self, data, model, item):
+        payload = data.get('data') or {}
+        if not isinstance(payload, dict):
+            return self.error(400, 'Request body must be an object')
+        created = item.get_id() is None
+        fields = {name: field for name, field in model._meta.fields.items() if not field.primary_key}
+        try:
+            for name, value in payload.items():
+                field = fields.get(name)
+                if field is None:
+                    return self.error(400, f"Unknown field: {name}")
+                value = _first(value)
+                if issubclass(model, self.admin.user_model) and name == 'password':
+                    value = model.hash_password(value)
+                else:
+                    value = self.convert(field, value)
+                setattr(item, name, value)
+            item.save()
+        except (TypeError, ValueError, IntegrityError) as e:
+            return self.error(400, f"Error saving object: {str(e)}")
+        hidden = self.hidden_fields(model)
+        result = {name: value for name, value in model_to_dict(item).items() if name not in hidden}
+        return self.app.json_response(201 if created else 200, result)
@@ -0,0 +1,176 @@
+from datetime import datetime
+import hashlib
+import json
+
+from peewee import ForeignKeyField, OperationalError
+from playhouse.migrate import SqliteMigrator, migrate as run_operations
+
+from . import logs
+from .orm import conn
+from .search import create_search_index, search_fields
+
+SCHEMA_TABLE = 'darkfream_schema'
+
+
+def field_signature(field):
+    """Описывает поле модели для хэша схемы.
+
+    Args:
+        field (Field): Поле peewee.
+
+    Returns:
+        list: Колонка, тип и ограничения поля.
+    """
+    default = field.default
+    signature = [field.column_name, field.field_type, field.null, field.unique,
+                 field.index, field.primary_key,
+                 None if default is None or callable(default) else repr(default)]
+    if isinstance(field, ForeignKeyField):
+        signature.append(field.rel_model._meta.table_name)
+    return signature
+
+
+def schema_hash(models, indexes=()):
+    """Вычисляет хэш определений моделей и дополнительных индексов.
+
+    Args:
+        models (list): Модели.
+        indexes (list, optional): IndexSuggestion или SQL-строки CREATE INDEX.
+
+    Returns:
+        str: SHA-256 в шестнадцатеричном виде.
+    """
+    description = []
+    for model in sorted(models, key=lambda item: item._meta.table_name):
+        fields = [field_signature(field) for field in model._meta.sorted_fields]
+        entry = [model._meta.table_name, fields, repr(model._meta.indexes)]
+        if search_fields(model):
+            entry.append(list(search_fields(model)))
+        description.append(entry)
+    description.append(sorted(_index_statement(index) for index in indexes))
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _index_statement(index):
+    return getattr(index, 'statement', index)
+
+
+def stored_hash(database=conn, name='default'):
+    """Возвращает хэш последней примененной схемы.
+
+    Args:
+        database (Database, optional): База данных. По умолчанию orm.conn.
+        name (str, optional): Имя набора моделей. По умолчанию 'default'.
+
+    Returns:
+        str: Хэш или None, если схема еще не применялась.
+    """
+    try:
+        row = database.execute_sql(f'SELECT hash FROM "{SCHEMA_TABLE}" WHERE name = ?', (name,)).fetchone()
+    except OperationalError:
+        return None
+    return row[0] if row else None
+
+
+class MigrationResult:
+    """Итог синхронизации схемы.
+
+    Attributes:
+        changed (bool): Выполнялась ли миграция (False, если хэш совпал).
+        created_tables (list): Созданные таблицы.
+        added_columns (list): Добавленные колонки в виде 'таблица.колонка'.
+        extra_columns (list): Колонки базы, которых нет в моделях (не удаляются).
+        indexes (list): Выполненные CREATE INDEX.
+        search_indexes (list): Созданные или пересозданные таблицы FTS5.
+        schema_hash (str): Хэш примененной схемы.
+    """
+    def __init__(self, changed, schema_hash):
+        self.changed = changed
+        self.schema_hash = schema_hash
+        self.created_tables = []
+        self.added_columns = []
+        self.extra_columns = []
+        self.indexes = []
+        self.search_indexes = []
+
+    def __bool__(self):
+        return self.changed
+
+
+def sync_schema(models, indexes=(), database=conn, name='default', force=False):
+    """Приводит схему базы к определениям моделей.
+
+    Если хэш моделей совпадает с сохраненным, ничего не делает, кроме одного
+    SELECT. Иначе сравнивает модели с живой схемой: создает отсутствующие
+    таблицы, добавляет новые колонки (через playhouse.migrate), создает
+    индексы моделей, переданные indexes и индексы FTS5 моделей с
+    Meta.search_fields и сохраняет новый хэш - все в одной транзакции.
+    Колонки, удаленные из моделей, не удаляются из базы, а только
+    попадают в extra_columns и журнал.
+
+    Args:
+        models (list): Модели.
+        indexes (list, optional): IndexSuggestion или SQL-строки CREATE INDEX.
+        database (Database, optional): База данных. По умолчанию orm.conn.
+        name (str, optional): Имя набора моделей. По умолчанию 'default'.
+        force (bool, optional): Сравнить схему, даже если хэш совпадает.
+
+    Returns:
+        MigrationResult: Итог синхронизации.
+
+    Raises:
+        ValueError: Если новое NOT NULL поле не имеет значения по умолчанию.
+    """
+    current = schema_hash(models, indexes)
+    if not force and stored_hash(database, name) == current:
+        return MigrationResult(False, current)
+
+    result = MigrationResult(True, current)
+    migrator = SqliteMigrator(database)
+    with database.atomic():
+        database.execute_sql(f'CREATE TABLE IF NOT EXISTS "{SCHEMA_TABLE}" '
+                             '(name TEXT PRIMARY KEY, hash TEXT NOT NULL, applied_at TEXT NOT NULL)')
+        tables = set(database.get_tables())
+        missing = [model for model in models if model._meta.table_name not in tables]
+        if missing:
+            database.create_tables(missing)
+            result.created_tables = [model._meta.table_name for model in missing]
+
+        operations = []
+        for model in models:
+            table = model._meta.table_name
+            if table not in tables:
+                continue
+            existing = {column.name for column in database.get_columns(table)}
+            for field in model._meta.sorted_fields:
+                if field.column_name not in existing:
+                    operations.append(migrator.add_column(table, field.column_name, field))
+                    result.added_columns.append(f'{table}.{field.column_name}')
+            declared = {field.column_name for field in model._meta.sorted_fields}
+            result.extra_columns.extend(f'{table}.{column}' for column in sorted(existing - declared))
+        run_operations(*operations)
+
+        for model in models:
+            model._schema.create_indexes(safe=True)
+        for index in indexes:
+            statement = _index_statement(index)
+            database.execute_sql(statement)
+            result.indexes.append(statement)
+        for model in models:
+            if search_fields(model) and create_search_index(model, database):
+                result.search_indexes.append(model._meta.table_name)
+
+        database.execute_sql(f'INSERT OR REPLACE INTO "{SCHEMA_TABLE}" (name, hash, applied_at) VALUES (?, ?, ?)',
+                             (name, current, datetime.utcnow().isoformat()))
+
+    if result.created_tables:
+        logs.info(f"Created tables: {', '.join(result.created_tables)}")
+    if result.added_columns:
+        logs.info(f"Added columns: {', '.join(result.added_columns)}")
+    if result.extra_columns:
+        logs.warning(f"Columns not defined in models were kept: {', '.join(result.extra_columns)}")
+    for statement in result.indexes:
+        logs.info(f"Created index: {statement}")
+    for table in result.search_indexes:
+        logs.info(f"Built full-text index for {table}")
+    return result
@@ -0,0 +1,134 @@
+import re
+
+from peewee import IntegerField, SQL, Table
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_fields(model):
+    """Возвращает имена полей полнотекстового поиска модели (Meta.search_fields).
+
+    Args:
+        model (type): Модель.
+
+    Returns:
+        tuple: Имена полей; пустой кортеж, если поиск не настроен.
+    """
+    return tuple(getattr(model._meta, 'search_fields', None) or ())
+
+
+def fts_table_name(model):
+    return f'{model._meta.table_name}_fts'
+
+
+def search_query(text):
+    """Превращает пользовательский ввод в безопасный запрос FTS5.
+
+    Каждое слово берется в кавычки, поэтому операторы и кавычки во вводе не
+    ломают запрос; слова объединяются через AND. Последнее слово ищется по
+    префиксу (поиск по мере ввода): префикс для всех слов на больших таблицах
+    заметно медленнее.
+
+    Args:
+        text (str): Строка поиска.
+
+    Returns:
+        str: Выражение MATCH или пустая строка, если слов нет.
+    """
+    terms = [f'"{term}"' for term in TERM_RE.findall(text or '')]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def create_search_index(model, database):
+    """Создает таблицу FTS5 и триггеры, синхронизирующие ее с таблицей модели.
+
+    Индекс хранит только токены (external content), сами строки читаются из
+    таблицы модели. Триггеры обновляют его при любом INSERT, UPDATE и DELETE,
+    включая массовые операции и запросы в обход моделей. Если набор полей
+    изменился, индекс пересоздается; новый индекс заполняется из таблицы.
+
+    Args:
+        model (type): Модель с Meta.search_fields.
+        database (Database): База данных.
+
+    Returns:
+        bool: True, если индекс был создан или пересоздан.
+
+    Raises:
+        ValueError: Если поле не существует или первичный ключ не целочисленный.
+    """
+    table = model._meta.table_name
+    fts = fts_table_name(model)
+    primary_key = model._meta.primary_key
+    if not isinstance(primary_key, IntegerField):
+        raise ValueError(f"Full-text search requires an integer primary key on {model.__name__}")
+    columns = []
+    for name in search_fields(model):
+        field = model._meta.fields.get(name)
+        if field is None:
+            raise ValueError(f"Unknown search field {name} for {model.__name__}")
+        columns.append(field.column_name)
+
+    if fts in database.get_tables():
+        if [column.name for column in database.get_columns(fts)] == columns:
+            return False
+        drop_search_index(model, database)
+
+    names = ', '.join(f'"{column}"' for column in columns)
+    new_values = ', '.join(f'new."{column}"' for column in columns)
+    old_values = ', '.join(f'old."{column}"' for column in columns)
+    pk = primary_key.column_name
+    database.execute_sql(f'CREATE VIRTUAL TABLE "{fts}" USING fts5({names}, '
+                         f'content="{table}", content_rowid="{pk}")')
+    database.execute_sql(f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+                         f'INSERT INTO "{fts}" (rowid, {names}) VALUES (new."{pk}", {new_values}); END')
+    database.execute_sql(f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+                         f'INSERT INTO "{fts}" ("{fts}", rowid, {names}) '
+                         f'VALUES (\'delete\', old."{pk}", {old_values}); END')
+    database.execute_sql(f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF "{pk}", {names} ON "{table}" BEGIN '
+                         f'INSERT INTO "{fts}" ("{fts}", rowid, {names}) '
+                         f'VALUES (\'delete\', old."{pk}", {old_values}); '
+                         f'INSERT INTO "{fts}" (rowid, {names}) VALUES (new."{pk}", {new_values}); END')
+    database.execute_sql(f'INSERT INTO "{fts}" ("{fts}") VALUES (\'rebuild\')')
+    return True
+
+
+def drop_search_index(model, database):
+    """Удаляет таблицу FTS5 модели и ее триггеры.
+
+    Args:
+        model (type): Модель.
+        database (Database): База данных.
+    """
+    fts = fts_table_name(model)
+    for suffix in ('ai', 'ad', 'au'):
+        database.execute_sql(f'DROP TRIGGER IF EXISTS "{fts}_{suffix}"')
+    database.execute_sql(f'DROP TABLE IF EXISTS "{fts}"')
+
+
+def search(model, text):
+    """Строит запрос полнотекстового поиска, упорядоченный по релевантности (bm25).
+
+    Args:
+        model (type): Модель с Meta.search_fields.
+        text (str): Строка поиска.
+
+    Returns:
+        ModelSelect: Запрос объектов модели; его можно дополнять limit(), where() и т.д.
+
+    Raises:
+        ValueError: Если у модели нет Meta.search_fields.
+    """
+    if not search_fields(model):
+        raise ValueError(f"{model.__name__} has no Meta.search_fields")
+    match = search_query(text)
+    if not match:
+        return model.select().where(SQL('0'))
+    fts = fts_table_name(model)
+    index = Table(fts, ('rowid',), alias=fts)
+    return (model.select()
+            .join(index, on=(index.rowid == model._meta.primary_key))
+            .where(SQL(f'"{fts}" MATCH ?', [match]))
+            .order_by(SQL(f'bm25("{fts}")')))
@@ -0,0 +1,150 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from peewee import BaseQuery, Model, ModelSelect
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    ORJSON_OPTIONS = 0
+else:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    if isinstance(value, Model):
+        return model_to_dict(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def model_to_dict(instance):
+    """Преобразует экземпляр модели в словарь значений колонок.
+
+    Внешние ключи представлены идентификаторами, связанные объекты не загружаются.
+
+    Args:
+        instance (Model): Экземпляр модели.
+
+    Returns:
+        dict: Имена полей и их значения.
+    """
+    return dict(instance.__data__)
+
+
+def dumps_bytes(data):
+    """Сериализует данные в JSON, используя orjson, если он установлен.
+
+    Результат не зависит от наличия orjson: нестроковые ключи и даты
+    обрабатываются так же, как в json, а данные, которые orjson не
+    поддерживает (например, целые больше 64 бит), сериализуются через json.
+
+    Args:
+        data: Данные для сериализации.
+
+    Returns:
+        bytes: JSON в кодировке UTF-8.
+
+    Raises:
+        TypeError: Если данные содержат объект неподдерживаемого типа.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(data, default=_default, ensure_ascii=False).encode('utf-8')
+
+
+def dumps(data):
+    """Сериализует данные в JSON-строку.
+
+    Args:
+        data: Данные для сериализации.
+
+    Returns:
+        str: JSON-строка.
+
+    Raises:
+        TypeError: Если данные содержат объект неподдерживаемого типа.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS).decode('utf-8')
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(data, default=_default)
+
+
+def is_streamable(data):
+    """Проверяет, нужно ли отдавать результат обработчика потоком.
+
+    Args:
+        data: Результат обработчика API.
+
+    Returns:
+        bool: True для запросов peewee, генераторов и итераторов.
+    """
+    if isinstance(data, BaseQuery):
+        return True
+    return hasattr(data, '__next__') and not isinstance(data, (str, bytes, dict))
+
+
+def iter_rows(data):
+    """Перебирает строки без кэширования результатов запроса в памяти.
+
+    Args:
+        data: Запрос peewee, генератор или итератор.
+
+    Yields:
+        Строки результата.
+    """
+    if isinstance(data, ModelSelect) and data._row_type is None:
+        data = data.dicts()
+    if isinstance(data, BaseQuery):
+        data = data.iterator()
+    for row in data:
+        yield model_to_dict(row) if isinstance(row, Model) else row
+
+
+def stream_json(data, ndjson=False, chunk_size=CHUNK_SIZE):
+    """Сериализует строки по мере чтения курсора.
+
+    Args:
+        data: Запрос peewee, генератор или итератор.
+        ndjson (bool, optional): Формат NDJSON вместо JSON-массива. По умолчанию False.
+        chunk_size (int, optional): Примерный размер отдаваемого фрагмента в байтах.
+
+    Yields:
+        bytes: Фрагменты ответа.
+    """
+    buffer = bytearray()
+    first = True
+    if not ndjson:
+        buffer += b'['
+    for row in iter_rows(data):
+        if ndjson:
+            buffer += dumps_bytes(row)
+            buffer += b'\n'
+        else:
+            if not first:
+                buffer += b','
+            buffer += dumps_bytes(row)
+        first = False
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if not ndjson:
+        buffer += b']'
+    if buffer:
+        yield bytes(buffer)
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from . import logs
+
+_executor = None
+_executor_lock = threading.Lock()
+_max_workers = 4
+
+
+def configure_signals(max_workers=4):
+    """Задает число потоков для фоновых подписчиков сигналов.
+
+    Args:
+        max_workers (int, optional): Размер пула потоков. По умолчанию 4.
+    """
+    global _executor, _max_workers
+    with _executor_lock:
+        previous, _executor = _executor, None
+        _max_workers = max_workers
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def get_executor():
+    """Возвращает пул потоков фоновых подписчиков, создавая его при первом вызове."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_max_workers, thread_name_prefix='darkfream-signal')
+    return _executor
+
+
+def _call(signal, receiver, sender, kwargs):
+    try:
+        receiver(sender, **kwargs)
+    except Exception as e:
+        logs.error(f'Error in {signal.name} receiver: {str(e)}',
+                   receiver=getattr(receiver, '__qualname__', repr(receiver)),
+                   sender=getattr(sender, '__name__', repr(sender)))
+
+
+class Signal:
+    """Сигнал, на который подписываются обработчики.
+
+    Подписчик вызывается как receiver(sender, **kwargs). Обычные подписчики
+    выполняются сразу в потоке отправителя, и их исключения передаются
+    отправителю. Фоновые (background=True) отправляются в пул потоков
+    после фиксации текущей транзакции базы данных, отбрасываются при ее
+    откате, а их ошибки только пишутся в журнал.
+
+    Пример:
+        @post_save.connect(sender=Post, background=True)
+        def reindex(sender, instance, created, **kwargs):
+            ...
+
+    Attributes:
+        name (str): Имя сигнала.
+        receivers (tuple): Кортежи (receiver, sender, background).
+    """
+    def __init__(self, name):
+        self.name = name
+        self.receivers = ()
+
+    def connect(self, receiver=None, sender=None, background=False):
+        """Подписывает обработчик на сигнал.
+
+        Можно использовать как декоратор: @signal.connect(sender=Model).
+
+        Args:
+            receiver (callable, optional): Обработчик.
+            sender (optional): Отправитель (класс модели); None - любой отправитель.
+            background (bool, optional): Вызывать в пуле потоков после фиксации транзакции.
+
+        Returns:
+            callable: Обработчик или декоратор, если receiver не передан.
+        """
+        if receiver is None:
+            return lambda func: self.connect(func, sender, background)
+        self.disconnect(receiver, sender)
+        self.receivers = self.receivers + ((receiver, sender, background),)
+        return receiver
+
+    def disconnect(self, receiver, sender=None):
+        """Отписывает обработчик.
+
+        Args:
+            receiver (callable): Обработчик.
+            sender (optional): Отправитель, с которым обработчик был подписан.
+        """
+        self.receivers = tuple(item for item in self.receivers
+                               if item[0] != receiver or item[1] is not sender)
+
+    def has_receivers(self, sender):
+        """Проверяет, есть ли подписчики для отправителя.
+
+        Args:
+            sender: Отправитель.
+
+        Returns:
+            bool: True, если сигнал кому-то нужен.
+        """
+        for _, expected, _ in self.receivers:
+            if expected is None or expected is sender:
+                return True
+        return False
+
+    def send(self, sender, database=None, **kwargs):
+        """Отправляет сигнал.
+
+        Args:
+            sender: Отправитель (класс модели).
+            database (DarkSqliteDatabase, optional): База, после фиксации транзакции
+                которой запускаются фоновые подписчики. Без нее они запускаются сразу.
+            **kwargs: Аргументы для подписчиков.
+        """
+        deferred = []
+        for receiver, expected, background in self.receivers:
+            if expected is not None and expected is not sender:
+                continue
+            if background:
+                deferred.append(receiver)
+            else:
+                receiver(sender, **kwargs)
+        if not deferred:
+            return
+
+        def dispatch():
+            executor = get_executor()
+            for receiver in deferred:
+                executor.submit(_call, self, receiver, sender, kwargs)
+
+        if database is not None and hasattr(database, 'on_commit'):
+            database.on_commit(dispatch)
+        else:
+            dispatch()
+
+
+pre_save = Signal('pre_save')
+post_save = Signal('post_save')
+post_delete = Signal('post_delete')
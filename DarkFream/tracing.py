@@ -0,0 +1,228 @@
+from collections import deque
+import random
+import threading
+import time
+import uuid
+
+_local = threading.local()
+
+
+class _NoopSpan:
+    """Пустой span, возвращаемый, когда запрос не трассируется."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.trace.add(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class Trace:
+    """Трасса одного запроса.
+
+    Attributes:
+        request_id (str): Идентификатор запроса.
+        method (str): HTTP-метод.
+        path (str): Путь запроса.
+        started_at (float): Время начала (time.time()).
+        spans (list): Список (имя, смещение от начала в мс, длительность в мс).
+        status (int): Код ответа или None.
+        duration_ms (float): Общая длительность или None, пока трасса не завершена.
+    """
+    def __init__(self, request_id, method, path):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.spans = []
+        self.status = None
+        self.duration_ms = None
+        self._start = time.perf_counter()
+
+    def add(self, name, start, seconds):
+        self.spans.append((name, (start - self._start) * 1000.0, seconds * 1000.0))
+
+    def totals(self):
+        """Суммирует длительность span-ов с одинаковым именем.
+
+        Returns:
+            dict: Имя span-а -> [число, суммарная длительность в мс] в порядке первого появления.
+        """
+        totals = {}
+        for name, _, duration in self.spans:
+            total = totals.setdefault(name, [0, 0.0])
+            total[0] += 1
+            total[1] += duration
+        return totals
+
+    def server_timing(self):
+        """Формирует значение заголовка Server-Timing.
+
+        Returns:
+            str: Например 'session;dur=0.41, db;dur=1.20;desc="3x", total;dur=4.05'.
+        """
+        parts = []
+        for name, (count, duration) in self.totals().items():
+            part = f'{name};dur={duration:.2f}'
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        parts.append(f'total;dur={(time.perf_counter() - self._start) * 1000.0:.2f}')
+        return ', '.join(parts)
+
+    def finish(self, status=None):
+        self.status = status
+        self.duration_ms = (time.perf_counter() - self._start) * 1000.0
+
+    def to_dict(self):
+        return {
+            'request_id': self.request_id,
+            'method': self.method,
+            'path': self.path,
+            'started_at': self.started_at,
+            'status': self.status,
+            'duration_ms': self.duration_ms,
+            'spans': [{'name': name, 'offset_ms': offset, 'duration_ms': duration}
+                      for name, offset, duration in self.spans],
+        }
+
+
+def current_trace():
+    """Возвращает трассу текущего потока или None."""
+    return getattr(_local, 'trace', None)
+
+
+def span(name):
+    """Контекстный менеджер, замеряющий фазу текущего запроса.
+
+    Если запрос не трассируется, возвращает общий пустой span, поэтому
+    накладные расходы сводятся к одному чтению thread-local.
+
+    Args:
+        name (str): Имя фазы (route, session, db, render, write...).
+
+    Returns:
+        Контекстный менеджер.
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+
+def record(name, start, seconds):
+    """Добавляет уже измеренную фазу в трассу текущего потока, если она есть.
+
+    Args:
+        name (str): Имя фазы.
+        start (float): Начало фазы по time.perf_counter().
+        seconds (float): Длительность в секундах.
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.add(name, start, seconds)
+
+
+class Tracer:
+    """Трассировка фаз обработки запросов.
+
+    Каждому запросу назначается идентификатор (из заголовка X-Request-ID или
+    новый). В режиме debug трассируется каждый запрос, иначе - доля sample_rate.
+    Для трассируемых запросов ответ получает заголовок Server-Timing, а
+    завершенная трасса попадает в кольцевой буфер, который показывает
+    страница /admin/traces.
+
+    Attributes:
+        sample_rate (float): Доля трассируемых запросов от 0 до 1.
+        debug (bool): Трассировать все запросы.
+        traces (deque): Последние завершенные трассы.
+    """
+    def __init__(self, sample_rate=0.0, debug=False, buffer_size=200):
+        """Инициализация трассировщика.
+
+        Args:
+            sample_rate (float, optional): Доля трассируемых запросов. По умолчанию 0.
+            debug (bool, optional): Трассировать все запросы. По умолчанию False.
+            buffer_size (int, optional): Размер кольцевого буфера. По умолчанию 200.
+        """
+        self.sample_rate = sample_rate
+        self.debug = debug
+        self.traces = deque(maxlen=buffer_size)
+
+    def request_id(self, headers):
+        request_id = (headers or {}).get('X-Request-ID')
+        if request_id and len(request_id) <= 128:
+            return request_id
+        return uuid.uuid4().hex
+
+    def sampled(self):
+        return self.debug or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def begin(self, method, path, headers=None, request_id=None):
+        """Начинает трассу в текущем потоке, если запрос попал в выборку.
+
+        Args:
+            method (str): HTTP-метод.
+            path (str): Путь запроса.
+            headers (dict, optional): Заголовки запроса для X-Request-ID.
+            request_id (str, optional): Уже назначенный идентификатор запроса.
+
+        Returns:
+            Trace: Новая трасса или None, если запрос не трассируется
+                или в потоке уже есть активная трасса.
+        """
+        if getattr(_local, 'trace', None) is not None or not self.sampled():
+            return None
+        trace = _local.trace = Trace(request_id or self.request_id(headers), method, path)
+        return trace
+
+    def end(self, trace, status=None):
+        """Завершает трассу и сохраняет ее в буфер.
+
+        Args:
+            trace (Trace): Трасса, возвращенная begin, или None.
+            status (int, optional): Код ответа.
+        """
+        if trace is None:
+            return
+        if getattr(_local, 'trace', None) is trace:
+            _local.trace = None
+        trace.finish(status)
+        self.traces.append(trace)
+
+    def on_query(self, sql, params, seconds):
+        """Слушатель запросов DarkSqliteDatabase: добавляет SQL в трассу."""
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.add('db', time.perf_counter() - seconds, seconds)
+
+    def recent(self, limit=None):
+        """Возвращает последние трассы, начиная с новых.
+
+        Args:
+            limit (int, optional): Максимальное число трасс.
+
+        Returns:
+            list: Список Trace.
+        """
+        traces = list(self.traces)
+        traces.reverse()
+        return traces[:limit] if limit else traces
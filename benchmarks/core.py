@@ -0,0 +1,96 @@
+"""Замеры математических функций и выражений DarkFream.core.
+
+Запуск из корня репозитория: python -m benchmarks.core
+"""
+import json
+import time
+
+from DarkFream.core import (CompiledExpression, compile_expression, cos, cos_batch, log, log_batch, sin,
+                            sin_batch, sqrt, sqrt_batch, tan, tan_batch)
+
+
+def benchmark_math(size: int = 100000, repeats: int = 5) -> dict:
+    """Сравнивает скалярный цикл с пакетными функциями (требуется NumPy).
+
+    Args:
+        size (int): Число значений. По умолчанию 100000.
+        repeats (int): Число повторов, берется лучший результат. По умолчанию 5.
+
+    Returns:
+        dict: Имя функции -> {'scalar_ms', 'batch_ms', 'speedup'}.
+    """
+    values = [0.5 + (i % 1000) / 1000 for i in range(size)]
+    pairs = {
+        'log': (log, log_batch),
+        'sqrt': (sqrt, sqrt_batch),
+        'sin': (sin, sin_batch),
+        'cos': (cos, cos_batch),
+        'tan': (tan, tan_batch),
+    }
+
+    def best(func):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    results = {}
+    for name, (scalar, batch) in pairs.items():
+        scalar_ms = best(lambda: [scalar(x) for x in values])
+        batch_ms = best(lambda: batch(values))
+        results[name] = {
+            'scalar_ms': scalar_ms,
+            'batch_ms': batch_ms,
+            'speedup': scalar_ms / batch_ms if batch_ms else float('inf'),
+        }
+    return results
+
+
+def benchmark_expression(source: str = 'a * x ** 2 + b * x + c', size: int = 100000) -> dict:
+    """Измеряет пропускную способность повторного вычисления выражения.
+
+    Args:
+        source (str): Выражение с переменными.
+        size (int): Число наборов переменных. По умолчанию 100000.
+
+    Returns:
+        dict: Время разбора при каждом вызове, вызова скомпилированного
+            выражения и пакетного режима, а также вычислений в секунду.
+    """
+    expression = CompiledExpression(source)
+    bindings = [{name: float(i % 97 + index) for index, name in enumerate(expression.variables)}
+                for i in range(size)]
+    rows = [tuple(binding[name] for name in expression.variables) for binding in bindings]
+    sample = bindings[:max(1, size // 100)]
+
+    start = time.perf_counter()
+    for binding in sample:
+        CompiledExpression(source)(binding)
+    parse_each = (time.perf_counter() - start) * len(bindings) / len(sample)
+
+    start = time.perf_counter()
+    for binding in bindings:
+        compile_expression(source)(binding)
+    compiled = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expression.evaluate_many(rows)
+    batch = time.perf_counter() - start
+
+    return {
+        'parse_each_ms': parse_each * 1000,
+        'compiled_ms': compiled * 1000,
+        'batch_ms': batch * 1000,
+        'evals_per_second': size / batch if batch else float('inf'),
+    }
+
+
+if __name__ == '__main__':
+    results = {'expression': benchmark_expression()}
+    try:
+        results['math'] = benchmark_math()
+    except RuntimeError as e:
+        results['math'] = str(e)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,106 @@
+"""Сравнение обработки админ-форм через FormCodec и через рефлексию.
+
+Запуск из корня репозитория: python -m benchmarks.forms
+"""
+import json
+import time
+
+from jinja2 import Environment
+from peewee import BooleanField, CharField, ForeignKeyField, IntegerField, SqliteDatabase
+
+from DarkFream.forms import FormCodec
+from DarkFream.orm import DarkModel
+
+LEGACY_ROWS_TEMPLATE = (
+    '{% for item in items %}<tr><td>{{ item.id }}</td>'
+    '{% for field_name, field in model.get_fields() %}<td>'
+    "{% if field.__class__.__name__ == 'ForeignKeyField' %}"
+    '{{ getattr(item, field_name).name | default(getattr(item, field_name).id) }}'
+    '{% else %}{{ getattr(item, field_name) }}{% endif %}'
+    '</td>{% endfor %}</tr>{% endfor %}'
+)
+CODEC_ROWS_TEMPLATE = (
+    '{% for item_id, cells in codec.rows(items) %}<tr><td>{{ item_id }}</td>'
+    '{% for cell in cells %}<td>{{ cell }}</td>{% endfor %}</tr>{% endfor %}'
+)
+
+
+def legacy_decode(model, form, item):
+    """Прежний разбор формы админ-панели: обход model._meta.fields с проверками классов."""
+    for field_name, field in model._meta.fields.items():
+        if field_name == 'id' or field_name not in form:
+            continue
+        if isinstance(field, ForeignKeyField):
+            setattr(item, field_name, field.rel_model.get_by_id(int(form[field_name][0])))
+        elif isinstance(field, BooleanField):
+            setattr(item, field_name, bool(int(form[field_name][-1])))
+        else:
+            setattr(item, field_name, form[field_name][0])
+    return item
+
+
+def benchmark_forms(field_count=60, rows=200, repeats=5):
+    """Сравнивает обработку админ-форм через FormCodec и через рефлексию.
+
+    Строит в памяти модель с field_count полями (строки, числа, флажки) и
+    измеряет разбор формы редактирования и отрисовку строк таблицы списка из
+    rows объектов: прежним способом (обход model._meta.fields с проверками
+    классов, get_fields() и getattr в шаблоне) и скомпилированным кодеком.
+
+    Args:
+        field_count (int): Число полей модели. По умолчанию 60.
+        rows (int): Число объектов в списке. По умолчанию 200.
+        repeats (int): Число повторов, берется лучший результат. По умолчанию 5.
+
+    Returns:
+        dict: {'compile_ms', 'decode': {...}, 'rows': {...}}, где для decode и rows
+            указаны 'reflection_ms', 'codec_ms' и 'speedup'.
+    """
+    database = SqliteDatabase(':memory:')
+    attrs = {'Meta': type('Meta', (), {'database': database})}
+    form = {}
+    for index in range(field_count):
+        name = f'f{index}'
+        if index % 3 == 0:
+            attrs[name] = CharField(default='')
+            form[name] = [f'value {index}']
+        elif index % 3 == 1:
+            attrs[name] = IntegerField(default=0)
+            form[name] = [str(index)]
+        else:
+            attrs[name] = BooleanField(default=False)
+            form[name] = ['0', '1']
+    wide = type('WideModel', (DarkModel,), attrs)
+    items = [wide(id=index) for index in range(rows)]
+    env = Environment()
+    env.globals['getattr'] = getattr
+    legacy_rows = env.from_string(LEGACY_ROWS_TEMPLATE)
+    codec_rows = env.from_string(CODEC_ROWS_TEMPLATE)
+
+    def best(func):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    compile_ms = best(lambda: FormCodec(wide))
+    codec = FormCodec(wide)
+    results = {'compile_ms': compile_ms}
+    for name, legacy, compiled in (
+            ('decode', lambda: legacy_decode(wide, form, wide(id=1)), lambda: codec.decode(form, wide(id=1))),
+            ('rows', lambda: legacy_rows.render(model=wide, items=items),
+             lambda: codec_rows.render(codec=codec, items=items))):
+        reflection_ms = best(legacy)
+        codec_ms = best(compiled)
+        results[name] = {
+            'reflection_ms': reflection_ms,
+            'codec_ms': codec_ms,
+            'speedup': reflection_ms / codec_ms if codec_ms else float('inf'),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    print(json.dumps(benchmark_forms(), indent=2))